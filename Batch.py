@@ -0,0 +1,190 @@
+################################## Main goal ##################################
+# Batch frontend: run utiliser_fonctions() on many recombinants of a crossing
+# experiment in parallel. The jobs are read from a manifest (one recombinant
+# per row), dispatched on a process pool, and the per-recombinant summaries
+# (or errors) are gathered in a single summary table.
+#
+# Usage : python Batch.py manifeste.tsv -o resume.tsv -j 4
+###############################################################################
+
+import argparse
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+import pandas as pd
+
+from Main import utiliser_fonctions, Dossier_cache
+from SNP_cache import CacheSNP
+from SNP_instrumentation import Instrumentation, instrumenter
+from SNP_sorties import FORMATS
+
+
+# Colonnes du manifeste : seule la premiere est obligatoire (sans fichier trié P2, il est deduit du fichier trié P1)
+COLONNES_MANIFESTE = ['Nom_fichier_tri_P1', 'Nom_fichier_tri_P2', 'nb_suite_P1', 'nb_suite_P2', 'borne_sup']
+VALEURS_DEFAUT = {'nb_suite_P1' : 2, 'nb_suite_P2' : 2, 'borne_sup' : 1000}
+# Colonnes entieres du resume (vides pour les recombinants en echec, sans conversion en flottants)
+COLONNES_ENTIERES = ['nb_suite_P1', 'nb_suite_P2', 'borne_sup', 'somme P1', 'somme P2', 'nombre de fragments P1', 'nombre de fragments P2',
+                     'somme sup', 'nombre de fragments sup', 'Somme du donneur']
+
+# Cache propre a chaque processus du pool (cree a la premiere tache)
+_cache_processus = None
+
+
+def lire_manifeste(nom_fichier_manifeste):
+    """
+    Read the manifest of the batch (CSV or TSV file, separator detected automatically).
+
+    Parameters
+    ----------
+    nom_fichier_manifeste : String,
+        Manifest file name with the column Nom_fichier_tri_P1 and optionally Nom_fichier_tri_P2, nb_suite_P1, nb_suite_P2 and borne_sup.
+
+    Returns
+    -------
+    taches : list,
+        List of dictionaries, one per recombinant, with all the columns of COLONNES_MANIFESTE.
+
+    """
+    manifeste = pd.read_csv(nom_fichier_manifeste, sep=None, engine="python", comment="#")
+    manquantes = [colonne for colonne in COLONNES_MANIFESTE[:1] if colonne not in manifeste.columns]
+    if manquantes :
+        raise ValueError("Colonnes manquantes dans le manifeste : " + ", ".join(manquantes))
+
+    # Les chemins relatifs sont relatifs au dossier du manifeste
+    dossier = os.path.dirname(os.path.abspath(nom_fichier_manifeste))
+    taches = []
+    for ligne in manifeste.to_dict("records") :
+        tache = {}
+        for colonne in COLONNES_MANIFESTE :
+            valeur = ligne.get(colonne, VALEURS_DEFAUT.get(colonne))
+            if colonne in VALEURS_DEFAUT :
+                valeur = int(VALEURS_DEFAUT[colonne] if pd.isna(valeur) else valeur)
+            elif valeur is not None and not pd.isna(valeur) :
+                valeur = os.path.join(dossier, str(valeur))
+            else :
+                valeur = None
+            tache[colonne] = valeur
+        taches.append(tache)
+    return taches
+
+
+def executer_tache(tache, dossier_cache=None, formats_sortie=None, instrumente=False):
+    """
+    Run utiliser_fonctions() on one recombinant of the manifest. Errors are returned, not raised.
+
+    Parameters
+    ----------
+    tache : dict,
+        One job as returned by lire_manifeste().
+    dossier_cache : String, optional
+        Directory of the on-disk parse cache shared by the workers. The default is None (memory only).
+    formats_sortie : list, optional
+        Output formats of each recombinant (see SNP_sorties.FORMATS). The default is None (creer_excel()).
+    instrumente : bool, optional
+        If True, the stages of the job are measured (see SNP_instrumentation). The default is False.
+
+    Returns
+    -------
+    resume : dict,
+        The job columns followed by the summary of utiliser_fonctions(), or by the error message and traceback.
+    mesures : list,
+        Stage measures of the job (empty if instrumente is False).
+
+    """
+    global _cache_processus
+    if _cache_processus is None :
+        _cache_processus = CacheSNP(dossier_cache)
+
+    resume = dict(tache)
+    mesures = Instrumentation()
+    try :
+        with (instrumenter(recombinant=os.path.basename(tache['Nom_fichier_tri_P1'])) if instrumente else nullcontext(mesures)) as mesures :
+            resume.update(utiliser_fonctions(tache['Nom_fichier_tri_P1'], tache['Nom_fichier_tri_P2'],
+                                             tache['nb_suite_P1'], tache['nb_suite_P2'],
+                                             _cache_processus, tache['borne_sup'], formats_sortie))
+        resume['Erreur'] = ""
+    except Exception as erreur :
+        resume['Erreur'] = "%s: %s" % (type(erreur).__name__, erreur)
+        resume['Traceback'] = traceback.format_exc()
+    return resume, mesures.mesures
+
+
+def executer_lot(taches, nombre_processus=None, dossier_cache=None, formats_sortie=None, rapport=None):
+    """
+    Run all the jobs on a process pool, printing the progress. A failing job does not stop the others.
+
+    Parameters
+    ----------
+    taches : list,
+        Jobs as returned by lire_manifeste().
+    nombre_processus : int, optional
+        Number of worker processes. The default is None (number of cores).
+    dossier_cache : String, optional
+        Directory of the on-disk parse cache shared by the workers. The default is None.
+    formats_sortie : list, optional
+        Output formats of each recombinant (see SNP_sorties.FORMATS). The default is None (creer_excel()).
+    rapport : String, optional
+        JSON or CSV file receiving the stage measures of all the jobs (see SNP_instrumentation). The default is None (no instrumentation).
+
+    Returns
+    -------
+    resume : pandas.DataFrame,
+        Summary table with one row per job, in the manifest order. The counts and sums are nullable integers (Int64), empty for the failed jobs.
+
+    """
+    resultats = [None] * len(taches)
+    mesures = [None] * len(taches)
+    echecs = 0
+    with ProcessPoolExecutor(max_workers=nombre_processus) as executeur :
+        futurs = {executeur.submit(executer_tache, tache, dossier_cache, formats_sortie, rapport is not None) : i for i, tache in enumerate(taches)}
+        for termines, futur in enumerate(as_completed(futurs), 1) :
+            i = futurs[futur]
+            resultats[i], mesures[i] = futur.result()
+            statut = "OK"
+            if resultats[i]['Erreur'] :
+                echecs += 1
+                statut = "ECHEC (" + resultats[i]['Erreur'] + ")"
+            print("[%d/%d] %s : %s" % (termines, len(taches), os.path.basename(taches[i]['Nom_fichier_tri_P1']), statut), flush=True)
+
+    print("Lot terminé : %d recombinant(s), %d échec(s)" % (len(taches), echecs))
+    if rapport is not None :
+        instrumentation = Instrumentation()
+        instrumentation.mesures = [mesure for mesures_tache in mesures for mesure in mesures_tache]
+        instrumentation.ecrire(rapport)
+    resume = pd.DataFrame(resultats)
+    for colonne in COLONNES_ENTIERES :
+        if colonne in resume.columns :
+            resume[colonne] = pd.array([resultat.get(colonne) for resultat in resultats], dtype="Int64")
+    return resume
+
+
+def ecrire_resume(resume, nom_fichier_sortie):
+    """
+    Write the summary table, in Excel format if the name ends with .xlsx, tab-delimited otherwise.
+    """
+    if nom_fichier_sortie.lower().endswith(".xlsx") :
+        resume.to_excel(nom_fichier_sortie, sheet_name="Resume", index=False)
+    else :
+        resume.to_csv(nom_fichier_sortie, sep="\t", index=False)
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Run the SNP analysis on all the recombinants of a manifest.")
+    parseur.add_argument("manifeste", help="CSV/TSV file with the columns " + ", ".join(COLONNES_MANIFESTE))
+    parseur.add_argument("-o", "--sortie", default="resume_lot.tsv", help="summary table (.tsv or .xlsx)")
+    parseur.add_argument("-j", "--processus", type=int, default=None, help="number of worker processes (default: number of cores)")
+    parseur.add_argument("--formats", default=None, help="comma separated output formats among " + ", ".join(FORMATS) + " (default: Excel file of creer_excel())")
+    parseur.add_argument("--cache", default=Dossier_cache, help="directory of the parse cache ('' to disable the disk cache)")
+    parseur.add_argument("--rapport", default=None, help="JSON or CSV file receiving the per-stage measures of every recombinant")
+    options = parseur.parse_args(arguments)
+
+    formats_sortie = options.formats.split(",") if options.formats else None
+    resume = executer_lot(lire_manifeste(options.manifeste), options.processus, options.cache or None, formats_sortie, options.rapport)
+    ecrire_resume(resume, options.sortie)
+    return 0 if (resume['Erreur'] == "").all() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
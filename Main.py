@@ -12,17 +12,31 @@ Created on Thu Jun 23 21:00:00 2022
 # their size relative to the parental genomes.
 ###############################################################################
 
-from SNP import SNP_parent, SNP_chaine, chaine_borne, calcul_des_sommes_rapport_recombinant, calcul_des_sommes_rapport_donneur, creer_excel, compteur_snp
+import os
+
+from SNP import SNP_parent, trier_SNP, creer_excel, nom_sortie
+from SNP_cache import CacheSNP
+from SNP_instrumentation import etape, instrumenter
+from SNP_lecture import LecturesSNP
+from SNP_segmentation import segmenter
+from SNP_sorties import ecrire_analyse
 
 
 # Insert the input files names with your exact excel files names (SNP MAUVE output files).
+# The native tab-delimited MAUVE SNP export (sorted the same way) can be used directly, without Excel conversion.
 # File sorted by positions on either P1
 Nom_fichier_tri_P1 = "SNP_R11_consRLB1_9_triéP1.xlsm"
-# and P2 parents.
+# and P2 parents (None to sort the SNPs of the P1 file on P2 in memory, with a single input file).
 Nom_fichier_tri_P2 = "SNP_R11_consRLB1_9_triéP2.xlsm"
+# Parsed input files are cached (in memory and in this directory) so each file is decoded only once.
+Dossier_cache = ".cache_SNP"
+# Per-stage measures (time, memory, counts) written to this JSON or CSV file (None to disable the instrumentation).
+Rapport_instrumentation = None
+# Input files read one after the other (None), or, opt-in, parsed concurrently ("processus" or "threads"), the P1 orientation being segmented while the P2 file is still read.
+Lecture_parallele = None
 
 
-def utiliser_fonctions(Nom_fichier_tri_P1, Nom_fichier_tri_P2, nb_suite_P1, nb_suite_P2):
+def utiliser_fonctions(Nom_fichier_tri_P1, Nom_fichier_tri_P2, nb_suite_P1, nb_suite_P2, cache=None, borne_sup=1000, formats_sortie=None, moteur="seuils", parametres_moteur=None, lecture_parallele=None):
     """
     Automatically select the donor and receptor parent/genome and uses the SNP package functions to create the output excel file.
 
@@ -31,80 +45,216 @@ def utiliser_fonctions(Nom_fichier_tri_P1, Nom_fichier_tri_P2, nb_suite_P1, nb_s
     Nom_fichier_tri_P1 : String, 
         Name of the excel file sorted by positions on P1 genome.
     Nom_fichier_tri_P2 : String, 
-        Name of the excel file sorted by positions on P2 genome.
+        Name of the excel file sorted by positions on P2 genome. If None, the P2-sorted data is derived from the P1-sorted file (single ingest, see trier_SNP()).
     nb_suite_P1 : int,
         Minimum number of successive SNP belonging to the same parent P1. The default is 2.
     nb_suite_P2 : int,
         Minimum number of successive SNP belonging to the same parent P2. The default is 2.
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed input files. Each file is then parsed once instead of once per orientation. The default is None.
+    borne_sup : int, optional
+        Length threshold of the fragments counted in 'somme sup' and 'nombre de fragments sup'. The default is 1000.
+    formats_sortie : list, optional
+        Output formats written by SNP_sorties.ecrire_analyse() ("excel", "tsv", "parquet", "bed"). The default is None (creer_excel()).
+    moteur : String, optional
+        Segmentation engine, "seuils" (nb_suite_P1/nb_suite_P2 rule of SNP_chaine()) or "hmm" (SNP_hmm). The default is "seuils".
+    parametres_moteur : dict, optional
+        Parameters of the "hmm" engine (see SNP_hmm.chaine_hmm()). The default is None.
+    lecture_parallele : String, optional
+        If "processus" or "threads", both input files are parsed concurrently by workers (see SNP_lecture.LecturesSNP) and the P1 receptor
+        side is segmented while the P2 file is still read. The results are the same as with sequential reading. The default is None (sequential reading).
 
     Returns
     -------
     Excel file containing all the results.
+    resume : dict,
+        Summary of the analysis for the selected receptor/donor orientation (see resume_analyse()).
+
+    """
+    noms_fichiers = {1 : Nom_fichier_tri_P1, 2 : Nom_fichier_tri_P2}
+    if Nom_fichier_tri_P2 is None :
+        racine, extension = os.path.splitext(Nom_fichier_tri_P1)
+        racine = racine[:-2] if racine.endswith("P1") else racine + "_tri"
+        noms_fichiers[2] = racine + "P2" + extension
+    lectures = None
+    if lecture_parallele is not None :
+        with etape("lecture_parallele", cache, executeur=lecture_parallele) :
+            lectures = LecturesSNP([Nom_fichier_tri_P1, Nom_fichier_tri_P2], cache, lecture_parallele)
+
+    donnees = {}
+
+    def lire(genome) :
+        # Attente de la lecture parallele, ou lecture sequentielle
+        nom_fichier = noms_fichiers[genome]
+        with etape("SNP_parent", None if lectures is not None else cache, fichier=os.path.basename(nom_fichier)) as mesure :
+            donnees[genome] = lectures.resultat(nom_fichier) if lectures is not None else SNP_parent(nom_fichier, vectorise=True, cache=cache)
+            mesure.compter(nombre_snp=len(donnees[genome][0]))
+        return donnees[genome]
+
+    try :
+        lire(1)
+        if Nom_fichier_tri_P2 is None :
+            # Memes SNP que le fichier trié P1 : on les trie sur les positions de P2
+            with etape("trier_SNP", nombre_snp=len(donnees[1][0])) :
+                donnees[2] = trier_SNP(*donnees[1], genome=2)
+        elif lectures is not None :
+            # Lecture differee : le fichier trié P2 n'est attendu qu'apres la segmentation par rapport a P1
+            donnees[2] = lambda : lire(2)
+        else :
+            lire(2)
+
+        return analyser_donnees(donnees, noms_fichiers, nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur)
+    finally :
+        if lectures is not None :
+            lectures.fermer()
+
+
+def analyser_donnees(donnees, noms_fichiers, nb_suite_P1, nb_suite_P2, borne_sup=1000, formats_sortie=None, moteur="seuils", parametres_moteur=None):
+    """
+    Analyse both receptor/donor orientations of already parsed SNPs and select the receptor.
+
+    Parameters
+    ----------
+    donnees : dict,
+        {1 : SNPs sorted on P1, 2 : SNPs sorted on P2}, each as returned by SNP_parent(vectorise=True).
+        The P2 entry may be a function returning them (see analyser_orientation()).
+    noms_fichiers : dict,
+        {1 : name of the file sorted on P1, 2 : name of the file sorted on P2}, used to name the output files.
+    nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur :
+        See utiliser_fonctions().
+
+    Returns
+    -------
+    resume : dict,
+        Summary of the selected receptor/donor orientation (see resume_analyse()).
 
     """
-    Recepteur = 1   # Le prédicat de base est que P1 est le recepteur et P2 le donneur. (Ces variables sont modifiées automatiquement)
-    Donneur = 2
-    #Par rapport à P1
-    liste_parent, liste_P1, liste_p2, liste_R = SNP_parent(Nom_fichier_tri_P1)
-    chaine_SNP = SNP_chaine(liste_parent, Recepteur, nb_suite_P1, nb_suite_P2) # variables : 1 --> base (ex: P1), 3 --> nb de snp d'affilé pour passer de P1 a P2 et réciproquement
-    liste_taille_snp = compteur_snp(chaine_SNP)
-    chaine_borne_SNP, chaine_borne_P1_start, chaine_borne_P2_start, chaine_borne_R_start, chaine_borne_P1_end, chaine_borne_P2_end, chaine_borne_R_end = chaine_borne(chaine_SNP, liste_P1, liste_p2, liste_R, Donneur) # Variable 2 --> donneur (valeur possible 1 ou 2)
-    somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 = calcul_des_sommes_rapport_recombinant(chaine_borne_SNP, chaine_borne_P1_start, chaine_borne_P1_end, 1000)
-    
-    #Calcul de somme sur P2 trié
-    liste_parent_, liste_P1_, liste_p2_, liste_R_ = SNP_parent(Nom_fichier_tri_P2)
-    chaine_SNP_ = SNP_chaine(liste_parent_, Recepteur, nb_suite_P1, nb_suite_P2)
-    # liste_taille_snp = compteur_snp(chaine_SNP_)
-    chaine_borne_SNP_, _, chaine_borne_P2_start_, _, _, chaine_borne_P2_end_, _ = chaine_borne(chaine_SNP_, liste_P1_, liste_p2_, liste_R_, Donneur)
-    somme_P1_donneur, somme_P2_donneur = calcul_des_sommes_rapport_donneur(chaine_borne_SNP_, chaine_borne_P2_start_, chaine_borne_P2_end_)
-    if min_P1_P2[0] == "P2":
-        creer_excel(Nom_fichier_tri_P1, chaine_borne_SNP, chaine_borne_R_start, chaine_borne_R_end, chaine_borne_P1_start, chaine_borne_P1_end, chaine_borne_P2_start, chaine_borne_P2_end,chaine_borne_SNP_,chaine_borne_P2_start_,chaine_borne_P2_end_, somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, somme_P2_donneur, liste_taille_snp)
+    # Le prédicat de base est que P1 est le recepteur et P2 le donneur, puis l'inverse
+    resumes = {}
+    for Recepteur, Donneur in ((1, 2), (2, 1)) :
+        resumes[Recepteur] = analyser_orientation(donnees[Recepteur], donnees[Donneur], noms_fichiers[Recepteur], Recepteur, Donneur, nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur)
+
+    # Le recepteur est le parent dont la somme des regions (par rapport à P1) est la plus grande
+    if resumes[1]["min P1 P2"] == "P2" :
         print("Opération terminée : P1 est le recepteur et P2 le donneur")
-     
-        Recepteur = 2
-        Donneur = 1
-        #Par rapport a P2
-        liste_parent, liste_P1, liste_p2, liste_R = SNP_parent(Nom_fichier_tri_P2)
-        chaine_SNP = SNP_chaine(liste_parent, Recepteur, nb_suite_P1, nb_suite_P2) # variables : 1 --> base (ex: P1), 3 --> nb de snp d'affilé pour passer de P1 a P2 et réciproquement
-        chaine_borne_SNP, chaine_borne_P1_start, chaine_borne_P2_start, chaine_borne_R_start, chaine_borne_P1_end, chaine_borne_P2_end, chaine_borne_R_end = chaine_borne(chaine_SNP, liste_P1, liste_p2, liste_R, Donneur) # Variable 2 --> donneur (valeur possible 1 ou 2)
-        somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 = calcul_des_sommes_rapport_recombinant(chaine_borne_SNP, chaine_borne_P2_start, chaine_borne_P2_end, 1000)
-        
-        #Calcul de somme sur P1 trié
-        liste_parent_, liste_P1_, liste_p2_, liste_R_ = SNP_parent(Nom_fichier_tri_P1)
-        chaine_SNP_ = SNP_chaine(liste_parent_, Recepteur, nb_suite_P1, nb_suite_P2) # variables : 1 --> base (ex: P1), 3 --> nb de snp d'affilé pour passer de P1 a P2 et réciproquement
-        liste_taille_snp = compteur_snp(chaine_SNP)
-        chaine_borne_SNP_, chaine_borne_P1_start_, _, _, chaine_borne_P1_end_, _, _ = chaine_borne(chaine_SNP_, liste_P1_, liste_p2_, liste_R_, Donneur)
-        somme_P1_donneur, somme_P2_donneur = calcul_des_sommes_rapport_donneur(chaine_borne_SNP_, chaine_borne_P1_start_, chaine_borne_P1_end_)
-        #somme_P1_donneur, _, _, _,_, _, _ = calcul_des_sommes_rapport_recombinant(chaine_borne_SNP, chaine_borne_P1_start_, chaine_borne_P1_end_, 1000)
-        
-        creer_excel(Nom_fichier_tri_P2, chaine_borne_SNP, chaine_borne_R_start, chaine_borne_R_end, chaine_borne_P1_start, chaine_borne_P1_end, chaine_borne_P2_start, chaine_borne_P2_end,chaine_borne_SNP_ ,chaine_borne_P1_start_ ,chaine_borne_P1_end_, somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, somme_P1_donneur, liste_taille_snp)
-
-        return 0
+        return resumes[1]
+    print("Opération terminée : P2 est le recepteur et P1 le donneur")
+    return resumes[2]
+
+
+def analyser_orientation(donnees_recepteur, donnees_donneur, Nom_fichier_recepteur, Recepteur, Donneur, nb_suite_P1, nb_suite_P2, borne_sup=1000, formats_sortie=None, moteur="seuils", parametres_moteur=None):
+    """
+    Analyse one receptor/donor orientation and write its output excel file.
+
+    Parameters
+    ----------
+    donnees_recepteur : tuple,
+        Labels and P1, P2, R positions of the SNPs sorted by positions on the receptor genome (output of SNP_parent()).
+    donnees_donneur : tuple or function,
+        Same SNPs sorted by positions on the donor genome, or a function returning them, called once the receptor side is segmented
+        (so the donor file can still be read meanwhile).
+    Nom_fichier_recepteur : String,
+        Name of the file sorted on the receptor genome, used to name the output excel file.
+    Recepteur : int,
+        Receptor genome (1 or 2).
+    Donneur : int,
+        Donor genome (1 or 2).
+    nb_suite_P1 : int,
+        Minimum number of successive SNP belonging to the same parent P1.
+    nb_suite_P2 : int,
+        Minimum number of successive SNP belonging to the same parent P2.
+    borne_sup : int, optional
+        Length threshold of the fragments counted in 'somme sup'. The default is 1000.
+    formats_sortie : list, optional
+        Output formats written by SNP_sorties.ecrire_analyse(). The default is None (creer_excel()).
+    moteur : String, optional
+        Segmentation engine, "seuils" or "hmm" (see SNP_segmentation.segmenter()). The default is "seuils".
+    parametres_moteur : dict, optional
+        Parameters of the "hmm" engine. The default is None.
+
+    Returns
+    -------
+    resume : dict,
+        Summary of the orientation (see resume_analyse()).
+
+    """
+    repere_recepteur = "P" + str(Recepteur)
+    repere_donneur = "P" + str(Donneur)
+
+    # Par rapport au recepteur
+    with etape("segmenter", repere=repere_recepteur, nombre_snp=len(donnees_recepteur[0])) as mesure :
+        segmentation = segmenter(*donnees_recepteur, Recepteur, Donneur, nb_suite_P1, nb_suite_P2, moteur, parametres_moteur)
+        segments = segmentation.segments
+        mesure.compter(nombre_segments=len(segments))
+    with etape("sommes", repere=repere_recepteur) :
+        somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 = segments.sommes_rapport_recombinant(repere_recepteur, borne_sup)
+
+    # Par rapport au donneur (SNP triés sur le donneur)
+    if callable(donnees_donneur) :
+        donnees_donneur = donnees_donneur()
+    with etape("segmenter", repere=repere_donneur, nombre_snp=len(donnees_donneur[0])) as mesure :
+        segments_donneur = segmenter(*donnees_donneur, Recepteur, Donneur, nb_suite_P1, nb_suite_P2, moteur, parametres_moteur).segments
+        mesure.compter(nombre_segments=len(segments_donneur))
+    with etape("sommes", repere=repere_donneur) :
+        sommes_donneur = segments_donneur.sommes_rapport_donneur(repere_donneur)
+    debuts_donneur, fins_donneur = segments_donneur.projection(repere_donneur)
+
+    with etape("ecriture", repere=repere_recepteur, formats=",".join(formats_sortie or ["excel"])) :
+        if formats_sortie is None :
+            debuts_R, fins_R = segments.projection("R")
+            debuts_P1, fins_P1 = segments.projection("P1")
+            debuts_P2, fins_P2 = segments.projection("P2")
+            creer_excel(Nom_fichier_recepteur, segments.labels, debuts_R, fins_R, debuts_P1, fins_P1, debuts_P2, fins_P2,
+                        segments_donneur.labels, debuts_donneur, fins_donneur, somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2,
+                        sommes_donneur[Donneur - 1], segmentation.liste_taille_snp)
+        else :
+            ecrire_analyse(formats_sortie, nom_sortie(Nom_fichier_recepteur), segments, segments_donneur, Donneur,
+                           (somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2),
+                           sommes_donneur[Donneur - 1], segmentation.liste_taille_snp)
+
+    return resume_analyse(Recepteur, Donneur, somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2, sommes_donneur[Donneur - 1])
+
+
+def resume_analyse(Recepteur, Donneur, somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2, somme_donneur):
+    """
+    Gather the results of one receptor/donor orientation in a dictionary (one row of the batch summary table).
+
+    Parameters
+    ----------
+    Recepteur : int,
+        Receptor genome (1 or 2).
+    Donneur : int,
+        Donor genome (1 or 2).
+    somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 : list,
+        Outputs of calcul_des_sommes_rapport_recombinant().
+    somme_donneur : list,
+        Total length of donor fragments relative to the donor (output of calcul_des_sommes_rapport_donneur()).
+
+    Returns
+    -------
+    resume : dict,
+        Summary of the orientation.
+
+    """
+    return {"Recepteur" : "P"+str(Recepteur),
+            "Donneur" : "P"+str(Donneur),
+            "somme P1" : somme_P1[0],
+            "somme P2" : somme_P2[0],
+            "min P1 P2" : min_P1_P2[0],
+            "nombre de fragments P1" : compt_P1[0],
+            "nombre de fragments P2" : compt_P2[0],
+            "somme sup" : somme_sup[0],
+            "nombre de fragments sup" : compt[0],
+            "Somme du donneur" : somme_donneur[0]}
+
+
+if __name__ == "__main__":
+    if Rapport_instrumentation is None :
+        utiliser_fonctions(Nom_fichier_tri_P1, Nom_fichier_tri_P2, 2, 2, CacheSNP(Dossier_cache), lecture_parallele=Lecture_parallele)
     else :
-        print("Opération terminée : P2 est le recepteur et P1 le donneur")
-        creer_excel(Nom_fichier_tri_P1, chaine_borne_SNP, chaine_borne_R_start, chaine_borne_R_end, chaine_borne_P1_start, chaine_borne_P1_end, chaine_borne_P2_start, chaine_borne_P2_end,chaine_borne_SNP_,chaine_borne_P2_start_,chaine_borne_P2_end_, somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, somme_P2_donneur, liste_taille_snp)
-        
-        Recepteur = 2
-        Donneur = 1
-        #Par rapport a P2
-        liste_parent, liste_P1, liste_p2, liste_R = SNP_parent(Nom_fichier_tri_P2)
-        chaine_SNP = SNP_chaine(liste_parent, Recepteur, nb_suite_P1, nb_suite_P2) # variables : 1 --> base (ex: P1), 3 --> nb de snp d'affilé pour passer de P1 a P2 et réciproquement
-        chaine_borne_SNP, chaine_borne_P1_start, chaine_borne_P2_start, chaine_borne_R_start, chaine_borne_P1_end, chaine_borne_P2_end, chaine_borne_R_end = chaine_borne(chaine_SNP, liste_P1, liste_p2, liste_R, Donneur) # Variable 2 --> donneur (valeur possible 1 ou 2)
-        somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 = calcul_des_sommes_rapport_recombinant(chaine_borne_SNP, chaine_borne_P2_start, chaine_borne_P2_end, 1000)
-        
-        #Calcul de somme sur P1 trié
-        liste_parent_, liste_P1_, liste_p2_, liste_R_ = SNP_parent(Nom_fichier_tri_P1)
-        chaine_SNP_ = SNP_chaine(liste_parent_, Recepteur, nb_suite_P1, nb_suite_P2) # variables : 1 --> base (ex: P1), 3 --> nb de snp d'affilé pour passer de P1 a P2 et réciproquement
-        liste_taille_snp = compteur_snp(chaine_SNP)
-        chaine_borne_SNP_, chaine_borne_P1_start_, _, _, chaine_borne_P1_end_, _, _ = chaine_borne(chaine_SNP_, liste_P1_, liste_p2_, liste_R_, Donneur)
-        somme_P1_donneur, somme_P2_donneur = calcul_des_sommes_rapport_donneur(chaine_borne_SNP_, chaine_borne_P1_start_, chaine_borne_P1_end_)
-        #somme_P1_donneur, _, _, _,_, _, _ = calcul_des_sommes_rapport_recombinant(chaine_borne_SNP, chaine_borne_P1_start_, chaine_borne_P1_end_, 1000)
-        
-        creer_excel(Nom_fichier_tri_P2, chaine_borne_SNP, chaine_borne_R_start, chaine_borne_R_end, chaine_borne_P1_start, chaine_borne_P1_end, chaine_borne_P2_start, chaine_borne_P2_end,chaine_borne_SNP_ ,chaine_borne_P1_start_ ,chaine_borne_P1_end_, somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, somme_P1_donneur, liste_taille_snp)
-        
-        return 0
-
-utiliser_fonctions(Nom_fichier_tri_P1, Nom_fichier_tri_P2, 2, 2)
+        with instrumenter() as mesures :
+            utiliser_fonctions(Nom_fichier_tri_P1, Nom_fichier_tri_P2, 2, 2, CacheSNP(Dossier_cache), lecture_parallele=Lecture_parallele)
+        mesures.ecrire(Rapport_instrumentation)
 
 
 
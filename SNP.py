@@ -13,19 +13,30 @@ Created on Thu Jun 23 21:00:00 2022
 ###############################################################################
 
 
-import pandas as pd
-import xlsxwriter
+import os
+import numpy as np
 from datetime import datetime
 
 
-def SNP_parent(nom_fichier_excel):
+# Seules colonnes de l'export MAUVE utilisees par l'analyse
+COLONNES_MAUVE = ['SNP pattern', 'sequence_1_PosInContg', 'sequence_2_PosInContg', 'sequence_3_PosInContg']
+EXTENSIONS_EXCEL = ('.xls', '.xlsx', '.xlsm', '.xlsb', '.ods')
+# Code entier d'un label --> label ("P1" = 1, "P2" = 2)
+LABELS_PARENTS = np.array(["", "P1", "P2"])
+
+
+def SNP_parent(nom_fichier_excel, vectorise=False, cache=None):
     """
     Assign each SNP to a parent with its position in P1, P2 and R.
     
     Parameters
     ----------
     nom_fichier_excel : String,
-        SNP file name from MAUVE converted to Excel format.
+        SNP file name from MAUVE converted to Excel format. Any other extension is read as the native tab-delimited MAUVE SNP export with lire_export_mauve().
+    vectorise : bool, optional
+        If True, the assignment is done on whole columns by attribuer_parents() and numpy arrays are returned instead of lists. The default is False.
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed files. If given, a file already parsed (same content) is not read again. The default is None.
 
     Returns
     -------
@@ -39,7 +50,20 @@ def SNP_parent(nom_fichier_excel):
         List of position of each SNP related to the Recombinant consensus genome (see material and methods in the related article).
 
     """
-    mon_fichier = pd.read_excel(nom_fichier_excel) 
+    if cache is not None or vectorise or not nom_fichier_excel.lower().endswith(EXTENSIONS_EXCEL) :
+        if cache is not None :
+            codes, positions_P1, positions_P2, positions_R = cache.charger(nom_fichier_excel, COLONNES_MAUVE, _lire_SNP_codes)
+            colonnes = (LABELS_PARENTS[codes], positions_P1, positions_P2, positions_R)
+        else :
+            colonnes = _lire_SNP(nom_fichier_excel)
+        if vectorise :
+            return colonnes
+        return tuple(colonne.tolist() for colonne in colonnes)
+    
+    # pandas n'est importé que pour lire ou écrire des fichiers (démarrage rapide sans lecture, ex. avec le cache)
+    import pandas as pd
+
+    mon_fichier = pd.read_excel(nom_fichier_excel, usecols=COLONNES_MAUVE) 
     SNP_pattern = list(mon_fichier['SNP pattern'])  
     
     positions_SNP_P1 = list(mon_fichier['sequence_1_PosInContg'])
@@ -85,6 +109,144 @@ def SNP_parent(nom_fichier_excel):
     return liste_appartenance_SNP, liste_position_SNP_P1, liste_position_SNP_P2, liste_position_SNP_R   
 
 
+def attribuer_parents(SNP_pattern, positions_SNP_P1, positions_SNP_P2, positions_SNP_R):
+    """
+    Vectorized version of the SNP_parent() assignment working on whole columns.
+    
+    The patterns are case-folded once, SNPs with an N base or a null position on P1 or P2 are masked out, 
+    then the recombinant base (character 2) is compared to the P1 (character 0) and P2 (character 1) bases.
+
+    Parameters
+    ----------
+    SNP_pattern : array-like,
+        'SNP pattern' column of the MAUVE SNP file.
+    positions_SNP_P1 : array-like,
+        'sequence_1_PosInContg' column of the MAUVE SNP file.
+    positions_SNP_P2 : array-like,
+        'sequence_2_PosInContg' column of the MAUVE SNP file.
+    positions_SNP_R : array-like,
+        'sequence_3_PosInContg' column of the MAUVE SNP file.
+
+    Returns
+    -------
+    liste_appartenance_SNP : numpy.ndarray,
+        Array containing the labels of the SNPs ("P1" or "P2").
+    liste_position_SNP_P1 : numpy.ndarray,
+        Array of position of each SNP related to the P1 genome.
+    liste_position_SNP_P2 : numpy.ndarray,
+        Array of position of each SNP related to the P2 genome.
+    liste_position_SNP_R : numpy.ndarray,
+        Array of position of each SNP related to the Recombinant consensus genome.
+
+    """
+    # Un motif = 3 caracteres UCS-4, soit une matrice (n, 3) de points de code
+    motifs = np.char.lower(np.asarray(SNP_pattern, dtype="U3"))
+    bases = np.ascontiguousarray(motifs).view(np.uint32).reshape(-1, 3)
+    
+    positions_P1 = np.asarray(positions_SNP_P1)
+    positions_P2 = np.asarray(positions_SNP_P2)
+    positions_R = np.asarray(positions_SNP_R)
+    
+    valide = ~(bases == ord("n")).any(axis=1) & (positions_P1 != 0) & (positions_P2 != 0)
+    est_P1 = valide & (bases[:, 2] == bases[:, 0])
+    est_P2 = valide & ~est_P1 & (bases[:, 2] == bases[:, 1])
+    garde = est_P1 | est_P2
+    
+    liste_appartenance_SNP = np.where(est_P2[garde], "P2", "P1")
+    return liste_appartenance_SNP, positions_P1[garde], positions_P2[garde], positions_R[garde]
+
+
+def _lire_SNP(nom_fichier):
+    # Excel ou export MAUVE natif selon l'extension, toujours par attribuer_parents()
+    if nom_fichier.lower().endswith(EXTENSIONS_EXCEL) :
+        import pandas as pd
+
+        mon_fichier = pd.read_excel(nom_fichier, usecols=COLONNES_MAUVE)
+        return attribuer_parents(mon_fichier['SNP pattern'],
+                                 mon_fichier['sequence_1_PosInContg'],
+                                 mon_fichier['sequence_2_PosInContg'],
+                                 mon_fichier['sequence_3_PosInContg'])
+    blocs = list(lire_export_mauve(nom_fichier))
+    if not blocs :
+        return np.array([], dtype="U2"), np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return tuple(np.concatenate(colonne) for colonne in zip(*blocs))
+
+
+def _lire_SNP_codes(nom_fichier):
+    # Forme compacte stockee dans le cache : labels en int8 (1 = P1, 2 = P2)
+    liste_appartenance_SNP, positions_P1, positions_P2, positions_R = _lire_SNP(nom_fichier)
+    codes = (liste_appartenance_SNP == "P2").astype(np.int8) + 1
+    return codes, positions_P1, positions_P2, positions_R
+
+
+def trier_SNP(liste_appartenance_SNP, liste_position_SNP_P1, liste_position_SNP_P2, liste_position_SNP_R, genome=2):
+    """
+    Sort the SNPs on their positions in one genome, e.g. to obtain the P2-sorted data from the P1-sorted file.
+    
+    The sort is stable: SNPs with the same position keep their order of the input.
+
+    Parameters
+    ----------
+    liste_appartenance_SNP : array-like,
+        Labels of the SNPs, as returned by SNP_parent().
+    liste_position_SNP_P1 : array-like,
+        Position of each SNP related to the P1 genome.
+    liste_position_SNP_P2 : array-like,
+        Position of each SNP related to the P2 genome.
+    liste_position_SNP_R : array-like,
+        Position of each SNP related to the R genome.
+    genome : int or String, optional
+        Genome whose positions are used to sort (1 or "P1", 2 or "P2", "R"). The default is 2.
+
+    Returns
+    -------
+    The four arrays reordered by the positions in the chosen genome.
+
+    """
+    colonnes = [np.asarray(liste_appartenance_SNP), np.asarray(liste_position_SNP_P1), 
+                np.asarray(liste_position_SNP_P2), np.asarray(liste_position_SNP_R)]
+    cle = colonnes[{1 : 1, 2 : 2, "P1" : 1, "P2" : 2, "R" : 3}[genome]]
+    ordre = np.argsort(cle, kind="stable")
+    return tuple(colonne[ordre] for colonne in colonnes)
+
+
+def lire_export_mauve(nom_fichier_mauve, taille_bloc=100000):
+    """
+    Read the native tab-delimited MAUVE SNP export by chunks and label the SNPs as they are read.
+    
+    Only the 'SNP pattern' and 'sequence_{1,2,3}_PosInContg' columns are loaded, 
+    so the memory used is bounded by taille_bloc whatever the size of the alignment.
+
+    Parameters
+    ----------
+    nom_fichier_mauve : String,
+        SNP file name as exported by the MAUVE 'export SNPs' tool.
+    taille_bloc : int, optional
+        Number of rows of the file parsed at once. The default is 100000.
+
+    Yields
+    ------
+    liste_appartenance_SNP : numpy.ndarray,
+        Labels of the SNPs ("P1" or "P2") of the chunk.
+    liste_position_SNP_P1 : numpy.ndarray,
+        Positions of the SNPs of the chunk related to the P1 genome.
+    liste_position_SNP_P2 : numpy.ndarray,
+        Positions of the SNPs of the chunk related to the P2 genome.
+    liste_position_SNP_R : numpy.ndarray,
+        Positions of the SNPs of the chunk related to the R genome.
+
+    """
+    import pandas as pd
+
+    with pd.read_csv(nom_fichier_mauve, sep="\t", usecols=COLONNES_MAUVE, 
+                     dtype={'SNP pattern': str}, chunksize=taille_bloc) as lecteur :
+        for bloc in lecteur :
+            yield attribuer_parents(bloc['SNP pattern'],
+                                    bloc['sequence_1_PosInContg'],
+                                    bloc['sequence_2_PosInContg'],
+                                    bloc['sequence_3_PosInContg'])
+
+
 
 def SNP_chaine(liste_appartenance_SNP, base=1, nombre_suite_P1=2, nombre_suite_P2=2):
     """
@@ -405,6 +567,14 @@ def calcul_des_sommes_rapport_donneur(chaine_borne_SNP, chaine_borne_donneur_sta
     return somme_P1_liste, somme_P2_liste
 
 
+def nom_sortie(nom_fichier_entree):
+    """
+    Output file name (without extension) of an input file : name of the input file followed by "_sortie" and the date.
+    """
+    now = datetime.now()
+    return os.path.splitext(nom_fichier_entree)[0] + "_sortie" + now.strftime("_%d_%m_%Y %H_%M")
+
+
 def creer_excel(nom_fichier_entree, chaine_borne_SNP, liste_debut, liste_fin, liste_P1_debut, liste_P1_fin, liste_P2_debut, liste_P2_fin,chaine_borne_cote_donneur,liste_cote_donneur_start, liste_cote_donneur_end, somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, somme_donneur_indices_donneur, liste_somme):
     """
     
@@ -451,9 +621,9 @@ def creer_excel(nom_fichier_entree, chaine_borne_SNP, liste_debut, liste_fin, li
     Excel file containing all the results.
 
     """
-    now = datetime.now()
-    nom_fichier = nom_fichier_entree[: (len(nom_fichier_entree) - 5)] +"_sortie"  + now.strftime("_%d_%m_%Y %H_%M") + ".xlsx"
-    xlsxwriter.Workbook(nom_fichier)
+    import pandas as pd
+
+    nom_fichier = nom_sortie(nom_fichier_entree) + ".xlsx"
     
     donnee = pd.DataFrame({"Pattern" : chaine_borne_SNP,
                   "Start" : liste_debut, 
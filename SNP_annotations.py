@@ -0,0 +1,324 @@
+################################## Main goal ##################################
+# Intersection of the segments with the annotations of the receptor genome
+# (biosynthetic gene clusters, genes). The annotations (GFF3, e.g. the antiSMASH
+# GFF output, or a simple table) are loaded once in a sorted-endpoint index:
+# the overlaps of all the segments of a recombinant are found with a few
+# searchsorted calls, and the donor part of every annotation is obtained from
+# prefix sums of the donor segment lengths. Each annotation is then classified
+# per recombinant as receptor, donor or hybrid.
+#
+# Usage : python SNP_annotations.py regions.gff manifeste.tsv -o classes_BGC.tsv
+###############################################################################
+
+import argparse
+import os
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+
+# Classes des annotations pour un recombinant (codes 0 a 3)
+CLASSES = ("non couvert", "recepteur", "donneur", "hybride")
+
+# Attributs GFF utilises comme nom de l'annotation, par ordre de preference
+ATTRIBUTS_NOM = ("Name", "locus_tag", "gene", "ID")
+
+
+class Annotations:
+    """
+    Sorted-endpoint index of annotations (intervals of the receptor genome, 1-based, ends included).
+
+    Parameters
+    ----------
+    noms : array-like,
+        Name of each annotation.
+    debuts, fins : array-like,
+        Start and end positions of each annotation.
+    types : array-like, optional
+        Type of each annotation (e.g. GFF feature type). The default is "".
+    facteur_long : int, optional
+        Annotations longer than facteur_long times the median length are kept apart and compared to every query,
+        so that a few very long features do not widen the search of all the others. The default is 64.
+
+    """
+
+    def __init__(self, noms, debuts, fins, types=None, facteur_long=64):
+        debuts = np.asarray(debuts, dtype=np.int64)
+        fins = np.asarray(fins, dtype=np.int64)
+        debuts, fins = np.minimum(debuts, fins), np.maximum(debuts, fins)
+        ordre = np.argsort(debuts, kind="stable")
+        self.noms = np.asarray(noms, dtype=object)[ordre]
+        self.types = (np.full(len(ordre), "", dtype=object) if types is None else np.asarray(types, dtype=object))[ordre]
+        self.debuts = debuts[ordre]
+        self.fins = fins[ordre]
+
+        longueurs = self.fins - self.debuts + 1
+        seuil = facteur_long * (np.median(longueurs) if len(longueurs) else 0)
+        self._longues = np.flatnonzero(longueurs > seuil)
+        self._courtes = np.flatnonzero(longueurs <= seuil)
+        self._longueur_max_courtes = int(longueurs[self._courtes].max()) if len(self._courtes) else 0
+
+    @classmethod
+    def depuis_gff(cls, nom_fichier_gff, types=None, sequence=None):
+        """
+        Load the features of a GFF3 file.
+
+        Parameters
+        ----------
+        nom_fichier_gff : String,
+            GFF3 file name (e.g. antiSMASH or Prokka/NCBI annotation).
+        types : iterable, optional
+            Feature types to keep (e.g. ("region",) for antiSMASH regions, ("gene",)). The default is None (all).
+        sequence : String, optional
+            Sequence (seqid column) to keep. The default is None (all).
+
+        """
+        noms, debuts, fins, types_lus = [], [], [], []
+        with open(nom_fichier_gff, encoding="utf-8") as fichier:
+            for ligne in fichier:
+                if ligne.startswith("##FASTA"):
+                    break
+                if ligne.startswith("#") or not ligne.strip():
+                    continue
+                champs = ligne.rstrip("\n").split("\t")
+                if len(champs) < 9 or (types is not None and champs[2] not in types) or (sequence is not None and champs[0] != sequence):
+                    continue
+                attributs = dict(attribut.split("=", 1) for attribut in champs[8].split(";") if "=" in attribut)
+                nom = next((unquote(attributs[cle]) for cle in ATTRIBUTS_NOM if cle in attributs), "%s_%d" % (champs[2], len(noms)))
+                noms.append(nom)
+                debuts.append(int(champs[3]))
+                fins.append(int(champs[4]))
+                types_lus.append(champs[2])
+        return cls(noms, debuts, fins, types_lus)
+
+    @classmethod
+    def depuis_table(cls, nom_fichier):
+        """
+        Load a CSV/TSV table with the columns Nom, Start, End and optionally Type (e.g. antiSMASH regions exported by hand).
+        """
+        table = pd.read_csv(nom_fichier, sep=None, engine="python", comment="#")
+        return cls(table["Nom"], table["Start"], table["End"], table["Type"] if "Type" in table.columns else None)
+
+    @classmethod
+    def lire(cls, nom_fichier, types=None, sequence=None):
+        """
+        Load a GFF3 file (.gff, .gff3) or an annotation table (any other extension).
+        """
+        if os.path.splitext(nom_fichier)[1].lower() in (".gff", ".gff3"):
+            return cls.depuis_gff(nom_fichier, types, sequence)
+        return cls.depuis_table(nom_fichier)
+
+    def __len__(self):
+        return len(self.debuts)
+
+    def __repr__(self):
+        return "Annotations(%d annotations)" % len(self)
+
+    def chevauchements(self, debuts, fins):
+        """
+        All the (query, annotation) pairs of overlapping intervals.
+
+        Parameters
+        ----------
+        debuts, fins : array-like,
+            Start and end positions of the query intervals (e.g. segments), ends included.
+
+        Returns
+        -------
+        requetes : numpy.ndarray,
+            Index of the query of each pair.
+        annotations : numpy.ndarray,
+            Index of the annotation (in the sorted order of the index) of each pair.
+
+        """
+        debuts = np.asarray(debuts, dtype=np.int64)
+        fins = np.asarray(fins, dtype=np.int64)
+        debuts, fins = np.minimum(debuts, fins), np.maximum(debuts, fins)
+
+        # Annotations courtes : seules celles qui commencent dans [debut - longueur max + 1, fin] peuvent chevaucher
+        debuts_courtes = self.debuts[self._courtes]
+        bas = np.searchsorted(debuts_courtes, debuts - self._longueur_max_courtes + 1, "left")
+        haut = np.searchsorted(debuts_courtes, fins, "right")
+        nombres = haut - bas
+        requetes = np.repeat(np.arange(len(debuts)), nombres)
+        decalages = np.arange(nombres.sum()) - np.repeat(np.cumsum(nombres) - nombres, nombres)
+        candidates = self._courtes[np.repeat(bas, nombres) + decalages]
+        garde = self.fins[candidates] >= debuts[requetes]
+        requetes, candidates = requetes[garde], candidates[garde]
+
+        # Annotations longues : comparees a toutes les requetes
+        if len(self._longues):
+            chevauche = (self.debuts[self._longues][None, :] <= fins[:, None]) & (self.fins[self._longues][None, :] >= debuts[:, None])
+            requetes_longues, longues = np.nonzero(chevauche)
+            requetes = np.concatenate((requetes, requetes_longues))
+            candidates = np.concatenate((candidates, self._longues[longues]))
+            ordre = np.lexsort((candidates, requetes))
+            requetes, candidates = requetes[ordre], candidates[ordre]
+        return requetes, candidates
+
+    def compter(self, debuts, fins):
+        """
+        Number of annotations overlapping each query interval (annotations starting before its end minus those ending before its start).
+        """
+        debuts = np.asarray(debuts, dtype=np.int64)
+        fins = np.asarray(fins, dtype=np.int64)
+        return np.searchsorted(self.debuts, np.maximum(debuts, fins), "right") - np.searchsorted(np.sort(self.fins), np.minimum(debuts, fins), "left")
+
+    def fractions_couvertes(self, debuts, fins):
+        """
+        Number of bases of each annotation covered by a set of disjoint intervals (e.g. the donor segments of a recombinant).
+
+        Parameters
+        ----------
+        debuts, fins : array-like,
+            Start and end positions of the disjoint intervals, ends included. Empty intervals (end < start) are ignored.
+
+        Returns
+        -------
+        bases : numpy.ndarray,
+            Number of covered bases of each annotation (sorted order of the index).
+
+        """
+        debuts = np.asarray(debuts, dtype=np.int64)
+        fins = np.asarray(fins, dtype=np.int64)
+        garde = fins >= debuts
+        ordre = np.argsort(debuts[garde], kind="stable")
+        debuts, fins = debuts[garde][ordre], fins[garde][ordre]
+        longueurs = fins - debuts + 1
+        cumul = np.concatenate(([0], np.cumsum(longueurs)))
+
+        def couvertes_jusqua(x):
+            # Nombre de bases couvertes dans [1, x]
+            k = np.searchsorted(debuts, x, "right") - 1
+            k_valide = np.maximum(k, 0)
+            partiel = np.clip(x - debuts[k_valide] + 1, 0, longueurs[k_valide]) if len(debuts) else 0
+            return np.where(k < 0, 0, cumul[k_valide] + partiel)
+
+        return couvertes_jusqua(self.fins) - couvertes_jusqua(self.debuts - 1)
+
+    def classer(self, segments, donneur, repere, tolerance=0.0):
+        """
+        Classify each annotation for one recombinant as receptor, donor or hybrid.
+
+        Parameters
+        ----------
+        segments : SNP_segments.Segments,
+            Segments of the recombinant, sorted on the receptor genome.
+        donneur : int,
+            Donor genome (1 or 2).
+        repere : String,
+            Receptor coordinate system of the annotations ("P1" or "P2").
+        tolerance : float, optional
+            Fraction of the covered part of an annotation that may come from the other parent without making it hybrid. The default is 0.
+
+        Returns
+        -------
+        classes : numpy.ndarray,
+            Code of the class of each annotation (index in CLASSES, sorted order of the index).
+        fractions_donneur : numpy.ndarray,
+            Donor fraction of the covered part of each annotation (NaN if not covered by any segment).
+
+        """
+        couvertes = self.fractions_couvertes(*segments.projection(repere))
+        donneur_couvertes = self.fractions_couvertes(*segments.parent(donneur).projection(repere))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fractions_donneur = np.where(couvertes > 0, donneur_couvertes / couvertes, np.nan)
+        classes = np.full(len(self), 3, dtype=np.int8)
+        classes[fractions_donneur <= tolerance] = 1
+        classes[fractions_donneur >= 1 - tolerance] = 2
+        classes[couvertes == 0] = 0
+        return classes, fractions_donneur
+
+    def tableau_chevauchements(self, segments, repere):
+        """
+        Overlaps of the segments of one recombinant with the annotations (the cross-reference of the creer_excel() segment sheets).
+
+        Returns
+        -------
+        tableau : pandas.DataFrame,
+            One row per (segment, annotation) pair : segment index, pattern, segment and annotation positions and overlap length.
+
+        """
+        from SNP import LABELS_PARENTS
+
+        debuts, fins = segments.projection(repere)
+        requetes, annotations = self.chevauchements(debuts, fins)
+        debuts_segments = np.minimum(debuts, fins)[requetes].astype(np.int64)
+        fins_segments = np.maximum(debuts, fins)[requetes].astype(np.int64)
+        return pd.DataFrame({"Segment" : requetes,
+                             "Pattern" : LABELS_PARENTS[segments.labels[requetes]],
+                             "Start" : debuts_segments,
+                             "End" : fins_segments,
+                             "Annotation" : self.noms[annotations],
+                             "Type" : self.types[annotations],
+                             "Start annotation" : self.debuts[annotations],
+                             "End annotation" : self.fins[annotations],
+                             "Chevauchement" : np.minimum(fins_segments, self.fins[annotations]) - np.maximum(debuts_segments, self.debuts[annotations]) + 1})
+
+
+def classer_cohorte(annotations, recombinants, tolerance=0.0):
+    """
+    Classify every annotation for every recombinant of a cohort.
+
+    Parameters
+    ----------
+    annotations : Annotations,
+        Index of the annotations of the receptor genome.
+    recombinants : iterable,
+        (name, segments, donneur, repere) of each recombinant (see Annotations.classer()).
+    tolerance : float, optional
+        See Annotations.classer(). The default is 0.
+
+    Returns
+    -------
+    classes : pandas.DataFrame,
+        One row per annotation and one categorical column per recombinant with its class (CLASSES),
+        followed by the number of recombinants of each class.
+
+    """
+    colonnes = {}
+    for nom, segments, donneur, repere in recombinants:
+        codes, _ = annotations.classer(segments, donneur, repere, tolerance)
+        colonnes[nom] = pd.Categorical.from_codes(codes, CLASSES)
+    classes = pd.DataFrame(colonnes, index=pd.Index(annotations.noms, name="Annotation"))
+    classes.insert(0, "Type", annotations.types)
+    classes.insert(1, "Start", annotations.debuts)
+    classes.insert(2, "End", annotations.fins)
+    for classe in CLASSES[1:]:
+        classes["nombre " + classe] = (classes[list(colonnes)] == classe).sum(axis=1) if colonnes else 0
+    return classes
+
+
+def main(arguments=None):
+    from Batch import lire_manifeste
+    from SNP_couverture import segments_taches
+
+    parseur = argparse.ArgumentParser(description="Classify the annotations (BGCs, genes) of the receptor genome as receptor, donor or hybrid in every recombinant of a manifest.")
+    parseur.add_argument("annotations", help="GFF3 file or CSV/TSV table (Nom, Start, End, Type) in receptor coordinates")
+    parseur.add_argument("manifeste", help="CSV/TSV manifest of Batch.py")
+    parseur.add_argument("--recepteur", type=int, default=1, help="receptor genome (1 or 2)")
+    parseur.add_argument("--types", default=None, help="comma separated GFF feature types to keep (e.g. region)")
+    parseur.add_argument("--sequence", default=None, help="GFF sequence (seqid) to keep")
+    parseur.add_argument("--tolerance", type=float, default=0.0, help="fraction of an annotation from the other parent tolerated before it is hybrid")
+    parseur.add_argument("-o", "--sortie", default="classes_annotations.tsv", help="classification table (tab-delimited)")
+    parseur.add_argument("--chevauchements", default=None, help="table of all the segment/annotation overlaps (tab-delimited)")
+    options = parseur.parse_args(arguments)
+
+    annotations = Annotations.lire(options.annotations, options.types.split(",") if options.types else None, options.sequence)
+    repere = "P" + str(options.recepteur)
+    donneur = 3 - options.recepteur
+    recombinants, tableaux = [], []
+    for tache, segments in segments_taches(lire_manifeste(options.manifeste), options.recepteur):
+        nom = os.path.basename(tache['Nom_fichier_tri_P1'])
+        recombinants.append((nom, segments, donneur, repere))
+        if options.chevauchements:
+            tableaux.append(annotations.tableau_chevauchements(segments, repere).assign(Recombinant=nom))
+    classer_cohorte(annotations, recombinants, options.tolerance).to_csv(options.sortie, sep="\t")
+    if options.chevauchements:
+        pd.concat(tableaux, ignore_index=True).to_csv(options.chevauchements, sep="\t", index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+################################## Main goal ##################################
+# Binary archive of a parsed SNP file, opened with mmap, to re-analyse one
+# region (e.g. the terminal arms of the chromosome) without parsing the whole
+# file again. The labelled SNPs are stored once sorted on each coordinate
+# system (P1, P2 and R) with a block index of the sort key, so the SNPs of a
+# coordinate window are found with two searches and returned as zero-copy
+# views that can be given directly to segmenter().
+#
+# File layout : magic "SNPARCH1", header length (uint32), JSON header, then the
+# arrays of each section (labels int8, positions (3, n), block index int64),
+# each aligned on 64 bytes.
+#
+# Usage : python SNP_archive.py fichier_triéP1.xlsm -o fichier.snpa
+#         python SNP_archive.py fichier.snpa --fenetre P1:1-500000
+###############################################################################
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from SNP_segmentation import codes_parents, segmenter
+from SNP_segments import REPERES, _type_positions
+
+
+MAGIQUE = b"SNPARCH1"
+VERSION_ARCHIVE = 1
+ALIGNEMENT = 64
+
+
+def _aligner(position):
+    return -(-position // ALIGNEMENT) * ALIGNEMENT
+
+
+def ecrire_archive(nom_archive, liste_appartenance_SNP, liste_P1, liste_P2, liste_R, taille_bloc=4096):
+    """
+    Write the labelled SNPs of one file in a binary archive.
+
+    Parameters
+    ----------
+    nom_archive : String,
+        Name of the archive file.
+    liste_appartenance_SNP : array-like,
+        Labels of the SNPs ("P1"/"P2" or 1/2), as returned by SNP_parent().
+    liste_P1, liste_P2, liste_R : array-like,
+        Position of each SNP related to the P1, P2 and R genomes.
+    taille_bloc : int, optional
+        Number of SNPs per block of the index. The default is 4096.
+
+    """
+    codes = codes_parents(liste_appartenance_SNP)
+    positions = np.stack([np.asarray(liste_P1), np.asarray(liste_P2), np.asarray(liste_R)])
+    positions = positions.astype(_type_positions(positions))
+    nombre_snp = len(codes)
+
+    sections = {}
+    tableaux = []
+    position = 0
+    entete = {"version" : VERSION_ARCHIVE, "nombre_snp" : nombre_snp, "type_positions" : positions.dtype.str,
+              "taille_bloc" : taille_bloc, "sections" : sections}
+    for i, repere in enumerate(REPERES):
+        # Tri stable : un fichier deja trié sur ce repere garde son ordre
+        ordre = np.argsort(positions[i], kind="stable")
+        section = {"labels" : codes[ordre], "positions" : np.ascontiguousarray(positions[:, ordre])}
+        section["index"] = section["positions"][i, ::taille_bloc].astype(np.int64)
+        sections[repere] = {}
+        for nom, tableau in section.items():
+            sections[repere][nom] = position
+            tableaux.append((position, tableau))
+            position = _aligner(position + tableau.nbytes)
+        sections[repere]["nombre_index"] = len(section["index"])
+
+    # Les positions des tableaux sont relatives a la fin de l'en-tete (alignee)
+    texte = json.dumps(entete).encode()
+    debut_donnees = _aligner(len(MAGIQUE) + 4 + len(texte))
+    with open(nom_archive, "wb") as fichier:
+        fichier.write(MAGIQUE)
+        fichier.write(np.uint32(len(texte)).tobytes())
+        fichier.write(texte)
+        for position_tableau, tableau in tableaux:
+            fichier.seek(debut_donnees + position_tableau)
+            fichier.write(tableau.tobytes())
+        fichier.truncate(debut_donnees + position)
+
+
+def archiver(nom_fichier_snp, nom_archive=None, cache=None, taille_bloc=4096):
+    """
+    Parse a SNP file (Excel or MAUVE export) with SNP_parent() and write its archive.
+
+    Parameters
+    ----------
+    nom_fichier_snp : String,
+        SNP file name.
+    nom_archive : String, optional
+        Name of the archive. The default is the name of the SNP file with the .snpa extension.
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed files. The default is None.
+    taille_bloc : int, optional
+        Number of SNPs per block of the index. The default is 4096.
+
+    Returns
+    -------
+    nom_archive : String,
+        Name of the written archive.
+
+    """
+    from SNP import SNP_parent
+
+    if nom_archive is None:
+        nom_archive = os.path.splitext(nom_fichier_snp)[0] + ".snpa"
+    ecrire_archive(nom_archive, *SNP_parent(nom_fichier_snp, vectorise=True, cache=cache), taille_bloc=taille_bloc)
+    return nom_archive
+
+
+class ArchiveSNP:
+    """
+    Read-only memory-mapped SNP archive (see ecrire_archive()).
+
+    Parameters
+    ----------
+    nom_archive : String,
+        Name of the archive file.
+
+    """
+
+    def __init__(self, nom_archive):
+        self.nom_archive = nom_archive
+        self._octets = np.memmap(nom_archive, dtype=np.uint8, mode="r")
+        if bytes(self._octets[:len(MAGIQUE)]) != MAGIQUE:
+            raise ValueError("%s n'est pas une archive SNP" % nom_archive)
+        longueur = int(self._octets[len(MAGIQUE):len(MAGIQUE) + 4].view(np.uint32)[0])
+        debut_texte = len(MAGIQUE) + 4
+        entete = json.loads(bytes(self._octets[debut_texte:debut_texte + longueur]).decode())
+        if entete["version"] != VERSION_ARCHIVE:
+            raise ValueError("Version d'archive non supportee : %s" % entete["version"])
+        self.nombre_snp = entete["nombre_snp"]
+        self.taille_bloc = entete["taille_bloc"]
+        debut_donnees = _aligner(debut_texte + longueur)
+        type_positions = np.dtype(entete["type_positions"])
+
+        self._sections = {}
+        for repere, section in entete["sections"].items():
+            self._sections[repere] = (self._tableau(debut_donnees + section["labels"], np.int8, (self.nombre_snp,)),
+                                      self._tableau(debut_donnees + section["positions"], type_positions, (3, self.nombre_snp)),
+                                      self._tableau(debut_donnees + section["index"], np.int64, (section["nombre_index"],)))
+
+    def _tableau(self, position, type_tableau, forme):
+        # Vue sans copie d'une partie du fichier
+        taille = int(np.prod(forme)) * np.dtype(type_tableau).itemsize
+        return self._octets[position:position + taille].view(type_tableau).reshape(forme)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def fermer(self):
+        """
+        Release the mapping (the views already returned keep it open until they are deleted).
+        """
+        self._sections = {}
+        self._octets = None
+
+    def __len__(self):
+        return self.nombre_snp
+
+    def __repr__(self):
+        return "ArchiveSNP(%r, %d SNP)" % (self.nom_archive, self.nombre_snp)
+
+    def _chercher(self, repere, valeur, cote):
+        # Recherche d'abord dans l'index des blocs puis dans un seul bloc
+        _, positions, index = self._sections[repere]
+        cles = positions[REPERES.index(repere)]
+        bloc = int(np.searchsorted(index, valeur, cote))
+        bas = max(bloc - 1, 0) * self.taille_bloc
+        haut = min(bloc * self.taille_bloc, self.nombre_snp)
+        return bas + int(np.searchsorted(cles[bas:haut], valeur, cote))
+
+    def indices(self, debut, fin, repere="P1"):
+        """
+        Range [i, j) of the SNPs whose position in repere is in [debut, fin], in the section sorted on repere.
+        """
+        return self._chercher(repere, debut, "left"), self._chercher(repere, fin, "right")
+
+    def fenetre(self, debut=None, fin=None, repere="P1", codes_labels=True):
+        """
+        SNPs of a coordinate window, sorted on the coordinate system of the window.
+
+        Parameters
+        ----------
+        debut, fin : int, optional
+            Bounds (included) of the window. The default is the whole genome.
+        repere : String, optional
+            Coordinate system of the window and of the sort ("P1", "P2" or "R"). The default is "P1".
+        codes_labels : bool, optional
+            If True, the labels are returned as int8 codes (1 = P1, 2 = P2), without copy. If False, as "P1"/"P2" strings. The default is True.
+
+        Returns
+        -------
+        liste_appartenance_SNP, liste_P1, liste_P2, liste_R : numpy.ndarray,
+            Labels and positions of the SNPs of the window (views of the archive, same form as SNP_parent(vectorise=True)).
+
+        """
+        labels, positions, _ = self._sections[repere]
+        i = 0 if debut is None else self._chercher(repere, debut, "left")
+        j = self.nombre_snp if fin is None else self._chercher(repere, fin, "right")
+        labels = labels[i:j]
+        if not codes_labels:
+            from SNP import LABELS_PARENTS
+            labels = LABELS_PARENTS[labels]
+        return (labels, *positions[:, i:j])
+
+    def segmenter(self, debut=None, fin=None, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2):
+        """
+        Segment the SNPs of a window of the receptor genome (repere "P" + base), see SNP_segmentation.segmenter().
+        """
+        return segmenter(*self.fenetre(debut, fin, "P" + str(base)), base, donneur, nombre_suite_P1, nombre_suite_P2)
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Write the binary archive of a SNP file, or read a window of an archive.")
+    parseur.add_argument("fichier", help="SNP file to archive (Excel or MAUVE export), or archive (.snpa) to read")
+    parseur.add_argument("-o", "--sortie", default=None, help="archive name (default: name of the SNP file with the .snpa extension)")
+    parseur.add_argument("--fenetre", default=None, help="window read from the archive, as REPERE:DEBUT-FIN (e.g. P1:1-500000)")
+    parseur.add_argument("--taille-bloc", type=int, default=4096, help="number of SNPs per block of the index")
+    options = parseur.parse_args(arguments)
+
+    if not options.fichier.lower().endswith(".snpa"):
+        print("Archive écrite : " + archiver(options.fichier, options.sortie, taille_bloc=options.taille_bloc))
+        return 0
+
+    with ArchiveSNP(options.fichier) as archive:
+        repere, intervalle = (options.fenetre or "P1:").split(":")
+        debut, _, fin = intervalle.partition("-")
+        colonnes = archive.fenetre(int(debut) if debut else None, int(fin) if fin else None, repere, codes_labels=False)
+        print("\t".join(["Pattern", "P1", "P2", "R"]))
+        for ligne in zip(*(colonne.tolist() for colonne in colonnes)):
+            print("\t".join(map(str, ligne)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+################################## Main goal ##################################
+# Sensitivity of the results to the nb_suite_P1/nb_suite_P2 thresholds. The SNP
+# file is parsed once and its labels run-length encoded once; each threshold
+# pair of the grid is then evaluated on the runs only (O(number of runs)).
+#
+# Usage : python SNP_balayage.py fichier_triéP1.xlsm --base 1 -o balayage.tsv
+###############################################################################
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from SNP_segmentation import codes_parents, series, etats_series, segments_series
+from SNP_segments import matrice_positions
+
+
+def _evaluer(parametres):
+    # Evaluation d'une partie de la grille (fonction de niveau module pour le pool de processus)
+    debuts_series, labels_series, longueurs_series, positions, base, donneur, borne_sup, grille = parametres
+    repere = "P" + str(base)
+    lignes = []
+    liste_segments = []
+    for nombre_suite_P1, nombre_suite_P2 in grille:
+        etats = etats_series(labels_series, longueurs_series, base, nombre_suite_P1, nombre_suite_P2)
+        segments = segments_series(etats, debuts_series, positions, donneur)
+        somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 = segments.sommes_rapport_recombinant(repere, borne_sup)
+        lignes.append({"nb_suite_P1" : nombre_suite_P1,
+                       "nb_suite_P2" : nombre_suite_P2,
+                       "somme P1" : somme_P1[0],
+                       "somme P2" : somme_P2[0],
+                       "min P1 P2" : min_P1_P2[0],
+                       "nombre de fragments P1" : compt_P1[0],
+                       "nombre de fragments P2" : compt_P2[0],
+                       "somme sup" : somme_sup[0],
+                       "nombre de fragments sup" : compt[0]})
+        liste_segments.append(segments)
+    return lignes, liste_segments
+
+
+def balayer_seuils(liste_appartenance_SNP, liste_P1, liste_P2, liste_R, valeurs_P1=range(1, 21), valeurs_P2=range(1, 21), base=1, donneur=2, borne_sup=1000, nombre_processus=None):
+    """
+    Evaluate the segmentation of one parsed SNP file for every (nb_suite_P1, nb_suite_P2) pair of a grid.
+
+    Parameters
+    ----------
+    liste_appartenance_SNP : array-like,
+        Labels of the SNPs ("P1"/"P2" or 1/2), as returned by SNP_parent().
+    liste_P1, liste_P2, liste_R : array-like,
+        Position of each SNP related to the P1, P2 and R genomes.
+    valeurs_P1 : iterable, optional
+        Values of nb_suite_P1 to evaluate. The default is 1 to 20.
+    valeurs_P2 : iterable, optional
+        Values of nb_suite_P2 to evaluate. The default is 1 to 20.
+    base : int, optional
+        Receptor genome (1 or 2); the file must be sorted on it. The default is 1.
+    donneur : int, optional
+        Donor genome (1 or 2). The default is 2.
+    borne_sup : int, optional
+        Length threshold of 'somme sup' and 'nombre de fragments sup'. The default is 1000.
+    nombre_processus : int, optional
+        If given, the grid is split over this number of worker processes. The default is None (no parallelism).
+
+    Returns
+    -------
+    tableau : pandas.DataFrame,
+        One row per threshold pair with the sums (relative to the receptor) and fragment counts.
+    segments : dict,
+        SNP_segments.Segments of each (nb_suite_P1, nb_suite_P2) pair.
+
+    """
+    debuts_series, labels_series, longueurs_series = series(codes_parents(liste_appartenance_SNP))
+    positions = matrice_positions(liste_P1, liste_P2, liste_R)
+    grille = [(int(nombre_suite_P1), int(nombre_suite_P2)) for nombre_suite_P1 in valeurs_P1 for nombre_suite_P2 in valeurs_P2]
+    commun = (debuts_series, labels_series, longueurs_series, positions, base, donneur, borne_sup)
+
+    if nombre_processus is None or nombre_processus <= 1:
+        resultats = [_evaluer(commun + (grille,))]
+    else:
+        morceaux = [morceau.tolist() for morceau in np.array_split(np.array(grille, dtype=np.int64).reshape(-1, 2), nombre_processus) if len(morceau)]
+        with ProcessPoolExecutor(max_workers=nombre_processus) as executeur:
+            resultats = list(executeur.map(_evaluer, [commun + ([tuple(paire) for paire in morceau],) for morceau in morceaux]))
+
+    lignes = [ligne for lignes_morceau, _ in resultats for ligne in lignes_morceau]
+    liste_segments = [segments for _, segments_morceau in resultats for segments in segments_morceau]
+    return pd.DataFrame(lignes), dict(zip(grille, liste_segments))
+
+
+def main(arguments=None):
+    from SNP import SNP_parent
+
+    parseur = argparse.ArgumentParser(description="Evaluate a grid of nb_suite_P1/nb_suite_P2 thresholds on one SNP file.")
+    parseur.add_argument("fichier", help="SNP file sorted on the receptor genome (Excel or MAUVE export)")
+    parseur.add_argument("--base", type=int, default=1, help="receptor genome the file is sorted on (1 or 2)")
+    parseur.add_argument("--max-P1", type=int, default=20, help="largest nb_suite_P1 evaluated")
+    parseur.add_argument("--max-P2", type=int, default=20, help="largest nb_suite_P2 evaluated")
+    parseur.add_argument("--borne-sup", type=int, default=1000)
+    parseur.add_argument("-j", "--processus", type=int, default=None, help="number of worker processes")
+    parseur.add_argument("-o", "--sortie", default="balayage.tsv", help="output table (tab-delimited)")
+    options = parseur.parse_args(arguments)
+
+    tableau, _ = balayer_seuils(*SNP_parent(options.fichier, vectorise=True),
+                                range(1, options.max_P1 + 1), range(1, options.max_P2 + 1),
+                                options.base, 3 - options.base, options.borne_sup, options.processus)
+    tableau.to_csv(options.sortie, sep="\t", index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,321 @@
+################################## Main goal ##################################
+# Scaling benchmark of the SNP pipeline on synthetic MAUVE SNP exports. A
+# recombinant is simulated (receptor genome with donor tracts of configurable
+# number and length distribution, SNP density, rate of N bases), then each stage
+# of the pipeline is timed and its peak memory measured for increasing numbers
+# of SNPs. Results are saved as JSON so that versions can be compared.
+#
+# Usage : python SNP_benchmark.py --tailles 10000 100000 1000000 -o bench.json
+#         python SNP_benchmark.py --comparer ancien.json nouveau.json
+###############################################################################
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import SNP
+from SNP_segmentation import segmenter
+
+
+TAILLES_DEFAUT = (10000, 100000, 1000000, 5000000)
+# Nombre maximal de lignes d'une feuille Excel
+LIGNES_MAX_EXCEL = 1048575
+
+
+def generer_snp_mauve(longueur_genome=10000000, nombre_snp=None, densite_snp=0.01, nombre_fragments=50,
+                      longueur_fragment=50000, distribution_fragments="exponentielle", taux_n=0.001, graine=0):
+    """
+    Simulate the MAUVE SNP export of a recombinant (P1 receptor, P2 donor), sorted by positions on P1.
+
+    Parameters
+    ----------
+    longueur_genome : int, optional
+        Length of the genomes. The default is 10 Mb.
+    nombre_snp : int, optional
+        Number of SNPs. The default is None (longueur_genome * densite_snp).
+    densite_snp : float, optional
+        Number of SNPs per base between the parents. The default is 0.01.
+    nombre_fragments : int, optional
+        Number of donor tracts. The default is 50.
+    longueur_fragment : int, optional
+        Mean length of the donor tracts. The default is 50 kb.
+    distribution_fragments : String, optional
+        Length distribution of the donor tracts, "exponentielle", "lognormale" or "fixe". The default is "exponentielle".
+    taux_n : float, optional
+        Rate of N bases in the SNP patterns. The default is 0.001.
+    graine : int, optional
+        Seed of the random generator. The default is 0.
+
+    Returns
+    -------
+    mon_fichier : pandas.DataFrame,
+        Columns 'SNP pattern' and 'sequence_{1,2,3}_PosInContg', as in the MAUVE export.
+
+    """
+    generateur = np.random.default_rng(graine)
+    if nombre_snp is None:
+        nombre_snp = int(longueur_genome * densite_snp)
+    nombre_snp = min(nombre_snp, longueur_genome)
+
+    positions_P1 = np.sort(generateur.choice(longueur_genome, nombre_snp, replace=False)) + 1
+    # Petites insertions/deletions entre les genomes : decalages cumules, positions toujours croissantes
+    positions_P2 = positions_P1 + np.cumsum(generateur.integers(-1, 2, nombre_snp) * (generateur.random(nombre_snp) < 0.01))
+    positions_P2 = np.maximum.accumulate(np.maximum(positions_P2, 1))
+    positions_R = positions_P1 + np.cumsum(generateur.integers(-1, 2, nombre_snp) * (generateur.random(nombre_snp) < 0.01))
+    positions_R = np.maximum.accumulate(np.maximum(positions_R, 1))
+
+    # Fragments du donneur le long de P1
+    if distribution_fragments == "lognormale":
+        longueurs = generateur.lognormal(np.log(longueur_fragment) - 0.5, 1.0, nombre_fragments)
+    elif distribution_fragments == "fixe":
+        longueurs = np.full(nombre_fragments, float(longueur_fragment))
+    else:
+        longueurs = generateur.exponential(longueur_fragment, nombre_fragments)
+    debuts = generateur.integers(1, longueur_genome, nombre_fragments)
+    couverture = np.zeros(longueur_genome + 2, np.int32)
+    np.add.at(couverture, debuts, 1)
+    np.add.at(couverture, np.minimum(debuts + longueurs.astype(np.int64), longueur_genome + 1), -1)
+    donneur = np.cumsum(couverture)[positions_P1] > 0
+
+    # Motifs : base de P1, base differente de P2, base du recombinant selon le fragment
+    bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+    base_P1 = generateur.integers(0, 4, nombre_snp)
+    base_P2 = (base_P1 + generateur.integers(1, 4, nombre_snp)) % 4
+    motifs = np.empty((nombre_snp, 3), np.uint8)
+    motifs[:, 0] = bases[base_P1]
+    motifs[:, 1] = bases[base_P2]
+    motifs[:, 2] = np.where(donneur, motifs[:, 1], motifs[:, 0])
+    avec_n = generateur.random(nombre_snp) < taux_n
+    motifs[avec_n, generateur.integers(0, 3, int(avec_n.sum()))] = ord("N")
+
+    return pd.DataFrame({'SNP pattern' : np.frombuffer(motifs.tobytes(), dtype="S3").astype("U3"),
+                         'sequence_1_PosInContg' : positions_P1,
+                         'sequence_2_PosInContg' : positions_P2,
+                         'sequence_3_PosInContg' : positions_R})
+
+
+def ecrire_export_mauve(mon_fichier, nom_fichier):
+    """
+    Write a simulated SNP table as a tab-delimited MAUVE SNP export.
+    """
+    mon_fichier.to_csv(nom_fichier, sep="\t", index=False)
+
+
+def mesurer(fonction, *arguments, memoire=True):
+    """
+    Call fonction(*arguments) and measure its wall time and CPU time, then its peak of traced memory.
+    
+    The memory is measured in a second call under tracemalloc, which would otherwise slow down the pure Python functions.
+
+    Parameters
+    ----------
+    fonction : function,
+        Stage to measure.
+    *arguments :
+        Arguments of the stage.
+    memoire : bool, optional
+        Measure the peak memory (second call). The default is True.
+
+    Returns
+    -------
+    resultat : object,
+        Return value of the function.
+    mesure : dict,
+        'temps_s', 'temps_cpu_s' and 'memoire_pic_octets' (None if not measured).
+
+    """
+    debut, debut_cpu = time.perf_counter(), time.process_time()
+    resultat = fonction(*arguments)
+    mesure = {"temps_s" : time.perf_counter() - debut, "temps_cpu_s" : time.process_time() - debut_cpu, "memoire_pic_octets" : None}
+    if memoire:
+        tracemalloc.start()
+        fonction(*arguments)
+        mesure["memoire_pic_octets"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return resultat, mesure
+
+
+def mesurer_pipeline(nombre_snp, dossier, excel=False, reference=True, memoire=True, graine=0, **parametres):
+    """
+    Measure every stage of the pipeline on one simulated recombinant.
+
+    Parameters
+    ----------
+    nombre_snp : int,
+        Number of simulated SNPs.
+    dossier : String,
+        Directory of the temporary input and output files.
+    excel : bool, optional
+        Also measure SNP_parent() on an Excel input, the only input read by the legacy row loop (limited to 1048575 SNPs). The default is False.
+    reference : bool, optional
+        Measure the list based functions of SNP.py (slow on millions of SNPs). The default is True.
+    memoire : bool, optional
+        Measure the peak memory of each stage (each stage is then run twice). The default is True.
+    graine : int, optional
+        Seed of the simulation. The default is 0.
+    **parametres :
+        Other parameters of generer_snp_mauve().
+
+    Returns
+    -------
+    resultats : list,
+        One dictionary per stage with the number of SNPs and the measures.
+
+    """
+    resultats = []
+
+    def enregistrer(etape, fonction, *arguments):
+        resultat, mesure = mesurer(fonction, *arguments, memoire=memoire)
+        resultats.append(dict(taille=nombre_snp, etape=etape, **mesure))
+        return resultat
+
+    mon_fichier = generer_snp_mauve(nombre_snp=nombre_snp, graine=graine, **parametres)
+    nom_mauve = os.path.join(dossier, "SNP_%d_triP1.snps" % nombre_snp)
+    ecrire_export_mauve(mon_fichier, nom_mauve)
+    if excel and nombre_snp <= LIGNES_MAX_EXCEL:
+        nom_excel = os.path.join(dossier, "SNP_%d_triP1.xlsx" % nombre_snp)
+        mon_fichier.to_excel(nom_excel, index=False)
+        enregistrer("SNP_parent (Excel)", SNP.SNP_parent, nom_excel)
+    del mon_fichier
+
+    donnees = enregistrer("SNP_parent vectorise (MAUVE)", SNP.SNP_parent, nom_mauve, True)
+    donnees_P2 = SNP.trier_SNP(*donnees, genome=2)
+    segmentation = enregistrer("segmenter", segmenter, *donnees, 1, 2, 2, 2)
+    segmentation_P2 = segmenter(*donnees_P2, 1, 2, 2, 2)
+
+    if reference:
+        liste_parent, liste_P1, liste_P2, liste_R = enregistrer("SNP_parent listes (MAUVE)", SNP.SNP_parent, nom_mauve)
+        chaine_SNP = enregistrer("SNP_chaine", SNP.SNP_chaine, liste_parent, 1, 2, 2)
+        liste_taille_snp = enregistrer("compteur_snp", SNP.compteur_snp, chaine_SNP)
+        bornes = enregistrer("chaine_borne", SNP.chaine_borne, chaine_SNP, liste_P1, liste_P2, liste_R, 2)
+        sommes = enregistrer("calcul_des_sommes_rapport_recombinant", SNP.calcul_des_sommes_rapport_recombinant, bornes[0], bornes[1], bornes[4], 1000)
+        bornes_P2 = SNP.chaine_borne(segmentation_P2.chaine_SNP.tolist(), *(colonne.tolist() for colonne in donnees_P2[1:]), 2)
+        sommes_donneur = enregistrer("calcul_des_sommes_rapport_donneur", SNP.calcul_des_sommes_rapport_donneur, bornes_P2[0], bornes_P2[2], bornes_P2[5])
+        del chaine_SNP, liste_parent, liste_P1, liste_P2, liste_R
+    else:
+        liste_taille_snp = segmentation.liste_taille_snp.tolist()
+        bornes = segmentation.segments.vers_listes()
+        sommes = segmentation.segments.sommes_rapport_recombinant("P1", 1000)
+        bornes_P2 = segmentation_P2.segments.vers_listes()
+        sommes_donneur = segmentation_P2.segments.sommes_rapport_donneur("P2")
+
+    somme_P1, somme_P2, min_P1_P2, _, _, compt_P1, compt_P2 = sommes
+    # creer_excel() ecrit a cote du fichier d'entree et exige des colonnes de meme longueur
+    enregistrer("creer_excel", SNP.creer_excel, nom_mauve, bornes[0], bornes[3], bornes[6], bornes[1], bornes[4], bornes[2], bornes[5],
+                bornes_P2[0], bornes_P2[2], bornes_P2[5], somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, sommes_donneur[1],
+                liste_taille_snp[:len(bornes[0])] + [""] * max(0, len(bornes[0]) - len(liste_taille_snp)))
+    return resultats
+
+
+def environnement():
+    """
+    Description of the measured version (git commit, Python and library versions, machine).
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {"date" : datetime.now().isoformat(timespec="seconds"),
+            "commit" : commit,
+            "python" : platform.python_version(),
+            "numpy" : np.__version__,
+            "pandas" : pd.__version__,
+            "machine" : platform.platform(),
+            "processeurs" : os.cpu_count()}
+
+
+def lancer(tailles=TAILLES_DEFAUT, excel=False, reference=True, memoire=True, graine=0, **parametres):
+    """
+    Run mesurer_pipeline() for each number of SNPs.
+
+    Returns
+    -------
+    rapport : dict,
+        'environnement', 'parametres' and 'resultats' (list of the measures of every stage and size).
+
+    """
+    resultats = []
+    with tempfile.TemporaryDirectory() as dossier:
+        for taille in tailles:
+            mesures = mesurer_pipeline(int(taille), dossier, excel, reference, memoire, graine, **parametres)
+            for mesure in mesures:
+                pic = "" if mesure["memoire_pic_octets"] is None else "%9.1f Mo" % (mesure["memoire_pic_octets"] / 2**20)
+                print("%9d SNP  %-40s %9.3f s  %s" % (mesure["taille"], mesure["etape"], mesure["temps_s"], pic), flush=True)
+            resultats.extend(mesures)
+    return {"environnement" : environnement(),
+            "parametres" : dict(parametres, tailles=list(tailles), graine=graine),
+            "resultats" : resultats}
+
+
+def comparer(nom_fichier_reference, nom_fichier_nouveau, tolerance=0.2):
+    """
+    Compare two JSON reports and return the stages slower (or using more memory) than the reference by more than tolerance.
+
+    Parameters
+    ----------
+    nom_fichier_reference : String,
+        JSON report of the reference version.
+    nom_fichier_nouveau : String,
+        JSON report of the new version.
+    tolerance : float, optional
+        Relative increase considered as a regression. The default is 0.2.
+
+    Returns
+    -------
+    comparaison : pandas.DataFrame,
+        One row per (taille, etape) present in both reports with the ratios nouveau/reference and a 'regression' flag.
+
+    """
+    tableaux = []
+    for nom_fichier in (nom_fichier_reference, nom_fichier_nouveau):
+        with open(nom_fichier, encoding="utf-8") as fichier:
+            tableaux.append(pd.DataFrame(json.load(fichier)["resultats"]))
+    comparaison = tableaux[0].merge(tableaux[1], on=["taille", "etape"], suffixes=("_reference", "_nouveau"))
+    comparaison["ratio_temps"] = comparaison["temps_s_nouveau"] / comparaison["temps_s_reference"]
+    comparaison["ratio_memoire"] = comparaison["memoire_pic_octets_nouveau"] / comparaison["memoire_pic_octets_reference"].clip(lower=1)
+    comparaison["regression"] = (comparaison["ratio_temps"] > 1 + tolerance) | (comparaison["ratio_memoire"].fillna(1) > 1 + tolerance)
+    return comparaison
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Scaling benchmark of the SNP pipeline on synthetic MAUVE SNP exports.")
+    parseur.add_argument("--tailles", type=int, nargs="+", default=list(TAILLES_DEFAUT), help="numbers of SNPs simulated")
+    parseur.add_argument("--longueur-genome", type=int, default=10000000)
+    parseur.add_argument("--fragments", type=int, default=50, help="number of donor tracts")
+    parseur.add_argument("--longueur-fragment", type=int, default=50000, help="mean length of the donor tracts")
+    parseur.add_argument("--distribution", default="exponentielle", choices=["exponentielle", "lognormale", "fixe"])
+    parseur.add_argument("--taux-n", type=float, default=0.001)
+    parseur.add_argument("--graine", type=int, default=0)
+    parseur.add_argument("--excel", action="store_true", help="also measure the Excel input (up to 1048575 SNPs)")
+    parseur.add_argument("--sans-reference", action="store_true", help="skip the list based functions of SNP.py")
+    parseur.add_argument("--sans-memoire", action="store_true", help="do not measure the peak memory (each stage run once)")
+    parseur.add_argument("-o", "--sortie", default="benchmark_SNP.json")
+    parseur.add_argument("--comparer", nargs=2, metavar=("REFERENCE", "NOUVEAU"), help="compare two JSON reports instead of measuring")
+    options = parseur.parse_args(arguments)
+
+    if options.comparer:
+        comparaison = comparer(*options.comparer)
+        print(comparaison[["taille", "etape", "ratio_temps", "ratio_memoire", "regression"]].to_string(index=False))
+        return 1 if comparaison["regression"].any() else 0
+
+    rapport = lancer(options.tailles, options.excel, not options.sans_reference, not options.sans_memoire, options.graine,
+                     longueur_genome=options.longueur_genome, nombre_fragments=options.fragments,
+                     longueur_fragment=options.longueur_fragment, distribution_fragments=options.distribution,
+                     taux_n=options.taux_n)
+    with open(options.sortie, "w", encoding="utf-8") as fichier:
+        json.dump(rapport, fichier, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
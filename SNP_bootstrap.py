@@ -0,0 +1,278 @@
+################################## Main goal ##################################
+# Confidence intervals of the results of one recombinant by resampling the SNP
+# calls : bootstrap of the SNPs (resampling with replacement, in genome order)
+# and/or random label errors. The segmentation is run again on each replicate
+# and the percentiles of the sums, fragment counts and breakpoint positions
+# give the intervals.
+#
+# Replicates are processed by batches : the perturbations, the run-length
+# encoding and the SNP_chaine() hysteresis of all the replicates of a batch
+# are computed at once on the concatenated replicates; only the segments
+# (O(number of segments)) are built replicate by replicate. Batches can be
+# spread over a process pool.
+#
+# Usage : python SNP_bootstrap.py fichier_triéP1.xlsm --base 1 -n 1000 -j 4
+###############################################################################
+
+import argparse
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from SNP_segmentation import codes_parents, etat_initial, segmenter
+from SNP_segments import Segments, matrice_positions
+
+
+ResultatBootstrap = namedtuple("ResultatBootstrap", ["intervalles", "points_rupture", "repliques"])
+
+STATISTIQUES = ["somme P1", "somme P2", "nombre de fragments P1", "nombre de fragments P2", "somme sup", "nombre de fragments sup"]
+
+# Donnees partagees par les lots d'un processus (envoyees une seule fois par processus)
+_donnees_processus = None
+
+
+def _initialiser(donnees):
+    global _donnees_processus
+    _donnees_processus = donnees
+
+
+def _statistiques(segments, repere, borne_sup):
+    somme_P1, somme_P2, _, somme_sup, compt, compt_P1, compt_P2 = segments.sommes_rapport_recombinant(repere, borne_sup)
+    return [somme_P1[0], somme_P2[0], compt_P1[0], compt_P2[0], somme_sup[0], compt[0]]
+
+
+def _perturbations(generateur, n, nombre, reechantillonner, taux_erreur):
+    # Indices des SNP de chaque replique (ordre du genome conserve) et indices (dans le lot aplati) des labels inverses
+    if reechantillonner:
+        # Tirage avec remise en O(n) : nombre de tirages de chaque SNP, puis repetition dans l'ordre
+        indices = np.stack([np.repeat(np.arange(n), np.bincount(generateur.integers(0, n, n), minlength=n)) for _ in range(nombre)])
+    else:
+        indices = np.broadcast_to(np.arange(n), (nombre, n))
+    inverses = None
+    if taux_erreur > 0:
+        # Erreurs independantes de probabilite taux_erreur : nombre binomial puis positions distinctes
+        inverses = np.sort(generateur.choice(nombre * n, generateur.binomial(nombre * n, taux_erreur), replace=False))
+    return indices, inverses
+
+
+def segments_lot(codes, positions, indices, inverses, base, donneur, nombre_suite_P1, nombre_suite_P2):
+    """
+    Segments of a batch of replicates with the SNP_chaine() rule, computed together on the concatenated replicates.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray,
+        Labels (1 or 2) of the original SNPs.
+    positions : numpy.ndarray,
+        (3, n) positions of the original SNPs.
+    indices : numpy.ndarray,
+        (nombre, n) indices of the original SNPs of each replicate.
+    inverses : numpy.ndarray,
+        Indices (in the flattened (nombre, n) batch) of the inverted labels, or None.
+    base, donneur, nombre_suite_P1, nombre_suite_P2 :
+        See SNP_segmentation.segmenter().
+
+    Returns
+    -------
+    liste_segments : list,
+        SNP_segments.Segments of each replicate (same as segmenter() on the replicate).
+
+    """
+    nombre, n = indices.shape
+    if n < 2:
+        return [Segments.vide() for _ in range(nombre)]
+    tous = indices.ravel()
+    labels = codes[tous]
+    if inverses is not None:
+        labels[inverses] = 3 - labels[inverses]
+    decalages = np.arange(nombre) * n
+
+    # Series de labels, coupees au debut de chaque replique
+    coupure = labels[1:] != labels[:-1]
+    coupure[decalages[1:] - 1] = True
+    debuts_series = np.concatenate([[0], np.flatnonzero(coupure) + 1])
+    longueurs_series = np.diff(np.append(debuts_series, len(labels)))
+    labels_series = labels[debuts_series]
+    replique_series = debuts_series // n
+    premiere_serie = np.searchsorted(debuts_series, decalages)
+
+    # Hysteresis de SNP_chaine() : derniere serie assez longue de la meme replique
+    seuils = np.where(labels_series == 1, nombre_suite_P1, nombre_suite_P2)
+    derniere = np.maximum.accumulate(np.where(longueurs_series >= seuils, np.arange(len(debuts_series)), premiere_serie[replique_series] - 1))
+    etats = np.where(derniere >= premiere_serie[replique_series], labels_series[derniere], etat_initial(base)).astype(np.int8)
+
+    # Transitions de la chaine dans chaque replique (1 <= i <= n-3 comme chaine_borne())
+    transitions = np.flatnonzero((etats[1:] != etats[:-1]) & (replique_series[1:] == replique_series[:-1])) + 1
+    bornes = debuts_series[transitions] - 1
+    locales = bornes - replique_series[transitions] * n
+    garde = (locales >= 1) & (locales <= n - 3)
+    transitions, bornes = transitions[garde], bornes[garde]
+    coupes = np.searchsorted(replique_series[transitions], np.arange(1, nombre))
+
+    liste_segments = []
+    for k, (transitions_k, bornes_k) in enumerate(zip(np.split(transitions, coupes), np.split(bornes, coupes))):
+        # Positions utiles seulement : premier SNP, SNP i et i+1 de chaque borne, dernier SNP
+        colonnes = np.concatenate([[decalages[k]], np.column_stack([bornes_k, bornes_k + 1]).ravel(), [decalages[k] + n - 1]])
+        reduites = positions[:, tous[colonnes]]
+        liste_segments.append(Segments.depuis_transitions(etats[premiere_serie[k]], 1 + 2 * np.arange(len(bornes_k)),
+                                                          etats[transitions_k - 1], etats[transitions_k], reduites, donneur))
+    return liste_segments
+
+
+def _evaluer_lot(parametres):
+    # Un lot de repliques (fonction de niveau module pour le pool de processus)
+    graine, nombre = parametres
+    codes, positions, options = _donnees_processus
+    generateur = np.random.default_rng(graine)
+    indices, inverses = _perturbations(generateur, len(codes), nombre, options["reechantillonner"], options["taux_erreur"])
+    repere = "P" + str(options["base"])
+
+    if options["moteur"] == "seuils":
+        liste_segments = segments_lot(codes, positions, indices, inverses, options["base"], options["donneur"],
+                                      options["nombre_suite_P1"], options["nombre_suite_P2"])
+    else:
+        liste_segments = []
+        labels_lot = codes[indices]
+        if inverses is not None:
+            labels_lot.flat[inverses] = 3 - labels_lot.flat[inverses]
+        for k, labels in enumerate(labels_lot):
+            liste_segments.append(segmenter(labels, *positions[:, indices[k]], options["base"], options["donneur"],
+                                            options["nombre_suite_P1"], options["nombre_suite_P2"],
+                                            options["moteur"], options["parametres_moteur"]).segments)
+    statistiques = [_statistiques(segments, repere, options["borne_sup"]) for segments in liste_segments]
+    return statistiques, [segments.points_rupture(repere) for segments in liste_segments]
+
+
+def _apparier(reference, points):
+    # Point de chaque replique le plus proche de chaque point de rupture de reference (NaN si aucun ne lui est associe)
+    apparies = np.full(len(reference), np.nan)
+    if len(reference) == 0 or len(points) == 0:
+        return apparies
+    j = np.clip(np.searchsorted(reference, points), 1, len(reference) - 1) if len(reference) > 1 else np.zeros(len(points), np.intp)
+    if len(reference) > 1:
+        j = np.where(np.abs(points - reference[j - 1]) <= np.abs(points - reference[j]), j - 1, j)
+    distances = np.abs(points - reference[j])
+    ordre = np.lexsort((distances, j))
+    premiers = np.concatenate([[True], j[ordre][1:] != j[ordre][:-1]])
+    apparies[j[ordre][premiers]] = points[ordre][premiers]
+    return apparies
+
+
+def bootstrap(liste_appartenance_SNP, liste_P1, liste_P2, liste_R, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2,
+              nombre_repliques=1000, reechantillonner=True, taux_erreur=0.0, niveau=0.95, borne_sup=1000,
+              taille_lot=16, nombre_processus=None, graine=0, moteur="seuils", parametres_moteur=None):
+    """
+    Confidence intervals of the sums, fragment counts and breakpoints of one recombinant by resampling its SNPs.
+
+    Parameters
+    ----------
+    liste_appartenance_SNP : array-like,
+        Labels of the SNPs ("P1"/"P2" or 1/2), sorted on the receptor genome.
+    liste_P1, liste_P2, liste_R : array-like,
+        Position of each SNP related to the P1, P2 and R genomes.
+    base, donneur, nombre_suite_P1, nombre_suite_P2 :
+        See SNP_segmentation.segmenter().
+    nombre_repliques : int, optional
+        Number of replicates. The default is 1000.
+    reechantillonner : bool, optional
+        If True, each replicate is a bootstrap sample of the SNPs (drawn with replacement, kept in genome order). The default is True.
+    taux_erreur : float, optional
+        Probability of inverting the label of each SNP of a replicate (simulated call errors). The default is 0.
+    niveau : float, optional
+        Level of the percentile intervals. The default is 0.95.
+    borne_sup : int, optional
+        Length threshold of 'somme sup'. The default is 1000.
+    taille_lot : int, optional
+        Number of replicates processed together (memory : about 10 * taille_lot * n bytes). The default is 16.
+    nombre_processus : int, optional
+        If given, the batches are spread over this number of worker processes. The default is None.
+    graine : int, optional
+        Seed; the results do not depend on nombre_processus. The default is 0.
+    moteur : String, optional
+        Segmentation engine ("seuils" is vectorized across replicates, "hmm" segments the replicates one by one). The default is "seuils".
+    parametres_moteur : dict, optional
+        Parameters of the "hmm" engine. The default is None.
+
+    Returns
+    -------
+    resultat : ResultatBootstrap,
+        intervalles : DataFrame with the estimate, mean, standard deviation and interval of each statistic,
+        points_rupture : DataFrame with each breakpoint of the original segmentation, its interval and its support
+        (fraction of the replicates with a breakpoint associated to it),
+        repliques : DataFrame of the statistics of each replicate.
+
+    """
+    codes = codes_parents(liste_appartenance_SNP)
+    positions = matrice_positions(liste_P1, liste_P2, liste_R)
+    repere = "P" + str(base)
+    options = {"reechantillonner" : reechantillonner, "taux_erreur" : taux_erreur, "base" : base, "donneur" : donneur,
+               "nombre_suite_P1" : nombre_suite_P1, "nombre_suite_P2" : nombre_suite_P2, "borne_sup" : borne_sup,
+               "moteur" : moteur, "parametres_moteur" : parametres_moteur}
+
+    reference = segmenter(codes, *positions, base, donneur, nombre_suite_P1, nombre_suite_P2, moteur, parametres_moteur).segments
+    tailles = [min(taille_lot, nombre_repliques - debut) for debut in range(0, nombre_repliques, taille_lot)]
+    lots = list(zip(np.random.SeedSequence(graine).spawn(len(tailles)), tailles))
+    donnees = (codes, positions, options)
+    if nombre_processus is None or nombre_processus <= 1:
+        _initialiser(donnees)
+        try:
+            resultats = [_evaluer_lot(lot) for lot in lots]
+        finally:
+            _initialiser(None)
+    else:
+        with ProcessPoolExecutor(max_workers=nombre_processus, initializer=_initialiser, initargs=(donnees,)) as executeur:
+            resultats = list(executeur.map(_evaluer_lot, lots))
+
+    repliques = pd.DataFrame([ligne for statistiques, _ in resultats for ligne in statistiques], columns=STATISTIQUES)
+    alpha = (1 - niveau) / 2
+    estimation = _statistiques(reference, repere, borne_sup)
+    intervalles = pd.DataFrame({"statistique" : STATISTIQUES,
+                                "estimation" : estimation,
+                                "moyenne" : repliques.mean().values,
+                                "ecart type" : repliques.std().values,
+                                "borne basse" : repliques.quantile(alpha).values,
+                                "borne haute" : repliques.quantile(1 - alpha).values})
+
+    points_reference = reference.points_rupture(repere)
+    apparies = np.array([_apparier(points_reference, points) for _, points_lot in resultats for points in points_lot]).reshape(-1, len(points_reference))
+    support = np.mean(~np.isnan(apparies), axis=0) if len(apparies) else np.zeros(len(points_reference))
+    with warnings.catch_warnings():
+        # Points de rupture sans aucune replique associee : NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        basses = np.nanquantile(apparies, alpha, axis=0) if len(apparies) else np.full(len(points_reference), np.nan)
+        hautes = np.nanquantile(apparies, 1 - alpha, axis=0) if len(apparies) else np.full(len(points_reference), np.nan)
+    points = pd.DataFrame({"position" : points_reference, "borne basse" : basses, "borne haute" : hautes, "support" : support})
+    return ResultatBootstrap(intervalles, points, repliques)
+
+
+def main(arguments=None):
+    from SNP import SNP_parent
+
+    parseur = argparse.ArgumentParser(description="Bootstrap confidence intervals of the analysis of one SNP file.")
+    parseur.add_argument("fichier", help="SNP file sorted on the receptor genome (Excel or MAUVE export)")
+    parseur.add_argument("--base", type=int, default=1, help="receptor genome the file is sorted on (1 or 2)")
+    parseur.add_argument("--nb-suite-P1", type=int, default=2)
+    parseur.add_argument("--nb-suite-P2", type=int, default=2)
+    parseur.add_argument("-n", "--repliques", type=int, default=1000, help="number of replicates")
+    parseur.add_argument("--sans-reechantillonnage", action="store_true", help="do not resample the SNPs (label errors only)")
+    parseur.add_argument("--taux-erreur", type=float, default=0.0, help="probability of inverting each SNP label")
+    parseur.add_argument("--niveau", type=float, default=0.95)
+    parseur.add_argument("-j", "--processus", type=int, default=None, help="number of worker processes")
+    parseur.add_argument("--graine", type=int, default=0)
+    parseur.add_argument("-o", "--sortie", default="bootstrap", help="prefix of the output tables (_intervalles.tsv, _points_rupture.tsv)")
+    options = parseur.parse_args(arguments)
+
+    resultat = bootstrap(*SNP_parent(options.fichier, vectorise=True), options.base, 3 - options.base,
+                         options.nb_suite_P1, options.nb_suite_P2, options.repliques, not options.sans_reechantillonnage,
+                         options.taux_erreur, options.niveau, nombre_processus=options.processus, graine=options.graine)
+    resultat.intervalles.to_csv(options.sortie + "_intervalles.tsv", sep="\t", index=False)
+    resultat.points_rupture.to_csv(options.sortie + "_points_rupture.tsv", sep="\t", index=False)
+    print(resultat.intervalles.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+################################## Main goal ##################################
+# Content-addressed cache of the parsed SNP files. Each input file is identified
+# by the hash of its content and of the column schema read, so that a file is
+# decoded only once per run (both receptor/donor orientations) and across runs.
+# Parsed arrays are kept in memory and on disk (numpy .npz columnar files),
+# both bounded in size with least recently used eviction.
+###############################################################################
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+# A incrementer si le format des colonnes stockees change
+VERSION_CACHE = 1
+
+
+class CacheSNP:
+    """
+    Size-bounded memory and disk cache of parsed SNP columns.
+
+    Parameters
+    ----------
+    dossier : String, optional
+        Directory of the on-disk cache. The default is None (memory only).
+    taille_max_memoire : int, optional
+        Maximum number of bytes of arrays kept in memory. The default is 512 MB.
+    taille_max_disque : int, optional
+        Maximum number of bytes of the on-disk cache. The default is 2 GB.
+
+    """
+
+    def __init__(self, dossier=None, taille_max_memoire=512 * 2**20, taille_max_disque=2 * 2**30):
+        self.dossier = dossier
+        self.taille_max_memoire = taille_max_memoire
+        self.taille_max_disque = taille_max_disque
+        self.succes = 0
+        self.echecs = 0
+        self._memoire = OrderedDict()
+        self._taille_memoire = 0
+        self._empreintes = {}
+        if dossier is not None:
+            os.makedirs(dossier, exist_ok=True)
+
+    def cle(self, nom_fichier, schema):
+        """
+        Key of a file: hash of its content and of the schema (columns read, reader version).
+
+        Parameters
+        ----------
+        nom_fichier : String,
+            Name of the input file.
+        schema : list,
+            Names of the columns read from the file.
+
+        Returns
+        -------
+        cle : String,
+            Hexadecimal key of the file.
+
+        """
+        etat = os.stat(nom_fichier)
+        identite = (os.path.abspath(nom_fichier), etat.st_size, etat.st_mtime_ns)
+        empreinte = self._empreintes.get(identite)
+        if empreinte is None:
+            hachage = hashlib.sha256()
+            with open(nom_fichier, "rb") as fichier:
+                for bloc in iter(lambda: fichier.read(2**20), b""):
+                    hachage.update(bloc)
+            empreinte = hachage.hexdigest()
+            self._empreintes[identite] = empreinte
+        schema = "%d|%s" % (VERSION_CACHE, "|".join(schema))
+        return hashlib.sha256((empreinte + schema).encode("utf-8")).hexdigest()
+
+    def obtenir(self, cle):
+        """
+        Return the cached columns of a key (memory first, then disk), None if absent.
+        """
+        if cle in self._memoire:
+            self._memoire.move_to_end(cle)
+            return self._memoire[cle]
+        if self.dossier is not None:
+            chemin = self._chemin(cle)
+            try:
+                with np.load(chemin) as archive:
+                    colonnes = tuple(archive["colonne_%d" % i] for i in range(len(archive.files)))
+                os.utime(chemin)
+            except (OSError, ValueError):
+                # Absent, ou evince par un autre processus partageant le dossier
+                return None
+            self._garder_en_memoire(cle, colonnes)
+            return colonnes
+        return None
+
+    def stocker(self, cle, colonnes):
+        """
+        Store the columns (tuple of numpy arrays) of a key in memory and on disk.
+        """
+        colonnes = tuple(np.ascontiguousarray(colonne) for colonne in colonnes)
+        self._garder_en_memoire(cle, colonnes)
+        if self.dossier is not None:
+            chemin = self._chemin(cle)
+            temporaire = "%s.%d.tmp.npz" % (chemin, os.getpid())
+            np.savez(temporaire, **{"colonne_%d" % i: colonne for i, colonne in enumerate(colonnes)})
+            os.replace(temporaire, chemin)
+            self._evincer_disque()
+
+    def chercher(self, nom_fichier, schema):
+        """
+        Look a file up in the cache and count the hit or the miss.
+
+        Parameters
+        ----------
+        nom_fichier : String,
+            Name of the input file.
+        schema : list,
+            Names of the columns read from the file.
+
+        Returns
+        -------
+        cle : String,
+            Key of the file (see cle()), to store its columns after a miss.
+        colonnes : tuple,
+            Cached columns of the file, None on a miss.
+
+        """
+        cle = self.cle(nom_fichier, schema)
+        colonnes = self.obtenir(cle)
+        if colonnes is not None:
+            self.succes += 1
+        else:
+            self.echecs += 1
+        return cle, colonnes
+
+    def charger(self, nom_fichier, schema, lecture):
+        """
+        Return the parsed columns of a file, parsing it with lecture() only on a cache miss.
+
+        Parameters
+        ----------
+        nom_fichier : String,
+            Name of the input file.
+        schema : list,
+            Names of the columns read by lecture().
+        lecture : function,
+            Function taking the file name and returning a tuple of numpy arrays.
+
+        Returns
+        -------
+        colonnes : tuple,
+            Tuple of numpy arrays returned by lecture().
+
+        """
+        cle, colonnes = self.chercher(nom_fichier, schema)
+        if colonnes is not None:
+            return colonnes
+        colonnes = lecture(nom_fichier)
+        self.stocker(cle, colonnes)
+        return colonnes
+
+    def vider(self):
+        """
+        Empty the memory cache (the on-disk files are kept).
+        """
+        self._memoire.clear()
+        self._taille_memoire = 0
+
+    def _chemin(self, cle):
+        return os.path.join(self.dossier, cle + ".npz")
+
+    def _garder_en_memoire(self, cle, colonnes):
+        taille = sum(colonne.nbytes for colonne in colonnes)
+        if taille > self.taille_max_memoire:
+            return
+        if cle in self._memoire:
+            self._taille_memoire -= sum(colonne.nbytes for colonne in self._memoire.pop(cle))
+        self._memoire[cle] = colonnes
+        self._taille_memoire += taille
+        while self._taille_memoire > self.taille_max_memoire:
+            _, anciennes = self._memoire.popitem(last=False)
+            self._taille_memoire -= sum(colonne.nbytes for colonne in anciennes)
+
+    def _evincer_disque(self):
+        fichiers = []
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".npz") and not nom.endswith(".tmp.npz"):
+                chemin = os.path.join(self.dossier, nom)
+                try:
+                    etat = os.stat(chemin)
+                except OSError:
+                    continue
+                fichiers.append((etat.st_mtime_ns, etat.st_size, chemin))
+        taille = sum(fichier[1] for fichier in fichiers)
+        for _, taille_fichier, chemin in sorted(fichiers):
+            if taille <= self.taille_max_disque:
+                break
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+            taille -= taille_fichier
@@ -0,0 +1,186 @@
+################################## Main goal ##################################
+# Compact storage of the MAUVE SNP tables. Each 'SNP pattern' (bases of P1, P2
+# and R) is packed in one uint8 : 2 bits per base (a, c, g, t) plus an N flag
+# and a flag for the other characters (gaps, IUPAC codes). The positions are
+# stored as uint32. A SNP then uses 13 bytes instead of about 200 with Python
+# strings and lists, and the parent assignment of attribuer_parents() becomes
+# bitwise operations on the codes.
+#
+# Code of a pattern "xyz" (x = P1, y = P2, z = R) :
+#   bits 0-1 : x    bits 2-3 : y    bits 4-5 : z    (a = 0, c = 1, g = 2, t = 3)
+#   bit 6    : at least one N (the SNP is discarded, as in SNP_parent())
+#   bit 7    : at least one other character. The bases are then replaced by
+#              codes keeping the equalities of z with x and y, so the parent
+#              assignment stays exact but the original bases are not stored.
+###############################################################################
+
+import numpy as np
+import pandas as pd
+
+from SNP import COLONNES_MAUVE, EXTENSIONS_EXCEL, LABELS_PARENTS
+
+
+BASES = "acgt"
+MASQUE_N = 0x40
+MASQUE_AUTRE = 0x80
+
+# Code 2 bits de chaque caractere ASCII (-1 : autre caractere)
+_CODES_ASCII = np.full(128, -1, dtype=np.int16)
+for _code, _base in enumerate(BASES):
+    _CODES_ASCII[ord(_base)] = _code
+
+
+def coder_motifs(SNP_pattern):
+    """
+    Pack the 'SNP pattern' column in one uint8 per SNP (see the code layout above).
+
+    Parameters
+    ----------
+    SNP_pattern : array-like,
+        'SNP pattern' column of the MAUVE SNP file (case is ignored, as in SNP_parent()).
+
+    Returns
+    -------
+    codes : numpy.ndarray,
+        uint8 code of each pattern.
+
+    """
+    motifs = np.char.lower(np.asarray(SNP_pattern, dtype="U3"))
+    caracteres = np.ascontiguousarray(motifs).view(np.uint32).reshape(-1, 3)
+    bases = np.where(caracteres < 128, _CODES_ASCII[np.minimum(caracteres, 127)], -1)
+
+    est_N = (caracteres == ord("n")).any(axis=1)
+    est_autre = ~est_N & (bases < 0).any(axis=1)
+    bases = np.maximum(bases, 0).astype(np.uint8)
+
+    # Autres caracteres : codes conservant les egalites de R avec P1 et P2 (R = 0, P1 = 0 ou 1, P2 = 0 ou 2)
+    bases[est_autre, 0] = (caracteres[est_autre, 2] != caracteres[est_autre, 0])
+    bases[est_autre, 1] = (caracteres[est_autre, 2] != caracteres[est_autre, 1]) * 2
+    bases[est_autre, 2] = 0
+
+    codes = bases[:, 0] | (bases[:, 1] << 2) | (bases[:, 2] << 4)
+    codes[est_N] = MASQUE_N
+    codes[est_autre] |= MASQUE_AUTRE
+    return codes
+
+
+def decoder_motifs(codes):
+    """
+    Unpack uint8 codes to 3-character patterns. Patterns with an N are decoded as "nnn" and patterns with other characters as "???".
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    lettres = np.frombuffer(BASES.encode(), dtype=np.uint8)
+    caracteres = np.stack([lettres[codes & 3], lettres[(codes >> 2) & 3], lettres[(codes >> 4) & 3]], axis=1)
+    caracteres[(codes & MASQUE_N) != 0] = ord("n")
+    caracteres[(codes & MASQUE_AUTRE) != 0] = ord("?")
+    return caracteres.view("S3").ravel().astype("U3")
+
+
+def parents_codes(codes, positions_P1, positions_P2):
+    """
+    Bitwise parent assignment of coded patterns : 1 (P1) if R has the base of P1, else 2 (P2) if R has the base of P2,
+    0 if the SNP is discarded (N, null P1/P2 position or R base different from both parents).
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    valide = ((codes & MASQUE_N) == 0) & (np.asarray(positions_P1) != 0) & (np.asarray(positions_P2) != 0)
+    est_P1 = valide & (((codes ^ (codes >> 4)) & 0x03) == 0)
+    est_P2 = valide & ~est_P1 & (((codes ^ (codes >> 2)) & 0x0C) == 0)
+    return est_P1.astype(np.int8) + 2 * est_P2.astype(np.int8)
+
+
+def _type_positions_compactes(positions):
+    # uint32 si toutes les positions y tiennent, int64 sinon
+    positions = np.asarray(positions)
+    if positions.size == 0 or (positions.min() >= 0 and positions.max() <= np.iinfo(np.uint32).max):
+        return positions.astype(np.uint32)
+    return positions.astype(np.int64)
+
+
+class TableSNP:
+    """
+    Compact MAUVE SNP table : one uint8 pattern code and three uint32 positions per SNP.
+
+    Parameters
+    ----------
+    codes : array-like,
+        uint8 pattern codes (output of coder_motifs()).
+    positions : array-like,
+        (3, n) positions of the SNPs in P1, P2 and R.
+
+    """
+
+    __slots__ = ("codes", "positions")
+
+    def __init__(self, codes, positions):
+        self.codes = np.asarray(codes, dtype=np.uint8)
+        self.positions = _type_positions_compactes(positions).reshape(3, -1)
+
+    @classmethod
+    def depuis_colonnes(cls, SNP_pattern, positions_SNP_P1, positions_SNP_P2, positions_SNP_R):
+        """
+        Build the table from the four MAUVE columns (same arguments as attribuer_parents()).
+        """
+        return cls(coder_motifs(SNP_pattern), np.stack([np.asarray(positions_SNP_P1), np.asarray(positions_SNP_P2), np.asarray(positions_SNP_R)]))
+
+    @classmethod
+    def lire(cls, nom_fichier, taille_bloc=100000):
+        """
+        Read a SNP file (Excel, or native MAUVE export read by chunks of taille_bloc rows) into a compact table.
+        """
+        if nom_fichier.lower().endswith(EXTENSIONS_EXCEL):
+            blocs = [pd.read_excel(nom_fichier, usecols=COLONNES_MAUVE)]
+        else:
+            blocs = pd.read_csv(nom_fichier, sep="\t", usecols=COLONNES_MAUVE, dtype={'SNP pattern': str}, chunksize=taille_bloc)
+        tables = [cls.depuis_colonnes(*(bloc[colonne] for colonne in COLONNES_MAUVE)) for bloc in blocs]
+        return cls.concatener(tables)
+
+    @classmethod
+    def concatener(cls, tables):
+        """
+        Concatenate several tables (e.g. the chunks of one file).
+        """
+        if not tables:
+            return cls(np.array([], dtype=np.uint8), np.zeros((3, 0), dtype=np.uint32))
+        return cls(np.concatenate([table.codes for table in tables]), np.concatenate([table.positions for table in tables], axis=1))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return "TableSNP(%d SNP, %d octets)" % (len(self), self.nbytes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.positions.nbytes
+
+    def motifs(self):
+        """
+        Decoded patterns (see decoder_motifs()).
+        """
+        return decoder_motifs(self.codes)
+
+    def parents(self):
+        """
+        Parent code of each SNP (1 = P1, 2 = P2, 0 = discarded), see parents_codes().
+        """
+        return parents_codes(self.codes, self.positions[0], self.positions[1])
+
+    def attribuer_parents(self, codes_labels=False):
+        """
+        Labelled SNPs, same output as SNP.attribuer_parents() on the original columns.
+
+        Parameters
+        ----------
+        codes_labels : bool, optional
+            If True, the labels are returned as int8 codes (1 = P1, 2 = P2) instead of strings. The default is False.
+
+        Returns
+        -------
+        liste_appartenance_SNP, liste_position_SNP_P1, liste_position_SNP_P2, liste_position_SNP_R : numpy.ndarray,
+            Labels and positions of the kept SNPs.
+
+        """
+        parents = self.parents()
+        garde = parents != 0
+        labels = parents[garde] if codes_labels else LABELS_PARENTS[parents[garde]]
+        return (labels, *self.positions[:, garde])
@@ -0,0 +1,262 @@
+################################## Main goal ##################################
+# Cohort-level map of the donor DNA along the receptor genome. The donor
+# segments of each recombinant (in receptor coordinates) are added to a
+# difference array of the genome length: coverage, donor frequency per window,
+# breakpoint density and breakpoint hotspots are then obtained with prefix sums.
+# The memory is bounded by the genome length (one int32 per base), whatever the
+# number of recombinants.
+#
+# Usage : python SNP_couverture.py manifeste.tsv --longueur 8500000 -o carte.tsv
+###############################################################################
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+class CarteCouverture:
+    """
+    Donor coverage and breakpoint counts of a cohort of recombinants along the receptor genome.
+
+    Parameters
+    ----------
+    longueur_genome : int,
+        Length of the receptor genome (positions 1 to longueur_genome, MAUVE coordinates).
+    taille_fenetre : int, optional
+        Length of the windows of the coverage and breakpoint tables. The default is 10000.
+
+    """
+
+    def __init__(self, longueur_genome, taille_fenetre=10000):
+        if longueur_genome < 1 or taille_fenetre < 1:
+            raise ValueError("longueur_genome et taille_fenetre doivent etre positifs")
+        self.longueur_genome = int(longueur_genome)
+        self.taille_fenetre = int(taille_fenetre)
+        self.nombre_echantillons = 0
+        # difference[i] : variation de la couverture a la base i (0-based), la derniere case recoit les fins en bout de genome
+        self._difference = np.zeros(self.longueur_genome + 1, dtype=np.int32)
+        self._points_rupture = np.zeros(self.nombre_fenetres, dtype=np.int64)
+
+    @property
+    def nombre_fenetres(self):
+        return -(-self.longueur_genome // self.taille_fenetre)
+
+    def bornes_fenetres(self):
+        """
+        Start and end positions (1-based, included) of the windows.
+        """
+        debuts = np.arange(self.nombre_fenetres, dtype=np.int64) * self.taille_fenetre + 1
+        return debuts, np.minimum(debuts + self.taille_fenetre - 1, self.longueur_genome)
+
+    def ajouter(self, debuts, fins, points_rupture=()):
+        """
+        Add the donor segments of one recombinant.
+
+        Parameters
+        ----------
+        debuts, fins : array-like,
+            Start and end positions (1-based, included, in any order) of the donor segments in receptor coordinates.
+            The segments of one recombinant must not overlap. Segments outside the genome are ignored, the others are clipped to it.
+        points_rupture : array-like, optional
+            Positions of the breakpoints of the recombinant. The default is none.
+
+        """
+        debuts = np.asarray(debuts, dtype=np.int64)
+        fins = np.asarray(fins, dtype=np.int64)
+        debuts, fins = np.minimum(debuts, fins), np.maximum(debuts, fins)
+        # Segments hors du genome ignores, les autres tronques a ses bornes
+        dedans = (fins >= 1) & (debuts <= self.longueur_genome)
+        debuts, fins = np.clip(debuts[dedans], 1, self.longueur_genome), np.clip(fins[dedans], 1, self.longueur_genome)
+        np.add.at(self._difference, debuts - 1, 1)
+        np.add.at(self._difference, fins, -1)
+
+        points_rupture = np.clip(np.asarray(points_rupture, dtype=np.int64), 1, self.longueur_genome)
+        self._points_rupture += np.bincount((points_rupture - 1) // self.taille_fenetre, minlength=self.nombre_fenetres)
+        self.nombre_echantillons += 1
+
+    def ajouter_segments(self, segments, donneur, repere):
+        """
+        Add one recombinant from its segments (SNP_segments.Segments of the SNPs sorted on the receptor).
+
+        The breakpoints are placed halfway between the last SNP of a segment and the first SNP of the next one.
+
+        Parameters
+        ----------
+        segments : SNP_segments.Segments,
+            Segments of the recombinant, sorted on the receptor genome.
+        donneur : int,
+            Donor genome (1 or 2).
+        repere : String,
+            Receptor coordinate system ("P1" or "P2").
+
+        """
+        debuts, fins = segments.parent(donneur).projection(repere)
+        self.ajouter(debuts, fins, segments.points_rupture(repere))
+
+    def fusionner(self, autre):
+        """
+        Add the recombinants of another map of the same genome and windows (e.g. computed by another process).
+        """
+        if (autre.longueur_genome, autre.taille_fenetre) != (self.longueur_genome, self.taille_fenetre):
+            raise ValueError("Les cartes n'ont pas la meme longueur de genome ou taille de fenetre")
+        self._difference += autre._difference
+        self._points_rupture += autre._points_rupture
+        self.nombre_echantillons += autre.nombre_echantillons
+        return self
+
+    def couverture(self):
+        """
+        Number of recombinants carrying donor DNA at each base (int32 array of the genome length).
+        """
+        return np.cumsum(self._difference[:-1], dtype=np.int32)
+
+    def couverture_fenetres(self):
+        """
+        Mean number of recombinants carrying donor DNA in each window.
+        """
+        debuts, fins = self.bornes_fenetres()
+        sommes = np.add.reduceat(self.couverture(), debuts - 1, dtype=np.int64)
+        return sommes / (fins - debuts + 1)
+
+    def frequence_fenetres(self):
+        """
+        Mean donor frequency (fraction of the recombinants) in each window.
+        """
+        return self.couverture_fenetres() / max(self.nombre_echantillons, 1)
+
+    def densite_points_rupture(self):
+        """
+        Number of breakpoints of the cohort in each window.
+        """
+        return self._points_rupture.copy()
+
+    def scores_points_rupture(self):
+        """
+        Z-score of the breakpoint count of each window relative to all the windows.
+        """
+        comptes = self._points_rupture.astype(np.float64)
+        ecart_type = comptes.std()
+        if ecart_type == 0:
+            return np.zeros_like(comptes)
+        return (comptes - comptes.mean()) / ecart_type
+
+    def points_chauds(self, seuil_z=3.0):
+        """
+        Breakpoint hotspots : runs of consecutive windows whose breakpoint z-score is at least seuil_z.
+
+        Returns
+        -------
+        points_chauds : pandas.DataFrame,
+            One row per hotspot with its start, end, number of breakpoints and maximal z-score.
+
+        """
+        scores = self.scores_points_rupture()
+        chaud = np.concatenate(([False], scores >= seuil_z, [False]))
+        bords = np.flatnonzero(chaud[1:] != chaud[:-1])
+        premieres, dernieres = bords[0::2], bords[1::2] - 1
+        debuts, fins = self.bornes_fenetres()
+        cumul = np.concatenate(([0], np.cumsum(self._points_rupture)))
+        return pd.DataFrame({"Start" : debuts[premieres],
+                             "End" : fins[dernieres],
+                             "Points de rupture" : cumul[dernieres + 1] - cumul[premieres],
+                             "z max" : [scores[i:j + 1].max() for i, j in zip(premieres, dernieres)]})
+
+    def tableau(self):
+        """
+        Table of the windows : start, end, mean donor coverage and frequency, breakpoints and their z-score.
+        """
+        debuts, fins = self.bornes_fenetres()
+        couverture = self.couverture_fenetres()
+        return pd.DataFrame({"Start" : debuts,
+                             "End" : fins,
+                             "Couverture donneur" : couverture,
+                             "Frequence donneur" : couverture / max(self.nombre_echantillons, 1),
+                             "Points de rupture" : self._points_rupture,
+                             "z points de rupture" : self.scores_points_rupture()})
+
+
+def segments_taches(taches, recepteur=1, cache=None):
+    """
+    Segment the recombinants of a batch manifest, all analysed with the same receptor.
+
+    Parameters
+    ----------
+    taches : list,
+        Jobs as returned by Batch.lire_manifeste().
+    recepteur : int, optional
+        Receptor genome (1 or 2). The default is 1.
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed input files. The default is None.
+
+    Yields
+    ------
+    tache : dict,
+        The job.
+    segments : SNP_segments.Segments,
+        Segments of the SNPs sorted on the receptor.
+
+    """
+    from SNP import SNP_parent, trier_SNP
+    from SNP_segmentation import segmenter
+
+    for tache in taches:
+        nom_fichier = tache['Nom_fichier_tri_P%d' % recepteur]
+        if nom_fichier is None:
+            donnees = trier_SNP(*SNP_parent(tache['Nom_fichier_tri_P1'], vectorise=True, cache=cache), genome=recepteur)
+        else:
+            donnees = SNP_parent(nom_fichier, vectorise=True, cache=cache)
+        yield tache, segmenter(*donnees, recepteur, 3 - recepteur, tache['nb_suite_P1'], tache['nb_suite_P2']).segments
+
+
+def carte_cohorte(taches, longueur_genome, taille_fenetre=10000, recepteur=1, cache=None):
+    """
+    Build the donor map of the recombinants of a batch manifest, all analysed with the same receptor.
+
+    Parameters
+    ----------
+    taches : list,
+        Jobs as returned by Batch.lire_manifeste().
+    longueur_genome : int,
+        Length of the receptor genome.
+    taille_fenetre : int, optional
+        Window length. The default is 10000.
+    recepteur : int, optional
+        Receptor genome (1 or 2). The default is 1.
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed input files. The default is None.
+
+    Returns
+    -------
+    carte : CarteCouverture,
+        Map of the cohort.
+
+    """
+    carte = CarteCouverture(longueur_genome, taille_fenetre)
+    for _, segments in segments_taches(taches, recepteur, cache):
+        carte.ajouter_segments(segments, 3 - recepteur, "P" + str(recepteur))
+    return carte
+
+
+def main(arguments=None):
+    from Batch import lire_manifeste
+
+    parseur = argparse.ArgumentParser(description="Donor coverage and breakpoint hotspots of all the recombinants of a manifest.")
+    parseur.add_argument("manifeste", help="CSV/TSV manifest of Batch.py")
+    parseur.add_argument("--longueur", type=int, required=True, help="length of the receptor genome")
+    parseur.add_argument("--fenetre", type=int, default=10000, help="window length")
+    parseur.add_argument("--recepteur", type=int, default=1, help="receptor genome (1 or 2)")
+    parseur.add_argument("--seuil-z", type=float, default=3.0, help="z-score threshold of the breakpoint hotspots")
+    parseur.add_argument("-o", "--sortie", default="carte_couverture.tsv", help="window table (tab-delimited)")
+    parseur.add_argument("--points-chauds", default=None, help="hotspot table (tab-delimited)")
+    options = parseur.parse_args(arguments)
+
+    carte = carte_cohorte(lire_manifeste(options.manifeste), options.longueur, options.fenetre, options.recepteur)
+    carte.tableau().to_csv(options.sortie, sep="\t", index=False)
+    if options.points_chauds:
+        carte.points_chauds(options.seuil_z).to_csv(options.points_chauds, sep="\t", index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
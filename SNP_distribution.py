@@ -0,0 +1,216 @@
+################################## Main goal ##################################
+# Length distribution of the transferred fragments. The "somme sup" of
+# calcul_des_sommes_rapport_recombinant() gives the number and total length of
+# the fragments longer than one threshold (borne_sup). Here the lengths of the
+# segments are sorted once with their cumulative sum, and the number and total
+# length above any number of thresholds are read by binary search
+# (O(log n) per threshold). Tables (CCDF and histogram) are given per parent
+# and coordinate system, for one recombinant or for a whole cohort.
+#
+# Usage : python SNP_distribution.py manifeste.tsv -o distribution.tsv --cohorte cohorte.tsv
+###############################################################################
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from SNP_segments import REPERES
+
+
+def seuils_defaut(minimum=100, maximum=1000000, par_decade=10):
+    """
+    Thresholds evenly spaced on a log scale, from minimum to maximum (bp), with par_decade thresholds per decade (100, 1000... included).
+    """
+    exposants = np.linspace(np.log10(minimum), np.log10(maximum), int(round(np.log10(maximum / minimum) * par_decade)) + 1)
+    return np.unique(np.round(10**exposants).astype(np.int64))
+
+
+class DistributionLongueurs:
+    """
+    Sorted fragment lengths and their cumulative sum : number and total length of the fragments above any threshold.
+
+    Parameters
+    ----------
+    longueurs : array-like,
+        Fragment lengths (end - start, as in the calcul_des_sommes_* functions), in any order.
+
+    """
+
+    __slots__ = ("longueurs", "_cumul")
+
+    def __init__(self, longueurs):
+        self.longueurs = np.sort(np.asarray(longueurs, dtype=np.int64))
+        # _cumul[i] : somme des i plus petites longueurs
+        self._cumul = np.concatenate(([0], np.cumsum(self.longueurs)))
+
+    @classmethod
+    def concatener(cls, distributions):
+        """
+        Distribution of the fragments of several distributions (e.g. the recombinants of a cohort).
+        """
+        return cls(np.concatenate([distribution.longueurs for distribution in distributions] + [np.zeros(0, np.int64)]))
+
+    def __len__(self):
+        return len(self.longueurs)
+
+    @property
+    def somme(self):
+        return int(self._cumul[-1])
+
+    def _rangs(self, seuils):
+        # Nombre de fragments de longueur <= seuil
+        return np.searchsorted(self.longueurs, np.asarray(seuils, dtype=np.int64), side="right")
+
+    def nombre_sup(self, seuils):
+        """
+        Number of fragments strictly longer than each threshold (compt of calcul_des_sommes_rapport_recombinant()).
+        """
+        return len(self) - self._rangs(seuils)
+
+    def somme_sup(self, seuils):
+        """
+        Total length of the fragments strictly longer than each threshold (somme_sup of calcul_des_sommes_rapport_recombinant()).
+        """
+        return self._cumul[-1] - self._cumul[self._rangs(seuils)]
+
+    def ccdf(self, seuils):
+        """
+        Complementary cumulative distribution at each threshold.
+
+        Returns
+        -------
+        tableau : pandas.DataFrame,
+            One row per threshold : number and total length of the fragments longer than the threshold, and their
+            fraction of the number of fragments and of the total positive length (in a donor coordinate system, the
+            inverted fragments have a negative length).
+
+        """
+        seuils = np.asarray(seuils, dtype=np.int64)
+        nombres = self.nombre_sup(seuils)
+        sommes = self.somme_sup(seuils)
+        return pd.DataFrame({"Seuil" : seuils,
+                             "Nombre de fragments sup" : nombres,
+                             "Somme sup" : sommes,
+                             "Fraction des fragments" : nombres / max(len(self), 1),
+                             "Fraction de la longueur" : sommes / max(int(self.somme_sup([0])[0]), 1)})
+
+    def histogramme(self, bornes):
+        """
+        Number and total length of the fragments in each bin ]bornes[i], bornes[i + 1]].
+
+        Returns
+        -------
+        tableau : pandas.DataFrame,
+            One row per bin with its bounds, number of fragments and total length.
+
+        """
+        bornes = np.asarray(bornes, dtype=np.int64)
+        nombres = self.nombre_sup(bornes)
+        sommes = self.somme_sup(bornes)
+        return pd.DataFrame({"Borne inf" : bornes[:-1],
+                             "Borne sup" : bornes[1:],
+                             "Nombre de fragments" : nombres[:-1] - nombres[1:],
+                             "Somme" : sommes[:-1] - sommes[1:]})
+
+
+def distributions_segments(segments, reperes=REPERES[:2]):
+    """
+    Length distributions of the P1 and P2 segments of one recombinant in each coordinate system.
+
+    Parameters
+    ----------
+    segments : SNP_segments.Segments,
+        Segments of the recombinant.
+    reperes : tuple, optional
+        Coordinate systems. The default is ("P1", "P2").
+
+    Returns
+    -------
+    distributions : dict,
+        DistributionLongueurs of each (parent label "P1"/"P2", coordinate system).
+
+    """
+    distributions = {}
+    for repere in reperes:
+        longueurs = segments.longueurs(repere)
+        for label in (1, 2):
+            distributions["P" + str(label), repere] = DistributionLongueurs(longueurs[segments.labels == label])
+    return distributions
+
+
+def tableau_distributions(distributions, seuils=None):
+    """
+    CCDF tables of several distributions (as returned by distributions_segments()) in one table, with the Parent and Repere columns.
+    """
+    seuils = seuils_defaut() if seuils is None else seuils
+    tableaux = []
+    for (parent, repere), distribution in distributions.items():
+        tableau = distribution.ccdf(seuils)
+        tableau.insert(0, "Repere", repere)
+        tableau.insert(0, "Parent", parent)
+        tableaux.append(tableau)
+    return pd.concat(tableaux, ignore_index=True)
+
+
+def distribution_cohorte(taches, seuils=None, recepteur=1, cache=None):
+    """
+    Fragment length distributions of the recombinants of a batch manifest, all analysed with the same receptor.
+
+    Parameters
+    ----------
+    taches : list,
+        Jobs as returned by Batch.lire_manifeste().
+    seuils : array-like, optional
+        Thresholds (bp). The default is None (seuils_defaut() : 100 bp to 1 Mb).
+    recepteur : int, optional
+        Receptor genome (1 or 2). The default is 1.
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed input files. The default is None.
+
+    Returns
+    -------
+    par_recombinant : pandas.DataFrame,
+        CCDF tables of each recombinant (Recombinant column).
+    cohorte : pandas.DataFrame,
+        CCDF tables of all the fragments of the cohort.
+
+    """
+    from SNP_couverture import segments_taches
+
+    seuils = seuils_defaut() if seuils is None else np.asarray(seuils, dtype=np.int64)
+    tableaux = []
+    cohorte = {}
+    for tache, segments in segments_taches(taches, recepteur, cache):
+        distributions = distributions_segments(segments)
+        tableau = tableau_distributions(distributions, seuils)
+        tableau.insert(0, "Recombinant", os.path.basename(tache['Nom_fichier_tri_P1']))
+        tableaux.append(tableau)
+        for cle, distribution in distributions.items():
+            cohorte.setdefault(cle, []).append(distribution)
+    cohorte = {cle : DistributionLongueurs.concatener(distributions) for cle, distributions in cohorte.items()}
+    return pd.concat(tableaux, ignore_index=True), tableau_distributions(cohorte, seuils)
+
+
+def main(arguments=None):
+    from Batch import lire_manifeste, ecrire_resume
+
+    parseur = argparse.ArgumentParser(description="Length distribution (CCDF) of the P1 and P2 fragments of all the recombinants of a manifest.")
+    parseur.add_argument("manifeste", help="CSV/TSV manifest of Batch.py")
+    parseur.add_argument("-o", "--sortie", default="distribution_longueurs.tsv", help="table of each recombinant (.tsv or .xlsx)")
+    parseur.add_argument("--cohorte", default=None, help="table of the whole cohort (.tsv or .xlsx)")
+    parseur.add_argument("--recepteur", type=int, default=1, help="receptor genome (1 or 2)")
+    parseur.add_argument("--seuils", default=None, help="comma-separated thresholds (default: 100 bp to 1 Mb, 10 per decade)")
+    options = parseur.parse_args(arguments)
+
+    seuils = [int(seuil) for seuil in options.seuils.split(",")] if options.seuils else None
+    par_recombinant, cohorte = distribution_cohorte(lire_manifeste(options.manifeste), seuils, options.recepteur)
+    ecrire_resume(par_recombinant, options.sortie)
+    if options.cohorte:
+        ecrire_resume(cohorte, options.cohorte)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,342 @@
+################################## Main goal ##################################
+# Refinement of the breakpoints against the genome sequences. chaine_borne()
+# places each boundary at a SNP position (or position +/- 1), but the crossover
+# can be anywhere between the last SNP of one parent and the first SNP of the
+# next one. For each breakpoint, the uncertainty interval between these two
+# SNPs is given in P1, P2 and R, and the sequences of the interval are read
+# from the FASTA files of the three genomes : the informative sites missing
+# from the SNP file (P1 and P2 differ) narrow the interval, and the identity
+# of R with each parent and the GC content describe its sequence context.
+#
+# The FASTA files are opened with mmap through their .fai index (samtools
+# format, built and written next to the file if missing) : only the bases of
+# the intervals are read, as views of the file when they are on one line.
+# The sequences are compared in the order of the SNPs (reverse complement for
+# a genome whose positions decrease between the two SNPs). Only one sequence
+# (contig) per genome is used.
+#
+# Usage : python SNP_fasta.py fichier_triéP1.xlsm --P1 P1.fasta --P2 P2.fasta --R R.fasta -o points.tsv
+###############################################################################
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from SNP_segments import REPERES
+
+
+# Complement des bases (minuscules et majuscules), les autres octets sont inchanges
+COMPLEMENT = np.arange(256, dtype=np.uint8)
+for _base, _complement in zip(b"acgtACGT", b"tgcaTGCA"):
+    COMPLEMENT[_base] = _complement
+
+N = ord("n")
+GC = np.frombuffer(b"gc", dtype=np.uint8)
+
+
+def indexer_fasta(nom_fasta, nom_index=None):
+    """
+    Build the .fai index of a FASTA file (name, length, offset of the first base, bases per line, bytes per line).
+
+    Parameters
+    ----------
+    nom_fasta : String,
+        FASTA file name. All the lines of a sequence but the last must have the same length.
+    nom_index : String, optional
+        Index file written (tab-delimited, samtools format). The default is None (not written).
+
+    Returns
+    -------
+    entrees : list,
+        One (name, length, offset, bases per line, bytes per line) tuple per sequence.
+
+    """
+    entrees = []
+    courante = None
+    offset = 0
+    with open(nom_fasta, "rb") as fichier:
+        for ligne in fichier:
+            if ligne.startswith(b">"):
+                if courante is not None:
+                    entrees.append(tuple(courante[:5]))
+                # [nom, longueur, offset, bases par ligne, octets par ligne, ligne courte deja vue]
+                courante = [ligne[1:].split(maxsplit=1)[0].decode() if ligne[1:].strip() else "", 0, offset + len(ligne), 0, 0, False]
+            elif courante is not None:
+                bases = len(ligne.rstrip(b"\r\n"))
+                if courante[3] == 0:
+                    courante[3], courante[4] = bases, len(ligne)
+                elif bases and (courante[5] or bases > courante[3]):
+                    raise ValueError("%s : lignes de longueurs differentes dans la sequence %s" % (nom_fasta, courante[0]))
+                courante[5] = courante[5] or bases < courante[3]
+                courante[1] += bases
+            offset += len(ligne)
+    if courante is not None:
+        entrees.append(tuple(courante[:5]))
+
+    if nom_index is not None:
+        try:
+            with open(nom_index, "w") as index:
+                for entree in entrees:
+                    index.write("\t".join(map(str, entree)) + "\n")
+        except OSError:
+            pass
+    return entrees
+
+
+def lire_fai(nom_index):
+    """
+    Read a .fai index (samtools format), see indexer_fasta().
+    """
+    entrees = []
+    with open(nom_index) as index:
+        for ligne in index:
+            if ligne.strip():
+                nom, *valeurs = ligne.rstrip("\n").split("\t")[:5]
+                entrees.append((nom, *(int(valeur) for valeur in valeurs)))
+    return entrees
+
+
+class IndexFasta:
+    """
+    Read-only memory-mapped FASTA file, read through its .fai index.
+
+    Parameters
+    ----------
+    nom_fasta : String,
+        FASTA file name.
+    nom_index : String, optional
+        Index file. The default is None (nom_fasta + ".fai", built and written if missing).
+
+    """
+
+    def __init__(self, nom_fasta, nom_index=None):
+        self.nom_fasta = nom_fasta
+        nom_index = nom_index or nom_fasta + ".fai"
+        if os.path.exists(nom_index) and os.path.getmtime(nom_index) >= os.path.getmtime(nom_fasta):
+            entrees = lire_fai(nom_index)
+        else:
+            entrees = indexer_fasta(nom_fasta, nom_index)
+        self.sequences = {nom : valeurs for nom, *valeurs in entrees}
+        self.noms = [entree[0] for entree in entrees]
+        self._octets = np.memmap(nom_fasta, dtype=np.uint8, mode="r") if os.path.getsize(nom_fasta) else np.zeros(0, np.uint8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def fermer(self):
+        """
+        Release the mapping (the views already returned keep it open until they are deleted).
+        """
+        self._octets = None
+
+    def __repr__(self):
+        return "IndexFasta(%r, %d sequences)" % (self.nom_fasta, len(self.noms))
+
+    def longueur(self, nom=None):
+        """
+        Length of a sequence (the first one of the file by default).
+        """
+        return self.sequences[nom or self.noms[0]][0]
+
+    def tranche(self, debut, fin, nom=None):
+        """
+        Bases debut to fin (1-based, included, clipped to the sequence) of a sequence, as uint8 codes.
+
+        The result is a view of the file if the bases are on one line, a copy of these bases only otherwise.
+        """
+        longueur, offset, bases_ligne, octets_ligne = self.sequences[nom or self.noms[0]]
+        debut, fin = max(int(debut), 1) - 1, min(int(fin), longueur)
+        if fin <= debut:
+            return np.zeros(0, np.uint8)
+        if debut // bases_ligne == (fin - 1) // bases_ligne:
+            premier = offset + (debut // bases_ligne) * octets_ligne + debut % bases_ligne
+            return self._octets[premier:premier + fin - debut]
+        indices = np.arange(debut, fin, dtype=np.int64)
+        return self._octets[offset + (indices // bases_ligne) * octets_ligne + indices % bases_ligne]
+
+
+def intervalles_rupture(chaine_SNP, bornes, positions):
+    """
+    Uncertainty interval of each breakpoint : bases strictly between the two SNPs around the boundary, in each genome.
+
+    Parameters
+    ----------
+    chaine_SNP : numpy.ndarray,
+        Parent of each SNP (1 or 2), as returned by SNP_segmentation.segmenter().
+    bornes : numpy.ndarray,
+        Indices i of the boundaries (chaine_SNP[i] != chaine_SNP[i+1]), as returned by segmenter().
+    positions : numpy.ndarray,
+        (3, n) positions of the SNPs, rows ordered as REPERES.
+
+    Returns
+    -------
+    avant, apres : numpy.ndarray,
+        Parent before and after each breakpoint.
+    debuts, fins : numpy.ndarray,
+        (3, number of breakpoints) first and last base (1-based) of the intervals, fin = debut - 1 for adjacent SNPs.
+    sens : numpy.ndarray,
+        (3, number of breakpoints) True if the positions increase from the SNP before to the SNP after the breakpoint.
+
+    """
+    bornes = np.asarray(bornes, dtype=np.intp)
+    gauche = np.abs(positions[:, bornes]).astype(np.int64)
+    droite = np.abs(positions[:, bornes + 1]).astype(np.int64)
+    return (chaine_SNP[bornes], chaine_SNP[bornes + 1], np.minimum(gauche, droite) + 1,
+            np.maximum(gauche, droite) - 1, droite >= gauche)
+
+
+def _bases(fasta, debut, fin, sens, nom):
+    # Bases de l'intervalle dans l'ordre des SNP, en minuscules
+    bases = fasta.tranche(debut, fin, nom)
+    return bases | 0x20 if sens else COMPLEMENT[bases[::-1]] | 0x20
+
+
+def _identite(a, b):
+    compares = (a != N) & (b != N)
+    return (a[compares] == b[compares]).mean() if compares.any() else np.nan
+
+
+def _gc(bases):
+    connues = bases[bases != N]
+    return np.isin(connues, GC).mean() if len(connues) else np.nan
+
+
+def affiner_points_rupture(chaine_SNP, bornes, positions, fastas, sequences=None, flanc=50, longueur_max=100000):
+    """
+    Uncertainty interval and sequence features of each breakpoint of one recombinant.
+
+    Parameters
+    ----------
+    chaine_SNP, bornes : numpy.ndarray,
+        Chain and boundary indices of SNP_segmentation.segmenter().
+    positions : numpy.ndarray,
+        (3, n) positions of the SNPs, rows ordered as REPERES.
+    fastas : dict,
+        IndexFasta of each genome ("P1", "P2", "R"). The P1 and P2 genomes are optional (no refinement without them).
+    sequences : dict, optional
+        Name of the sequence of each genome in its FASTA file. The default is None (first sequence).
+    flanc : int, optional
+        Number of bases on each side of the interval included in the context GC content. The default is 50.
+    longueur_max : int, optional
+        Intervals longer than this (e.g. across a rearrangement) are reported but their sequences are not read. The default is 100000.
+
+    Returns
+    -------
+    tableau : pandas.DataFrame,
+        One row per breakpoint : boundary index, parents before and after, interval in P1, P2 and R, number of informative
+        sites in the interval (P1 and P2 differ, no N) and of those carrying the parent before the breakpoint after the
+        first site of the parent after it (discordant), refined interval in R, identity of R with P1 and P2 and GC content.
+        The sites and the identities are only computed when the three intervals have the same length (no indel).
+
+    """
+    sequences = sequences or {}
+    avant, apres, debuts, fins, sens = intervalles_rupture(chaine_SNP, bornes, positions)
+    longueurs = fins - debuts + 1
+    nombre = len(avant)
+    colonnes = {nom : np.full(nombre, np.nan) for nom in ["Sites informatifs", "Sites discordants", "Debut affine R", "Fin affine R",
+                                                         "Identite R-P1", "Identite R-P2", "GC R", "N R", "GC contexte R"]}
+    i_R = REPERES.index("R")
+    fasta_R = fastas["R"]
+    for k in range(nombre):
+        if longueurs[i_R, k] > longueur_max:
+            continue
+        debut_R, fin_R, sens_R = debuts[i_R, k], fins[i_R, k], sens[i_R, k]
+        R = _bases(fasta_R, debut_R, fin_R, sens_R, sequences.get("R"))
+        colonnes["N R"][k] = (R == N).sum()
+        colonnes["GC R"][k] = _gc(R)
+        colonnes["GC contexte R"][k] = _gc(fasta_R.tranche(debut_R - flanc, fin_R + flanc, sequences.get("R")) | 0x20)
+        colonnes["Debut affine R"][k], colonnes["Fin affine R"][k] = debut_R, fin_R
+        if not all(repere in fastas and longueurs[i, k] == len(R) for i, repere in enumerate(REPERES[:2])):
+            continue
+        parents = [_bases(fastas[repere], debuts[i, k], fins[i, k], sens[i, k], sequences.get(repere)) for i, repere in enumerate(REPERES[:2])]
+        colonnes["Identite R-P1"][k], colonnes["Identite R-P2"][k] = _identite(R, parents[0]), _identite(R, parents[1])
+
+        informatifs = (parents[0] != parents[1]) & (parents[0] != N) & (parents[1] != N) & (R != N)
+        ancien = informatifs & (R == parents[avant[k] - 1])
+        nouveau = np.flatnonzero(informatifs & (R == parents[apres[k] - 1]))
+        premier_nouveau = nouveau[0] if len(nouveau) else len(R)
+        anciens = np.flatnonzero(ancien[:premier_nouveau])
+        dernier_ancien = anciens[-1] if len(anciens) else -1
+        colonnes["Sites informatifs"][k] = informatifs.sum()
+        colonnes["Sites discordants"][k] = ancien[premier_nouveau:].sum()
+        # Bases strictement entre le dernier site de l'ancien parent et le premier site du nouveau parent
+        bornes_R = (debut_R + dernier_ancien + 1, debut_R + premier_nouveau - 1) if sens_R else \
+            (fin_R - premier_nouveau + 1, fin_R - dernier_ancien - 1)
+        colonnes["Debut affine R"][k], colonnes["Fin affine R"][k] = bornes_R
+
+    tableau = pd.DataFrame({"Borne" : np.asarray(bornes), "Avant" : ["P%d" % label for label in avant], "Apres" : ["P%d" % label for label in apres]})
+    for i, repere in enumerate(REPERES):
+        tableau["Debut " + repere] = debuts[i]
+        tableau["Fin " + repere] = fins[i]
+        tableau["Longueur " + repere] = np.maximum(longueurs[i], 0)
+    for nom, valeurs in colonnes.items():
+        tableau[nom] = valeurs if nom.startswith(("Identite", "GC")) else pd.array(valeurs, dtype="Int64")
+    tableau.insert(tableau.columns.get_loc("Fin affine R") + 1, "Longueur affinee R", np.maximum(tableau["Fin affine R"] - tableau["Debut affine R"] + 1, 0))
+    return tableau
+
+
+def points_rupture_fasta(nom_fichier, fastas, recepteur=1, nb_suite_P1=2, nb_suite_P2=2, sequences=None, flanc=50, longueur_max=100000, cache=None):
+    """
+    Segment the SNP file of one recombinant sorted on the receptor, as in Main.py, and refine its breakpoints.
+
+    Parameters
+    ----------
+    nom_fichier : String,
+        SNP file sorted on the receptor genome.
+    fastas : dict,
+        FASTA file name or IndexFasta of each genome ("P1", "P2", "R").
+    recepteur : int, optional
+        Receptor genome (1 or 2). The default is 1.
+    nb_suite_P1, nb_suite_P2 : int, optional
+        Minimum numbers of successive P1 and P2 SNPs. The default is 2.
+    sequences, flanc, longueur_max :
+        See affiner_points_rupture().
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed input files. The default is None.
+
+    Returns
+    -------
+    tableau : pandas.DataFrame,
+        See affiner_points_rupture().
+
+    """
+    from SNP import SNP_parent
+    from SNP_segmentation import segmenter
+    from SNP_segments import matrice_positions
+
+    donnees = SNP_parent(nom_fichier, vectorise=True, cache=cache)
+    segmentation = segmenter(*donnees, recepteur, 3 - recepteur, nb_suite_P1, nb_suite_P2)
+    index = {repere : IndexFasta(fasta) if isinstance(fasta, str) else fasta for repere, fasta in fastas.items() if fasta is not None}
+    return affiner_points_rupture(segmentation.chaine_SNP, segmentation.bornes, matrice_positions(*donnees[1:]), index, sequences, flanc, longueur_max)
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Uncertainty interval and sequence context of the breakpoints of one recombinant, from the genome FASTA files.")
+    parseur.add_argument("fichier", help="SNP file sorted on the receptor genome")
+    parseur.add_argument("--P1", default=None, help="FASTA file of the P1 genome")
+    parseur.add_argument("--P2", default=None, help="FASTA file of the P2 genome")
+    parseur.add_argument("--R", required=True, help="FASTA file of the recombinant genome")
+    parseur.add_argument("--recepteur", type=int, default=1, help="receptor genome (1 or 2)")
+    parseur.add_argument("--nb-suite-P1", type=int, default=2, help="minimum number of successive P1 SNPs")
+    parseur.add_argument("--nb-suite-P2", type=int, default=2, help="minimum number of successive P2 SNPs")
+    parseur.add_argument("--flanc", type=int, default=50, help="bases on each side of the interval in the context GC content")
+    parseur.add_argument("--longueur-max", type=int, default=100000, help="longest interval whose sequences are read")
+    parseur.add_argument("-o", "--sortie", default="points_rupture.tsv", help="breakpoint table (.tsv or .xlsx)")
+    options = parseur.parse_args(arguments)
+
+    from Batch import ecrire_resume
+
+    tableau = points_rupture_fasta(options.fichier, {"P1" : options.P1, "P2" : options.P2, "R" : options.R}, options.recepteur,
+                                   options.nb_suite_P1, options.nb_suite_P2, flanc=options.flanc, longueur_max=options.longueur_max)
+    ecrire_resume(tableau, options.sortie)
+    print("%d point(s) de rupture : %s" % (len(tableau), options.sortie))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,332 @@
+################################## Main goal ##################################
+# Streaming segmentation in constant memory. The SNPs are read by chunks,
+# labelled, segmented and summed as they arrive, so the size of the input is
+# not bounded by the memory (very large or concatenated multi-contig exports).
+# Between two chunks only a bounded state is kept :
+#   - the hysteresis of SNP_chaine() : the current parent and the trailing run
+#     of opposite SNPs not yet long enough to switch (less than
+#     nombre_suite_P1/P2 SNPs), whose parent is still undecided ;
+#   - the boundaries of chaine_borne() : the last two SNPs of the chain (a
+#     boundary i needs SNPs i+1 and i+2) and the start of the open segment ;
+#   - the running sums of the finished segments.
+# The segments and sums are the same as segmenter() and the Segments sums on
+# the whole data. With a contig column, the segmentation restarts on each
+# contig.
+#
+# Usage : python SNP_flux.py export_mauve.txt --base 1 --contig sequence_1_Contig
+###############################################################################
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from SNP import COLONNES_MAUVE, EXTENSIONS_EXCEL, LABELS_PARENTS
+from SNP_codage import coder_motifs, parents_codes
+from SNP_segmentation import codes_parents, etat_initial, etats_series, series
+from SNP_segments import REPERES, Segments, matrice_positions
+
+
+def lire_flux(nom_fichier, taille_bloc=100000, colonne_contig=None):
+    """
+    Read a SNP file by chunks and label the SNPs as they are read (see SNP.lire_export_mauve()).
+
+    Parameters
+    ----------
+    nom_fichier : String,
+        SNP file name. The native MAUVE export is read by chunks; Excel workbooks are read whole by pandas, then cut in chunks.
+    taille_bloc : int, optional
+        Number of rows parsed at once. The default is 100000.
+    colonne_contig : String, optional
+        Column giving the contig of each SNP (e.g. 'sequence_1_Contig'). The default is None (single sequence).
+
+    Yields
+    ------
+    liste_appartenance_SNP, liste_P1, liste_P2, liste_R : numpy.ndarray,
+        Labels ("P1"/"P2") and positions of the SNPs kept in the chunk.
+    contigs : numpy.ndarray,
+        Contig of each kept SNP (only if colonne_contig is given).
+
+    """
+    colonnes = COLONNES_MAUVE + ([colonne_contig] if colonne_contig is not None else [])
+    if nom_fichier.lower().endswith(EXTENSIONS_EXCEL):
+        tableau = pd.read_excel(nom_fichier, usecols=colonnes)
+        blocs = (tableau.iloc[i:i + taille_bloc] for i in range(0, len(tableau), taille_bloc))
+    else:
+        blocs = pd.read_csv(nom_fichier, sep="\t", usecols=colonnes, dtype={'SNP pattern': str}, chunksize=taille_bloc)
+    for bloc in blocs:
+        positions = [bloc[colonne].to_numpy() for colonne in COLONNES_MAUVE[1:]]
+        parents = parents_codes(coder_motifs(bloc['SNP pattern']), positions[0], positions[1])
+        garde = parents != 0
+        colonnes_gardees = (LABELS_PARENTS[parents[garde]], *(positions_genome[garde] for positions_genome in positions))
+        if colonne_contig is not None:
+            colonnes_gardees += (bloc[colonne_contig].to_numpy()[garde],)
+        yield colonnes_gardees
+
+
+class SegmenteurFlux:
+    """
+    Incremental equivalent of segmenter() : the SNPs are given by chunks with ajouter() and the finished segments are returned as soon as they are known.
+
+    Parameters
+    ----------
+    base : int, optional
+        Receptor genome, as in SNP_chaine(). The default is 1.
+    donneur : int, optional
+        Donor genome, as in chaine_borne(). The default is 2.
+    nombre_suite_P1 : int, optional
+        Minimum number of successive SNP belonging to the same parent P1. The default is 2.
+    nombre_suite_P2 : int, optional
+        Minimum number of successive SNP belonging to the same parent P2. The default is 2.
+
+    """
+
+    def __init__(self, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2):
+        if nombre_suite_P1 < 1 or nombre_suite_P2 < 1:
+            raise ValueError("nombre_suite_P1 et nombre_suite_P2 doivent etre superieurs ou egaux a 1")
+        self.base = base
+        self.donneur = donneur
+        self.nombre_suite_P1 = nombre_suite_P1
+        self.nombre_suite_P2 = nombre_suite_P2
+        self._reinitialiser()
+
+    def _reinitialiser(self):
+        # Parent courant et derniere serie de SNP opposes, encore indecise (moins de nombre_suite SNP)
+        self.etat = etat_initial(self.base)
+        self._attente = (np.zeros(0, np.int8), np.zeros((3, 0), np.int64))
+        # Deux derniers SNP de la chaine (une borne i a besoin des SNP i+1 et i+2) et segment ouvert
+        self._queue = (np.zeros(0, np.int8), np.zeros((3, 0), np.int64))
+        self._courant = None
+        self.nombre_snp = 0
+
+    def ajouter(self, liste_appartenance_SNP, liste_P1, liste_P2, liste_R):
+        """
+        Add the next chunk of SNPs (labels and positions, sorted as for segmenter()) and return the segments finished by this chunk.
+        """
+        codes = np.concatenate([self._attente[0], codes_parents(liste_appartenance_SNP)])
+        positions = np.hstack([self._attente[1], matrice_positions(liste_P1, liste_P2, liste_R).reshape(3, -1)])
+        if len(codes) == 0:
+            return Segments.vide()
+        debuts_series, labels_series, longueurs_series = series(codes)
+        etats = etats_series(labels_series, longueurs_series, self.base, self.nombre_suite_P1, self.nombre_suite_P2, self.etat)
+        # La derniere serie reste indecise si elle n'a pas (encore) assez de SNP pour changer de parent
+        decides = debuts_series[-1] if labels_series[-1] != etats[-1] else len(codes)
+        self._attente = (codes[decides:], positions[:, decides:])
+        self.etat = int(etats[-1])
+        return self._segments(np.repeat(etats, longueurs_series)[:decides], positions[:, :decides])
+
+    def terminer(self):
+        """
+        End the stream : return the last segments and reset the segmenter (e.g. for the next contig).
+        """
+        codes, positions = self._attente
+        segments = self._segments(np.full(len(codes), self.etat, np.int8), positions, fin=True)
+        self._reinitialiser()
+        return segments
+
+    def _segments(self, chaine, positions, fin=False):
+        # Bornes de chaine_borne() parmi les SNP dont les deux suivants sont connus
+        premier = self.nombre_snp - len(self._queue[0])
+        self.nombre_snp += len(chaine)
+        chaine = np.concatenate([self._queue[0], chaine])
+        positions = np.hstack([self._queue[1], positions])
+        m = len(chaine)
+        if self._courant is None and m:
+            self._courant = (chaine[0], positions[:, 0])
+
+        bornes = np.flatnonzero(chaine[1:m - 1] != chaine[:m - 2]) if m > 2 else np.zeros(0, np.intp)
+        if premier == 0:
+            bornes = bornes[bornes >= 1]
+        self._queue = (chaine[-2:].copy(), positions[:, -2:].copy())
+
+        labels, debuts, fins = [], [], []
+        if len(bornes):
+            cote_donneur = chaine[bornes] == self.donneur
+            positions_bornes = positions[:, bornes]
+            positions_suivantes = positions[:, bornes + 1]
+            debuts_suivants = np.where(cote_donneur, positions_bornes + 1, positions_suivantes)
+            labels += [[self._courant[0]], chaine[bornes[:-1] + 1]]
+            debuts += [self._courant[1].reshape(3, 1), debuts_suivants[:, :-1]]
+            fins.append(np.where(cote_donneur, positions_bornes, positions_suivantes - 1))
+            self._courant = (chaine[bornes[-1] + 1], debuts_suivants[:, -1])
+        if fin and self.nombre_snp >= 2:
+            # Le dernier segment finit au dernier SNP
+            labels.append([self._courant[0]])
+            debuts.append(self._courant[1].reshape(3, 1))
+            fins.append(positions[:, -1:])
+        if not fins:
+            return Segments.vide()
+        return Segments(np.concatenate(labels), np.hstack(debuts), np.hstack(fins))
+
+
+class SommesFlux:
+    """
+    Running sums of segments given by chunks : same results as the Segments sums on all the segments, in constant memory.
+
+    Parameters
+    ----------
+    borne_sup : int, optional
+        Length threshold of the fragments counted in 'somme sup'. The default is 1000.
+
+    """
+
+    def __init__(self, borne_sup=1000):
+        self.borne_sup = borne_sup
+        # Par parent (lignes P1, P2) et par repere (colonnes P1, P2, R)
+        self.nombres = np.zeros(2, np.int64)
+        self.sommes = np.zeros((2, len(REPERES)), np.int64)
+        self.sommes_sup = np.zeros((2, len(REPERES)), np.int64)
+        self.nombres_sup = np.zeros((2, len(REPERES)), np.int64)
+
+    def ajouter(self, segments):
+        """
+        Add finished segments (SNP_segments.Segments) to the sums.
+        """
+        longueurs = segments.fins.astype(np.int64) - segments.debuts
+        longs = longueurs > self.borne_sup
+        for label in (1, 2):
+            masque = segments.labels == label
+            self.nombres[label - 1] += int(masque.sum())
+            self.sommes[label - 1] += longueurs[:, masque].sum(axis=1)
+            self.sommes_sup[label - 1] += np.where(longs, longueurs, 0)[:, masque].sum(axis=1)
+            self.nombres_sup[label - 1] += longs[:, masque].sum(axis=1)
+
+    def fusionner(self, autre):
+        """
+        Add the sums of another SommesFlux with the same borne_sup (e.g. the sums of all the contigs).
+        """
+        if autre.borne_sup != self.borne_sup:
+            raise ValueError("Les sommes doivent avoir la meme borne_sup")
+        self.nombres += autre.nombres
+        self.sommes += autre.sommes
+        self.sommes_sup += autre.sommes_sup
+        self.nombres_sup += autre.nombres_sup
+
+    def sommes_rapport_recombinant(self, repere):
+        """
+        Same seven lists as Segments.sommes_rapport_recombinant(repere, borne_sup).
+        """
+        i = REPERES.index(repere)
+        somme_P1, somme_P2 = int(self.sommes[0, i]), int(self.sommes[1, i])
+        # En cas d'egalite, P1 est le minimum comme dans calcul_des_sommes_rapport_recombinant()
+        label_min = 1 if somme_P1 <= somme_P2 else 2
+        return ([somme_P1], [somme_P2], ["P" + str(label_min)], [int(self.sommes_sup[label_min - 1, i])],
+                [int(self.nombres_sup[label_min - 1, i])], [int(self.nombres[0])], [int(self.nombres[1])])
+
+    def sommes_rapport_donneur(self, repere):
+        """
+        Same two lists as Segments.sommes_rapport_donneur(repere).
+        """
+        i = REPERES.index(repere)
+        return [int(self.sommes[0, i])], [int(self.sommes[1, i])]
+
+
+def segments_flux(blocs, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2):
+    """
+    Segment a stream of SNP chunks.
+
+    Parameters
+    ----------
+    blocs : iterable,
+        Chunks (liste_appartenance_SNP, liste_P1, liste_P2, liste_R) or (..., contigs), e.g. lire_flux() or SNP.lire_export_mauve().
+        With contigs, the segmentation restarts each time the contig changes.
+    base, donneur, nombre_suite_P1, nombre_suite_P2 :
+        See SegmenteurFlux.
+
+    Yields
+    ------
+    contig : object,
+        Contig of the segments (None without contig column).
+    segments : SNP_segments.Segments,
+        Finished segments, in order.
+
+    """
+    segmenteur = SegmenteurFlux(base, donneur, nombre_suite_P1, nombre_suite_P2)
+    contig = None
+    ouvert = False
+    for bloc in blocs:
+        colonnes = bloc[:4]
+        if len(bloc) < 5:
+            segments = segmenteur.ajouter(*colonnes)
+            if len(segments):
+                yield contig, segments
+            continue
+        contigs = np.asarray(bloc[4])
+        coupures = np.flatnonzero(contigs[1:] != contigs[:-1]) + 1
+        for debut, fin in zip(np.concatenate([[0], coupures]), np.concatenate([coupures, [len(contigs)]])):
+            if debut == fin:
+                continue
+            if ouvert and contigs[debut] != contig:
+                segments = segmenteur.terminer()
+                if len(segments):
+                    yield contig, segments
+            contig = contigs[debut]
+            ouvert = True
+            segments = segmenteur.ajouter(*(np.asarray(colonne)[debut:fin] for colonne in colonnes))
+            if len(segments):
+                yield contig, segments
+    segments = segmenteur.terminer()
+    if len(segments):
+        yield contig, segments
+
+
+def sommes_flux(blocs, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2, borne_sup=1000, sortie=None):
+    """
+    Segment a stream of SNP chunks and sum the segments, in constant memory.
+
+    Parameters
+    ----------
+    blocs : iterable,
+        Chunks of SNPs, see segments_flux().
+    base, donneur, nombre_suite_P1, nombre_suite_P2 :
+        See SegmenteurFlux.
+    borne_sup : int, optional
+        Length threshold of the fragments counted in 'somme sup'. The default is 1000.
+    sortie : function, optional
+        Called with (contig, segments) for each group of finished segments, e.g. to write them. The default is None.
+
+    Returns
+    -------
+    total : SommesFlux,
+        Sums of all the segments.
+    par_contig : dict,
+        SommesFlux of each contig.
+
+    """
+    total = SommesFlux(borne_sup)
+    par_contig = {}
+    for contig, segments in segments_flux(blocs, base, donneur, nombre_suite_P1, nombre_suite_P2):
+        if contig not in par_contig:
+            par_contig[contig] = SommesFlux(borne_sup)
+        par_contig[contig].ajouter(segments)
+        total.ajouter(segments)
+        if sortie is not None:
+            sortie(contig, segments)
+    return total, par_contig
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Segment a SNP file by chunks, in constant memory, and print the sums of the segments.")
+    parseur.add_argument("fichier", help="SNP file (native MAUVE export or Excel) sorted on the receptor genome")
+    parseur.add_argument("--base", type=int, default=1, help="receptor genome (1 or 2)")
+    parseur.add_argument("--donneur", type=int, default=None, help="donor genome (default: the other genome)")
+    parseur.add_argument("--nb-suite-P1", type=int, default=2, help="minimum number of successive P1 SNPs")
+    parseur.add_argument("--nb-suite-P2", type=int, default=2, help="minimum number of successive P2 SNPs")
+    parseur.add_argument("--borne-sup", type=int, default=1000, help="length threshold of 'somme sup'")
+    parseur.add_argument("--contig", default=None, help="contig column (e.g. sequence_1_Contig): the segmentation restarts on each contig")
+    parseur.add_argument("--taille-bloc", type=int, default=100000, help="number of rows parsed at once")
+    options = parseur.parse_args(arguments)
+
+    donneur = options.donneur if options.donneur is not None else 3 - options.base
+    total, par_contig = sommes_flux(lire_flux(options.fichier, options.taille_bloc, options.contig), options.base, donneur,
+                                    options.nb_suite_P1, options.nb_suite_P2, options.borne_sup)
+    repere = "P" + str(options.base)
+    print("\t".join(["Contig", "somme P1", "somme P2", "min P1 P2", "somme sup", "nombre de fragments sup",
+                     "nombre de fragments P1", "nombre de fragments P2"]))
+    for contig, sommes in list(par_contig.items()) + ([("Total", total)] if options.contig is not None else []):
+        print("\t".join(str(valeur[0]) for valeur in [[contig]] + list(sommes.sommes_rapport_recombinant(repere))))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
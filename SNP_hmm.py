@@ -0,0 +1,196 @@
+################################## Main goal ##################################
+# Alternative segmentation engine : two-state (P1/P2) hidden Markov model
+# decoded with the Viterbi algorithm, less sensitive to isolated mismatched
+# SNPs than the "N successive SNPs" rule of SNP_chaine(). Each SNP label is an
+# observation with an error rate, and switching parent between two SNPs costs
+# a penalty, constant or depending on the distance between the SNPs.
+#
+# With two states, the Viterbi recursion on the score difference
+# d = V(P2) - V(P1) is d' = e' + clip(d, -s, s) (e : emission log-ratio,
+# s : switch penalty). Such "shift and clamp" functions compose into a
+# function of the same form, so the recursions forward and backward are
+# computed with a blocked associative scan (about 2 * sqrt(n) numpy steps on
+# arrays of sqrt(n) elements, O(n) work). The state of each SNP is the sign of
+# its forward + backward score (max-marginal decoding of the Viterbi path).
+###############################################################################
+
+import numpy as np
+
+from SNP_segmentation import codes_parents
+
+
+def _composer(a1, bas1, haut1, a2, bas2, haut2):
+    # f2(f1(x)) avec f(x) = min(max(x + a, bas), haut)
+    bas = np.minimum(np.maximum(bas1 + a2, bas2), haut2)
+    haut = np.maximum(np.minimum(haut1 + a2, haut2), bas2)
+    return a1 + a2, bas, haut
+
+
+def balayage_bornes(decalages, bas, hauts, x0):
+    """
+    Apply a sequence of functions x -> min(max(x + decalage, bas), haut) and return all the intermediate values.
+
+    Parameters
+    ----------
+    decalages, bas, hauts : numpy.ndarray,
+        Parameters of the n functions (bas <= haut, infinite bounds allowed).
+    x0 : float,
+        Input of the first function.
+
+    Returns
+    -------
+    valeurs : numpy.ndarray,
+        y[t] = f_t(y[t - 1]) with y[-1] = x0.
+
+    """
+    n = len(decalages)
+    if n == 0:
+        return np.zeros(0)
+    taille_bloc = max(int(np.sqrt(n)), 1)
+    nombre_blocs = -(-n // taille_bloc)
+    # Completion par la fonction identite
+    complement = nombre_blocs * taille_bloc - n
+    a = np.concatenate([decalages, np.zeros(complement)]).reshape(nombre_blocs, taille_bloc)
+    b = np.concatenate([bas, np.full(complement, -np.inf)]).reshape(nombre_blocs, taille_bloc)
+    h = np.concatenate([hauts, np.full(complement, np.inf)]).reshape(nombre_blocs, taille_bloc)
+
+    # Compositions prefixes dans chaque bloc (tous les blocs a la fois)
+    for j in range(1, taille_bloc):
+        a[:, j], b[:, j], h[:, j] = _composer(a[:, j - 1], b[:, j - 1], h[:, j - 1], a[:, j], b[:, j], h[:, j])
+
+    # Entree de chaque bloc : propagation sequentielle sur les blocs
+    entrees = np.empty(nombre_blocs)
+    x = float(x0)
+    for k in range(nombre_blocs):
+        entrees[k] = x
+        x = min(max(x + a[k, -1], b[k, -1]), h[k, -1])
+
+    return np.minimum(np.maximum(entrees[:, None] + a, b), h).ravel()[:n]
+
+
+def penalites_saut(distances=None, n=None, penalite_saut=6.0, taux_saut=None, probabilite_min=1e-12):
+    """
+    Log-space penalty of a parent switch between each pair of successive SNPs.
+
+    Parameters
+    ----------
+    distances : array-like, optional
+        Distance (bp) between successive SNPs, used if taux_saut is given. The default is None.
+    n : int, optional
+        Number of SNPs, if distances is not given.
+    penalite_saut : float, optional
+        Constant penalty, used if taux_saut is None. The default is 6.
+    taux_saut : float, optional
+        Switch rate per base : the switch probability over a distance d is 1 - exp(-taux_saut * d)
+        and the penalty is log((1 - p) / p). The default is None (constant penalty).
+    probabilite_min : float, optional
+        Lower bound of the switch probability (penalty of SNPs at the same position). The default is 1e-12.
+
+    Returns
+    -------
+    penalites : numpy.ndarray,
+        n - 1 non negative penalties.
+
+    """
+    if taux_saut is None:
+        return np.full(max((len(distances) + 1 if distances is not None else n) - 1, 0), float(penalite_saut))
+    distances = np.abs(np.asarray(distances, dtype=np.float64))
+    probabilites = np.clip(-np.expm1(-taux_saut * distances), probabilite_min, 0.5)
+    return np.log1p(-probabilites) - np.log(probabilites)
+
+
+def viterbi_deux_etats(codes, penalites, erreur=0.01):
+    """
+    Viterbi decoding of the two-state model.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray,
+        Observed label of each SNP (1 or 2).
+    penalites : numpy.ndarray,
+        Switch penalty between each pair of successive SNPs (n - 1 values, see penalites_saut()).
+    erreur : float, optional
+        Probability that the label of a SNP differs from the parent of its region. The default is 0.01.
+
+    Returns
+    -------
+    etats : numpy.ndarray,
+        Decoded parent of each SNP (int8, 1 or 2; ties go to 1).
+    marges : numpy.ndarray,
+        Score of the best path through the decoded state minus the best path through the other state (log-space confidence).
+
+    """
+    codes = np.asarray(codes)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, np.int8), np.zeros(0)
+    if not 0 < erreur < 0.5:
+        raise ValueError("erreur doit etre dans ]0, 0.5[")
+    # Log-ratio d'emission P2 / P1 de chaque SNP
+    emissions = np.where(codes == 2, 1.0, -1.0) * np.log((1 - erreur) / erreur)
+    penalites = np.asarray(penalites, dtype=np.float64)
+
+    # Avant : d[t] = e[t] + clip(d[t - 1], -s[t - 1], s[t - 1])
+    avant = np.empty(n)
+    avant[0] = emissions[0]
+    avant[1:] = balayage_bornes(emissions[1:], emissions[1:] - penalites, emissions[1:] + penalites, emissions[0])
+
+    # Arriere : B[t] = clip(B[t + 1] + e[t + 1], -s[t], s[t]), B[n - 1] = 0
+    arriere = np.zeros(n)
+    arriere[:-1] = balayage_bornes(emissions[:0:-1], -penalites[::-1], penalites[::-1], 0.0)[::-1]
+
+    scores = avant + arriere
+    return np.where(scores > 0, 2, 1).astype(np.int8), np.abs(scores)
+
+
+def distances_tri(positions, base=1):
+    """
+    Distances between successive SNPs in the genome they are sorted on (the base genome first, then P1, P2, R),
+    or None if the SNPs are not sorted on any genome.
+    """
+    positions = np.asarray(positions)
+    for i in [base - 1] + [i for i in range(3) if i != base - 1]:
+        ecarts = np.diff(positions[i].astype(np.int64))
+        if (ecarts >= 0).all():
+            return ecarts
+    return None
+
+
+def chaine_hmm(liste_appartenance_SNP, positions=None, base=1, erreur=0.01, penalite_saut=6.0, taux_saut=None):
+    """
+    Parent chain of the SNPs decoded by the HMM, usable in place of the output of SNP_chaine()
+    (e.g. with compteur_snp() and chaine_borne(), or SNP_segmentation.segmenter_chaine()).
+
+    Parameters
+    ----------
+    liste_appartenance_SNP : array-like,
+        Labels of the SNPs ("P1"/"P2" or 1/2).
+    positions : array-like, optional
+        (3, n) positions of the SNPs in P1, P2 and R, needed for distance-dependent penalties. The default is None.
+    base : int, optional
+        Genome the SNPs are sorted on, whose distances are used (see distances_tri()). The default is 1.
+    erreur : float, optional
+        Label error rate (see viterbi_deux_etats()). The default is 0.01.
+    penalite_saut : float, optional
+        Constant switch penalty. With the default error rate, the log-ratio of one SNP is log(99) = 4.6 :
+        a region of one or two opposite SNPs (4.6, 9.2) does not pay the two switches (12) and one of three SNPs (13.8) does. The default is 6.
+    taux_saut : float, optional
+        Switch rate per base, for distance-dependent penalties (see penalites_saut()). The default is None.
+
+    Returns
+    -------
+    chaine_SNP : numpy.ndarray,
+        Parent (1 or 2, int8) of each SNP.
+
+    """
+    codes = codes_parents(liste_appartenance_SNP)
+    distances = None
+    if taux_saut is not None:
+        if positions is None:
+            raise ValueError("Les positions des SNP sont necessaires pour des penalites dependant de la distance")
+        distances = distances_tri(positions, base)
+        if distances is None:
+            raise ValueError("Les SNP ne sont tries sur aucun genome : distances indefinies")
+    penalites = penalites_saut(distances, len(codes), penalite_saut, taux_saut)
+    return viterbi_deux_etats(codes, penalites, erreur)[0]
+
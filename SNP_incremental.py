@@ -0,0 +1,332 @@
+################################## Main goal ##################################
+# Incremental re-segmentation after a polishing of the recombinant consensus
+# (sequence_3). Only a few SNPs change of label, appear or disappear, so the
+# new SNP table is compared to the previous one and only the windows around the
+# edits are segmented again :
+#   - a window starts at the first SNP of the run of labels before the edit
+#     (the SNP_chaine() hysteresis only depends on the previous runs) ;
+#   - it ends at the first run after the edit long enough to switch the parent
+#     (nombre_suite_P1/P2 SNPs) : from there the parent chain is the same as
+#     before the edit, whatever happened in the window.
+# The parent chain is stored as the indices where it changes, so the windows
+# are patched in time proportional to their size ; the segments and sums are
+# then rebuilt from the changes (number of segments, not of SNPs).
+#
+# Usage : python SNP_incremental.py fichier_triéP1.xlsm --etat fichier.snpi.npz
+###############################################################################
+
+import argparse
+import os
+
+import numpy as np
+
+from SNP_segmentation import Segmentation, codes_parents, etat_initial, etats_series, series, taille_snp
+from SNP_segments import Segments, matrice_positions
+
+
+def editions(codes_anciens, positions_anciennes, codes, positions):
+    """
+    Edits turning an old SNP table into a new one. The SNPs are identified by their P1 and P2 positions (the parents
+    do not change), so a change of R positions only (indel of the consensus) is not an edit.
+
+    Parameters
+    ----------
+    codes_anciens, codes : numpy.ndarray,
+        Labels (1 or 2) of the old and new SNPs.
+    positions_anciennes, positions : numpy.ndarray,
+        (3, n) positions of the old and new SNPs, sorted the same way.
+
+    Returns
+    -------
+    editions : numpy.ndarray,
+        One row (debut, fin, decalage) per edit : the new SNPs [debut, fin) replace fin - debut - decalage old SNPs
+        starting at the same index (indices of the new table, sorted).
+        None if the tables are not both sorted on the P1 or P2 positions (the SNPs cannot be matched).
+
+    """
+    n_ancien, n = len(codes_anciens), len(codes)
+    if n_ancien == n and np.array_equal(positions_anciennes[:2], positions[:2]):
+        # Memes SNP : seuls les labels changent, une edition par suite de labels changes
+        changes = np.flatnonzero(codes_anciens != codes)
+        coupures = np.flatnonzero(np.diff(changes) > 1) + 1
+        debuts = changes[np.concatenate([[0], coupures])] if len(changes) else changes
+        fins = changes[np.concatenate([coupures - 1, [len(changes) - 1]])] + 1 if len(changes) else changes
+        return np.stack([debuts, fins, np.zeros_like(debuts)], axis=1)
+    if n_ancien == 0 or n == 0:
+        return np.array([[0, n, n - n_ancien]])
+
+    # Appariement des SNP sur les positions du genome de tri (strictement croissantes)
+    for tri in (0, 1):
+        if (np.diff(positions_anciennes[tri]) > 0).all() and (np.diff(positions[tri]) > 0).all():
+            break
+    else:
+        return None
+    indices = np.searchsorted(positions_anciennes[tri], positions[tri])
+    bornes = np.minimum(indices, n_ancien - 1)
+    trouves = (positions_anciennes[0, bornes] == positions[0]) & (positions_anciennes[1, bornes] == positions[1])
+    communs = np.flatnonzero(trouves)
+    communs_anciens = indices[communs]
+    # SNP stables : presents dans les deux tables avec le meme label ; les editions sont les intervalles entre eux
+    stables = codes_anciens[communs_anciens] == codes[communs]
+    stables_anciens = np.concatenate([[-1], communs_anciens[stables], [n_ancien]])
+    stables_nouveaux = np.concatenate([[-1], communs[stables], [n]])
+    longueurs_anciennes = np.diff(stables_anciens) - 1
+    longueurs = np.diff(stables_nouveaux) - 1
+    garde = (longueurs > 0) | (longueurs_anciennes > 0)
+    debuts = stables_nouveaux[:-1][garde] + 1
+    return np.stack([debuts, debuts + longueurs[garde], (longueurs - longueurs_anciennes)[garde]], axis=1)
+
+
+class SegmentationIncrementale:
+    """
+    Segmentation of one SNP table (same results as segmenter()) which can be updated after edits of the table.
+
+    Parameters
+    ----------
+    liste_appartenance_SNP, liste_P1, liste_P2, liste_R : array-like,
+        Labels and positions of the SNPs, as returned by SNP_parent().
+    base : int, optional
+        Receptor genome, as in SNP_chaine(). The default is 1.
+    donneur : int, optional
+        Donor genome, as in chaine_borne(). The default is 2.
+    nombre_suite_P1 : int, optional
+        Minimum number of successive SNP belonging to the same parent P1. The default is 2.
+    nombre_suite_P2 : int, optional
+        Minimum number of successive SNP belonging to the same parent P2. The default is 2.
+
+    """
+
+    def __init__(self, liste_appartenance_SNP, liste_P1, liste_P2, liste_R, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2):
+        if nombre_suite_P1 < 1 or nombre_suite_P2 < 1:
+            raise ValueError("nombre_suite_P1 et nombre_suite_P2 doivent etre superieurs ou egaux a 1")
+        self.base = base
+        self.donneur = donneur
+        self.nombre_suite_P1 = nombre_suite_P1
+        self.nombre_suite_P2 = nombre_suite_P2
+        self.codes = codes_parents(liste_appartenance_SNP)
+        self.positions = matrice_positions(liste_P1, liste_P2, liste_R).reshape(3, -1)
+        # Chaine des parents : parent du premier SNP et indices i tels que chaine_SNP[i] != chaine_SNP[i+1]
+        self.premier_label = etat_initial(base)
+        self.changements = np.zeros(0, np.int64)
+        self._reparer(0, len(self.codes), len(self.codes))
+        self._reconstruire()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return "SegmentationIncrementale(%d SNP, %d segments)" % (len(self), len(self.segments))
+
+    def _label(self, i):
+        # Parent du SNP i : le premier parent change a chaque changement avant i
+        return self.premier_label if np.searchsorted(self.changements, i) % 2 == 0 else 3 - self.premier_label
+
+    def _debut_serie(self, i):
+        # Premier SNP de la serie de labels contenant le SNP i (recherche par blocs de taille croissante)
+        taille = 64
+        while True:
+            debut = max(i - taille, 0)
+            differents = np.flatnonzero(self.codes[debut:i] != self.codes[i])
+            if len(differents):
+                return debut + int(differents[-1]) + 1
+            if debut == 0:
+                return 0
+            taille *= 2
+
+    def _resynchronisation(self, fin_edition, limite):
+        """
+        First SNP, from fin_edition, starting a run of at least nombre_suite_P1/P2 SNPs before limite (None if there is none) :
+        the parent chain is the same as before the edit from this SNP.
+        """
+        taille = 4 * max(self.nombre_suite_P1, self.nombre_suite_P2)
+        debut = max(fin_edition - 1, 0)
+        while True:
+            fin = min(fin_edition + taille, limite)
+            debuts_series, labels_series, longueurs_series = series(self.codes[debut:fin])
+            debuts_series = debuts_series + debut
+            seuils = np.where(labels_series == 1, self.nombre_suite_P1, self.nombre_suite_P2)
+            candidates = np.flatnonzero((debuts_series >= fin_edition) & (longueurs_series >= seuils))
+            if len(candidates):
+                return int(debuts_series[candidates[0]])
+            if fin >= limite:
+                return None
+            taille *= 2
+
+    def _reparer(self, debut_edition, fin, decalage):
+        """
+        Segment again the SNPs from the run before debut_edition up to fin (excluded), where the chain is known to be the
+        same as the old one, decalage SNPs further (decalage = new - old number of SNPs).
+        """
+        n = len(self.codes)
+        debut = self._debut_serie(debut_edition - 1) if debut_edition > 0 else 0
+        etat = self._label(debut - 1) if debut > 0 else etat_initial(self.base)
+        debuts_series, labels_series, longueurs_series = series(self.codes[debut:fin])
+        etats = etats_series(labels_series, longueurs_series, self.base, self.nombre_suite_P1, self.nombre_suite_P2, etat)
+
+        # Chaine de la fenetre avec les parents connus de part et d'autre
+        gauche = [etat] if debut > 0 else []
+        droite = [self._label(fin - decalage)] if fin < n else []
+        chaine = np.concatenate([np.array(gauche, np.int8), np.repeat(etats, longueurs_series), np.array(droite, np.int8)])
+        changements = np.flatnonzero(chaine[1:] != chaine[:-1]) + debut - len(gauche)
+
+        anciens = self.changements
+        self.changements = np.concatenate([anciens[:np.searchsorted(anciens, debut - 1)], changements,
+                                           anciens[np.searchsorted(anciens, fin - decalage):] + decalage]).astype(np.int64)
+        if debut == 0 and len(chaine):
+            self.premier_label = int(chaine[0])
+        return debut, fin
+
+    def _reconstruire(self):
+        # Segments de chaine_borne() a partir des changements de parent (bornes 1 <= i <= n-3)
+        n = len(self.codes)
+        bornes = self.changements[(self.changements >= 1) & (self.changements <= n - 3)]
+        labels_bornes = np.where(np.searchsorted(self.changements, bornes) % 2 == 0, self.premier_label, 3 - self.premier_label).astype(np.int8)
+        self.segments = Segments.depuis_transitions(self.premier_label, bornes, labels_bornes, 3 - labels_bornes, self.positions, self.donneur)
+
+    def mettre_a_jour(self, liste_appartenance_SNP, liste_P1, liste_P2, liste_R):
+        """
+        Replace the SNP table by a new version (e.g. after polishing the consensus) and segment again only the edited windows.
+
+        Parameters
+        ----------
+        liste_appartenance_SNP, liste_P1, liste_P2, liste_R : array-like,
+            Labels and positions of the new SNPs, sorted as the previous ones.
+
+        Returns
+        -------
+        fenetres : list,
+            (debut, fin) SNP index ranges segmented again. All the SNPs if the tables could not be matched.
+
+        """
+        codes = codes_parents(liste_appartenance_SNP)
+        positions = matrice_positions(liste_P1, liste_P2, liste_R).reshape(3, -1)
+        liste_editions = editions(self.codes, self.positions, codes, positions)
+        self.codes, self.positions = codes, positions
+        if liste_editions is None:
+            self.premier_label, self.changements = etat_initial(self.base), np.zeros(0, np.int64)
+            liste_editions = np.array([[0, len(codes), len(codes)]])
+
+        fenetres = []
+        i = 0
+        while i < len(liste_editions):
+            debut_edition, fin_edition, decalage = (int(x) for x in liste_editions[i])
+            # Les fenetres qui n'ont pas retrouve l'ancienne chaine avant l'edition suivante sont fusionnees
+            while True:
+                limite = int(liste_editions[i + 1][0]) if i + 1 < len(liste_editions) else len(codes)
+                fin = self._resynchronisation(fin_edition, limite)
+                if fin is not None or i + 1 == len(liste_editions):
+                    break
+                i += 1
+                fin_edition = int(liste_editions[i][1])
+                decalage += int(liste_editions[i][2])
+            fenetres.append(self._reparer(debut_edition, len(codes) if fin is None else fin, decalage))
+            i += 1
+        self._reconstruire()
+        return fenetres
+
+    def remplacer(self, debut, fin, liste_appartenance_SNP, liste_P1, liste_P2, liste_R):
+        """
+        Replace the SNPs [debut, fin) by new SNPs (known edit, without comparing the whole tables).
+
+        Returns
+        -------
+        fenetre : tuple,
+            (debut, fin) SNP index range segmented again.
+
+        """
+        codes = codes_parents(liste_appartenance_SNP)
+        positions = matrice_positions(liste_P1, liste_P2, liste_R).reshape(3, -1)
+        self.codes = np.concatenate([self.codes[:debut], codes, self.codes[fin:]])
+        self.positions = np.hstack([self.positions[:, :debut], positions, self.positions[:, fin:]])
+        fin_edition = debut + len(codes)
+        fin_fenetre = self._resynchronisation(fin_edition, len(self.codes))
+        fenetre = self._reparer(debut, len(self.codes) if fin_fenetre is None else fin_fenetre, len(codes) - (fin - debut))
+        self._reconstruire()
+        return fenetre
+
+    @property
+    def chaine_SNP(self):
+        """
+        Parent of each SNP, same as segmenter().chaine_SNP.
+        """
+        n = len(self.codes)
+        limites = np.concatenate([[0], self.changements + 1, [n]])
+        labels = np.where(np.arange(len(limites) - 1) % 2 == 0, self.premier_label, 3 - self.premier_label).astype(np.int8)
+        return np.repeat(labels, np.diff(limites))
+
+    def segmentation(self):
+        """
+        Same result as segmenter() on the current SNP table.
+        """
+        n = len(self.codes)
+        bornes = self.changements[(self.changements >= 1) & (self.changements <= n - 3)]
+        return Segmentation(self.chaine_SNP, taille_snp(self.changements, n), bornes, self.segments)
+
+    def sommes_rapport_recombinant(self, repere, borne_sup=1000):
+        """
+        See SNP_segments.Segments.sommes_rapport_recombinant().
+        """
+        return self.segments.sommes_rapport_recombinant(repere, borne_sup)
+
+    def sommes_rapport_donneur(self, repere):
+        """
+        See SNP_segments.Segments.sommes_rapport_donneur().
+        """
+        return self.segments.sommes_rapport_donneur(repere)
+
+    def enregistrer(self, nom_fichier):
+        """
+        Save the SNP table and its segmentation in a .npz file (e.g. to update it after the next polishing).
+        """
+        np.savez(nom_fichier, codes=self.codes, positions=self.positions, changements=self.changements,
+                 parametres=np.array([self.base, self.donneur, self.nombre_suite_P1, self.nombre_suite_P2, self.premier_label]))
+
+    @classmethod
+    def charger(cls, nom_fichier):
+        """
+        Load a segmentation saved by enregistrer(), without segmenting again.
+        """
+        with np.load(nom_fichier) as donnees:
+            base, donneur, nombre_suite_P1, nombre_suite_P2, premier_label = (int(x) for x in donnees["parametres"])
+            segmentation = cls.__new__(cls)
+            segmentation.base, segmentation.donneur = base, donneur
+            segmentation.nombre_suite_P1, segmentation.nombre_suite_P2 = nombre_suite_P1, nombre_suite_P2
+            segmentation.codes = donnees["codes"]
+            segmentation.positions = donnees["positions"]
+            segmentation.changements = donnees["changements"]
+            segmentation.premier_label = premier_label
+        segmentation._reconstruire()
+        return segmentation
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Segment a SNP file again after an update of the recombinant consensus, only around the edited SNPs.")
+    parseur.add_argument("fichier", help="new SNP file (Excel or MAUVE export) sorted on the receptor genome")
+    parseur.add_argument("--etat", default=None, help="saved segmentation of the previous version (.npz), updated in place (default: name of the SNP file with the .snpi.npz extension)")
+    parseur.add_argument("--base", type=int, default=1, help="receptor genome (1 or 2), used if there is no saved segmentation")
+    parseur.add_argument("--nb-suite-P1", type=int, default=2, help="minimum number of successive P1 SNPs")
+    parseur.add_argument("--nb-suite-P2", type=int, default=2, help="minimum number of successive P2 SNPs")
+    parseur.add_argument("--borne-sup", type=int, default=1000, help="length threshold of 'somme sup'")
+    options = parseur.parse_args(arguments)
+
+    from SNP import SNP_parent
+
+    nom_etat = options.etat or os.path.splitext(options.fichier)[0] + ".snpi.npz"
+    donnees = SNP_parent(options.fichier, vectorise=True)
+    if os.path.exists(nom_etat):
+        segmentation = SegmentationIncrementale.charger(nom_etat)
+        fenetres = segmentation.mettre_a_jour(*donnees)
+        print("%d fenetre(s) segmentee(s) a nouveau, %d SNP sur %d" % (len(fenetres), sum(fin - debut for debut, fin in fenetres), len(segmentation)))
+    else:
+        segmentation = SegmentationIncrementale(*donnees, options.base, 3 - options.base, options.nb_suite_P1, options.nb_suite_P2)
+        print("Segmentation initiale : %d SNP" % len(segmentation))
+    segmentation.enregistrer(nom_etat)
+
+    repere = "P" + str(segmentation.base)
+    print("\t".join(["somme P1", "somme P2", "min P1 P2", "somme sup", "nombre de fragments sup", "nombre de fragments P1", "nombre de fragments P2"]))
+    print("\t".join(str(valeur[0]) for valeur in segmentation.sommes_rapport_recombinant(repere, options.borne_sup)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+################################## Main goal ##################################
+# Opt-in instrumentation of the stages of utiliser_fonctions(). Each stage is
+# wrapped in "with etape(nom):". When no instrumentation is active, etape()
+# returns a shared no-op object, so the disabled cost is one function call.
+# When active, every stage records its wall time, CPU time, resident memory at
+# its start and end, its counters (SNPs, segments) and the cache hits/misses,
+# and can be run under a profiler. The report is written as JSON or CSV. The
+# memory is the one of the measuring process : worker processes (parallel
+# reading, batch pool) are not included.
+#
+#   with instrumenter() as mesures:
+#       utiliser_fonctions(...)
+#   mesures.ecrire("rapport.json")
+###############################################################################
+
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_instrumentation_active = None
+
+
+def rss_courant():
+    """
+    Current resident memory of the process in bytes (None if not available on this system, read from /proc on Linux).
+    """
+    try:
+        with open("/proc/self/statm") as fichier:
+            return int(fichier.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def pic_rss():
+    """
+    Peak resident memory of the process in bytes since it started, not per stage (None if not available on this system).
+    """
+    if resource is None:
+        return None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return pic if sys.platform == "darwin" else pic * 1024
+
+
+class _EtapeNulle:
+    # Etape sans effet renvoyee quand l'instrumentation est desactivee
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+    def compter(self, **compteurs):
+        pass
+
+
+_ETAPE_NULLE = _EtapeNulle()
+
+
+class Etape:
+    """
+    Measure of one stage, used as a context manager (see Instrumentation.etape()).
+    """
+
+    __slots__ = ("instrumentation", "mesure", "cache", "_debut", "_debut_cpu", "_cache_debut", "_profil", "_rss_debut")
+
+    def __init__(self, instrumentation, nom, cache=None, **compteurs):
+        self.instrumentation = instrumentation
+        self.mesure = dict(instrumentation.contexte, etape=nom, **compteurs)
+        self.cache = cache
+
+    def compter(self, **compteurs):
+        """
+        Add counters to the measure of the stage (e.g. nombre_snp=..., nombre_segments=...).
+        """
+        self.mesure.update(compteurs)
+
+    def __enter__(self):
+        self._profil = None
+        if self.instrumentation.profileur is not None:
+            self._profil = self.instrumentation.profileur(self.mesure["etape"])
+            self._profil.__enter__()
+        if self.cache is not None:
+            self._cache_debut = (self.cache.succes, self.cache.echecs)
+        self._rss_debut = rss_courant()
+        self._debut_cpu = time.process_time()
+        self._debut = time.perf_counter()
+        return self
+
+    def __exit__(self, type_exception, exception, trace):
+        self.mesure["temps_s"] = time.perf_counter() - self._debut
+        self.mesure["temps_cpu_s"] = time.process_time() - self._debut_cpu
+        self.mesure["rss_debut_octets"] = self._rss_debut
+        self.mesure["rss_fin_octets"] = rss_courant()
+        # Pic depuis le demarrage du processus : il ne change qu'aux etapes qui depassent les precedentes
+        self.mesure["pic_rss_processus_octets"] = pic_rss()
+        if self.cache is not None:
+            self.mesure["cache_succes"] = self.cache.succes - self._cache_debut[0]
+            self.mesure["cache_echecs"] = self.cache.echecs - self._cache_debut[1]
+        if type_exception is not None:
+            self.mesure["erreur"] = type_exception.__name__
+        if self._profil is not None:
+            self._profil.__exit__(type_exception, exception, trace)
+        self.instrumentation.mesures.append(self.mesure)
+        return False
+
+
+class Instrumentation:
+    """
+    Collector of the stage measures of one run (or of a batch).
+
+    Parameters
+    ----------
+    profileur : function, optional
+        Hook called with the name of each stage and returning a context manager run around the stage
+        (e.g. a sampling profiler, see profileur_cprofile()). The default is None.
+    **contexte :
+        Columns added to every measure (e.g. recombinant=...).
+
+    """
+
+    def __init__(self, profileur=None, **contexte):
+        self.profileur = profileur
+        self.contexte = contexte
+        self.mesures = []
+
+    def etape(self, nom, cache=None, **compteurs):
+        """
+        Context manager measuring one stage.
+
+        Parameters
+        ----------
+        nom : String,
+            Name of the stage (e.g. "SNP_parent").
+        cache : SNP_cache.CacheSNP, optional
+            Cache whose hits and misses during the stage are recorded. The default is None.
+        **compteurs :
+            Counters of the stage known in advance.
+
+        """
+        return Etape(self, nom, cache, **compteurs)
+
+    def ecrire(self, nom_fichier):
+        """
+        Write the measures as JSON (.json) or CSV (any other extension).
+        """
+        if nom_fichier.lower().endswith(".json"):
+            with open(nom_fichier, "w", encoding="utf-8") as fichier:
+                json.dump(self.mesures, fichier, indent=1)
+            return
+        colonnes = []
+        for mesure in self.mesures:
+            colonnes.extend(colonne for colonne in mesure if colonne not in colonnes)
+        with open(nom_fichier, "w", newline="", encoding="utf-8") as fichier:
+            ecrivain = csv.DictWriter(fichier, colonnes)
+            ecrivain.writeheader()
+            ecrivain.writerows(self.mesures)
+
+    def resume(self):
+        """
+        Total wall and CPU time per stage name, sorted by decreasing time.
+        """
+        totaux = {}
+        for mesure in self.mesures:
+            total = totaux.setdefault(mesure["etape"], {"etape" : mesure["etape"], "appels" : 0, "temps_s" : 0.0, "temps_cpu_s" : 0.0})
+            total["appels"] += 1
+            total["temps_s"] += mesure["temps_s"]
+            total["temps_cpu_s"] += mesure["temps_cpu_s"]
+        return sorted(totaux.values(), key=lambda total: -total["temps_s"])
+
+
+def etape(nom, cache=None, **compteurs):
+    """
+    Measure one stage with the active instrumentation, or do nothing if there is none.
+    """
+    if _instrumentation_active is None:
+        return _ETAPE_NULLE
+    return _instrumentation_active.etape(nom, cache, **compteurs)
+
+
+@contextmanager
+def instrumenter(profileur=None, **contexte):
+    """
+    Activate an Instrumentation for the duration of the block and return it.
+
+    Parameters
+    ----------
+    profileur : function, optional
+        Hook run around every stage (see Instrumentation). The default is None.
+    **contexte :
+        Columns added to every measure.
+
+    """
+    global _instrumentation_active
+    precedente = _instrumentation_active
+    _instrumentation_active = Instrumentation(profileur, **contexte)
+    try:
+        yield _instrumentation_active
+    finally:
+        _instrumentation_active = precedente
+
+
+def profileur_cprofile(dossier):
+    """
+    Profiler hook saving a cProfile of every stage in dossier (<number>_<stage>.prof, readable with pstats or snakeviz).
+    """
+    import cProfile
+
+    os.makedirs(dossier, exist_ok=True)
+    compteur = [0]
+
+    @contextmanager
+    def profiler(nom):
+        compteur[0] += 1
+        profil = cProfile.Profile()
+        profil.enable()
+        try:
+            yield profil
+        finally:
+            profil.disable()
+            profil.dump_stats(os.path.join(dossier, "%03d_%s.prof" % (compteur[0], nom)))
+
+    return profiler
@@ -0,0 +1,69 @@
+################################## Main goal ##################################
+# Concurrent reading of the input SNP files. All the files are submitted at
+# once to a pool of worker processes (Excel parsing holds the GIL) or threads,
+# and each result is collected only when it is needed, so the analysis of a
+# file can start while the other one is still being read. The results are the
+# same as SNP_parent(vectorise=True, cache=cache).
+###############################################################################
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from SNP import COLONNES_MAUVE, LABELS_PARENTS, _lire_SNP_codes
+
+
+EXECUTEURS = {"processus" : ProcessPoolExecutor, "threads" : ThreadPoolExecutor}
+
+
+class LecturesSNP:
+    """
+    Files parsed concurrently, used as a context manager.
+
+    Parameters
+    ----------
+    noms_fichiers : iterable,
+        Names of the SNP files (None entries are ignored).
+    cache : SNP_cache.CacheSNP, optional
+        Cache of the parsed files : it is looked up before submitting a file and filled when a result is collected. The default is None.
+    executeur : String, optional
+        "processus" or "threads". The default is "processus".
+
+    """
+
+    def __init__(self, noms_fichiers, cache=None, executeur="processus"):
+        if executeur not in EXECUTEURS:
+            raise ValueError("Executeur inconnu : %s (executeurs possibles : %s)" % (executeur, ", ".join(EXECUTEURS)))
+        self.cache = cache
+        self._lectures = {}
+        noms_fichiers = [nom for nom in dict.fromkeys(noms_fichiers) if nom is not None]
+        self._executeur = EXECUTEURS[executeur](max_workers=max(len(noms_fichiers), 1))
+        for nom in noms_fichiers:
+            cle, colonnes = cache.chercher(nom, COLONNES_MAUVE) if cache is not None else (None, None)
+            # (cle du cache, colonnes deja lues ou futur de la lecture)
+            self._lectures[nom] = (cle, colonnes if colonnes is not None else self._executeur.submit(_lire_SNP_codes, nom))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def fermer(self):
+        """
+        Shut the workers down (reads not yet collected are cancelled if they have not started).
+        """
+        self._executeur.shutdown(wait=True, cancel_futures=True)
+
+    def resultat(self, nom_fichier):
+        """
+        Wait for the parsing of one file and return it in the form of SNP_parent(vectorise=True).
+        """
+        cle, lecture = self._lectures[nom_fichier]
+        if isinstance(lecture, tuple):
+            colonnes = lecture
+        else:
+            colonnes = lecture.result()
+            if self.cache is not None:
+                self.cache.stocker(cle, colonnes)
+            self._lectures[nom_fichier] = (cle, colonnes)
+        codes, positions_P1, positions_P2, positions_R = colonnes
+        return LABELS_PARENTS[codes], positions_P1, positions_P2, positions_R
@@ -0,0 +1,195 @@
+################################## Main goal ##################################
+# Analysis of several recombinants from one multi-genome MAUVE alignment : P1,
+# P2 and K recombinants (sequence_1 = P1, sequence_2 = P2, sequence_3 to
+# sequence_K+2 = recombinants). The SNP file is parsed once, the patterns are
+# classified for all the recombinants at once (one (SNP, genome) matrix of
+# bases), then each recombinant is analysed as by Main.py on a process pool.
+#
+# For each recombinant, a SNP is kept if the bases of P1, P2 and of this
+# recombinant have no N, the P1 and P2 positions are not null and P1 and P2
+# differ (columns polymorphic among the recombinants only are not informative),
+# so the SNPs are those of a P1/P2/recombinant alignment.
+#
+# Usage : python SNP_multi.py alignement.xlsx -o resume.tsv -j 4
+###############################################################################
+
+import argparse
+import os
+import re
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from SNP import EXTENSIONS_EXCEL, LABELS_PARENTS, trier_SNP
+
+
+MOTIF_POSITIONS = re.compile(r"sequence_(\d+)_PosInContg")
+
+# Donnees partagees par les processus du pool (copiees une fois par processus)
+_donnees_processus = None
+
+
+def _colonne_utile(colonne):
+    return colonne == 'SNP pattern' or MOTIF_POSITIONS.fullmatch(colonne) is not None
+
+
+def lire_alignement(nom_fichier):
+    """
+    Read the pattern and position columns of a multi-genome MAUVE SNP file (Excel or native tab-delimited export).
+
+    Returns
+    -------
+    SNP_pattern : numpy.ndarray,
+        'SNP pattern' column (one character per genome).
+    positions : numpy.ndarray,
+        (number of genomes, n) positions 'sequence_{1..G}_PosInContg'.
+
+    """
+    import pandas as pd
+
+    if nom_fichier.lower().endswith(EXTENSIONS_EXCEL):
+        tableau = pd.read_excel(nom_fichier, usecols=_colonne_utile)
+    else:
+        tableau = pd.read_csv(nom_fichier, sep="\t", usecols=_colonne_utile, dtype={'SNP pattern': str})
+    genomes = sorted(int(MOTIF_POSITIONS.fullmatch(colonne).group(1)) for colonne in tableau.columns if colonne != 'SNP pattern')
+    if genomes[:3] != [1, 2, 3] or genomes != list(range(1, len(genomes) + 1)):
+        raise ValueError("Colonnes de positions attendues : sequence_1_PosInContg a sequence_G_PosInContg (G >= 3)")
+    positions = np.stack([tableau['sequence_%d_PosInContg' % genome].to_numpy(np.int64) for genome in genomes])
+    return tableau['SNP pattern'].to_numpy(str), positions
+
+
+def attribuer_parents_multiple(SNP_pattern, positions):
+    """
+    Parent of every SNP in every recombinant, as a 2-D array operation on the pattern matrix.
+
+    Parameters
+    ----------
+    SNP_pattern : array-like,
+        'SNP pattern' column (characters : P1, P2, then the recombinants).
+    positions : numpy.ndarray,
+        (number of genomes, n) positions of the SNPs.
+
+    Returns
+    -------
+    codes : numpy.ndarray,
+        (number of recombinants, n) int8 : 1 if the recombinant has the P1 base, 2 if it has the P2 base,
+        0 if the SNP is discarded for this recombinant (see the rules above).
+
+    """
+    nombre_genomes = positions.shape[0]
+    motifs = np.char.lower(np.asarray(SNP_pattern, dtype="U%d" % nombre_genomes))
+    bases = np.ascontiguousarray(motifs).view(np.uint32).reshape(-1, nombre_genomes)
+    est_N = bases == ord("n")
+
+    parents_valides = ~est_N[:, 0] & ~est_N[:, 1] & (positions[0] != 0) & (positions[1] != 0) & (bases[:, 0] != bases[:, 1])
+    valide = parents_valides[:, None] & ~est_N[:, 2:]
+    est_P1 = valide & (bases[:, 2:] == bases[:, :1])
+    est_P2 = valide & ~est_P1 & (bases[:, 2:] == bases[:, 1:2])
+    return (est_P1.astype(np.int8) + 2 * est_P2.astype(np.int8)).T
+
+
+def donnees_recombinant(codes, positions, recombinant):
+    """
+    SNPs of one recombinant (index from 0), in the form of SNP_parent(vectorise=True) : labels, P1, P2 and recombinant positions.
+    """
+    garde = codes[recombinant] != 0
+    return (LABELS_PARENTS[codes[recombinant][garde]], positions[0][garde], positions[1][garde], positions[2 + recombinant][garde])
+
+
+def _initialiser(codes, positions):
+    global _donnees_processus
+    _donnees_processus = (codes, positions)
+
+
+def _analyser_recombinant(recombinant, nom, racine, extension, nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur):
+    # Analyse d'un recombinant comme utiliser_fonctions(), les erreurs sont retournees
+    from Main import analyser_donnees
+
+    resume = {"Recombinant" : nom}
+    try:
+        colonnes = donnees_recombinant(*_donnees_processus, recombinant)
+        donnees = {genome : trier_SNP(*colonnes, genome=genome) for genome in (1, 2)}
+        noms_fichiers = {genome : "%s_%s_triP%d%s" % (racine, nom, genome, extension) for genome in (1, 2)}
+        resume["nombre de SNP"] = len(colonnes[0])
+        resume.update(analyser_donnees(donnees, noms_fichiers, nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur))
+        resume["Erreur"] = ""
+    except Exception as erreur:
+        resume["Erreur"] = "%s: %s" % (type(erreur).__name__, erreur)
+        resume["Traceback"] = traceback.format_exc()
+    return resume
+
+
+def analyser_alignement(nom_fichier, nb_suite_P1=2, nb_suite_P2=2, borne_sup=1000, formats_sortie=None, nombre_processus=None,
+                        noms_recombinants=None, moteur="seuils", parametres_moteur=None):
+    """
+    Analyse all the recombinants of a multi-genome alignment with one parse of the SNP file.
+
+    Parameters
+    ----------
+    nom_fichier : String,
+        Multi-genome MAUVE SNP file (Excel or native export), any order of the SNPs.
+    nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur :
+        See Main.utiliser_fonctions().
+    nombre_processus : int, optional
+        Number of worker processes (1 : no pool). The default is None (number of CPUs).
+    noms_recombinants : list, optional
+        Name of each recombinant, used in the summary and the output file names. The default is sequence_3, sequence_4...
+
+    Returns
+    -------
+    resume : pandas.DataFrame,
+        One row per recombinant : its name, number of SNPs and summary of utiliser_fonctions() (or its error).
+
+    """
+    import pandas as pd
+
+    SNP_pattern, positions = lire_alignement(nom_fichier)
+    codes = attribuer_parents_multiple(SNP_pattern, positions)
+    nombre_recombinants = codes.shape[0]
+    if noms_recombinants is None:
+        noms_recombinants = ["sequence_%d" % (recombinant + 3) for recombinant in range(nombre_recombinants)]
+    if len(noms_recombinants) != nombre_recombinants:
+        raise ValueError("%d noms pour %d recombinants" % (len(noms_recombinants), nombre_recombinants))
+    racine, extension = os.path.splitext(nom_fichier)
+    parametres = (racine, extension, nb_suite_P1, nb_suite_P2, borne_sup, formats_sortie, moteur, parametres_moteur)
+
+    if nombre_processus == 1:
+        _initialiser(codes, positions)
+        resultats = [_analyser_recombinant(recombinant, nom, *parametres) for recombinant, nom in enumerate(noms_recombinants)]
+    else:
+        resultats = [None] * nombre_recombinants
+        with ProcessPoolExecutor(max_workers=nombre_processus, initializer=_initialiser, initargs=(codes, positions)) as executeur:
+            futurs = {executeur.submit(_analyser_recombinant, recombinant, nom, *parametres) : recombinant
+                      for recombinant, nom in enumerate(noms_recombinants)}
+            for futur in as_completed(futurs):
+                resultats[futurs[futur]] = futur.result()
+    return pd.DataFrame(resultats)
+
+
+def main(arguments=None):
+    from Batch import ecrire_resume
+    from SNP_sorties import FORMATS
+
+    parseur = argparse.ArgumentParser(description="Analyse all the recombinants of one multi-genome MAUVE alignment (P1, P2, then the recombinants).")
+    parseur.add_argument("fichier", help="multi-genome SNP file (Excel or native MAUVE export)")
+    parseur.add_argument("-o", "--sortie", default="resume_alignement.tsv", help="summary table (.tsv or .xlsx)")
+    parseur.add_argument("-j", "--processus", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parseur.add_argument("--noms", default=None, help="comma-separated names of the recombinants (default: sequence_3, sequence_4...)")
+    parseur.add_argument("--nb-suite-P1", type=int, default=2, help="minimum number of successive P1 SNPs")
+    parseur.add_argument("--nb-suite-P2", type=int, default=2, help="minimum number of successive P2 SNPs")
+    parseur.add_argument("--borne-sup", type=int, default=1000, help="length threshold of 'somme sup'")
+    parseur.add_argument("--formats", default=None, help="comma-separated output formats among " + ", ".join(FORMATS) + " (default: creer_excel())")
+    options = parseur.parse_args(arguments)
+
+    resume = analyser_alignement(options.fichier, options.nb_suite_P1, options.nb_suite_P2, options.borne_sup,
+                                 options.formats.split(",") if options.formats else None, options.processus,
+                                 options.noms.split(",") if options.noms else None)
+    ecrire_resume(resume, options.sortie)
+    echecs = int((resume["Erreur"] != "").sum())
+    print("%d recombinant(s) analysé(s), %d échec(s) : %s" % (len(resume) - echecs, echecs, options.sortie))
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+################################## Main goal ##################################
+# Fused segmentation engine. SNP_chaine(), compteur_snp() and chaine_borne() are
+# computed together from one run-length encoding of the SNP labels:
+#   - a run of identical labels switches the current parent if it is at least
+#     nombre_suite_P1 (P1 run) or nombre_suite_P2 (P2 run) SNPs long, otherwise
+#     it takes the current parent. The parent after each run is thus the label
+#     of the last run long enough (forward fill over the runs).
+#   - the SNP counts and the segment boundaries are derived from the indices
+#     where the resulting chain changes of parent.
+###############################################################################
+
+from collections import namedtuple
+
+import numpy as np
+
+from SNP_segments import Segments, matrice_positions
+
+
+Segmentation = namedtuple("Segmentation", ["chaine_SNP", "liste_taille_snp", "bornes", "segments"])
+Segmentation.__doc__ = """
+Result of segmenter().
+
+chaine_SNP : numpy.ndarray,
+    Same as SNP_chaine() (1 or 2 for each SNP, int8).
+liste_taille_snp : numpy.ndarray,
+    Same as compteur_snp().
+bornes : numpy.ndarray,
+    Indices i of the SNPs ending a segment of chaine_borne() (chaine_SNP[i] != chaine_SNP[i+1]).
+segments : SNP_segments.Segments,
+    Same segments as chaine_borne(), with their start/end in P1, P2 and R.
+"""
+
+
+def codes_parents(liste_appartenance_SNP):
+    """
+    Convert SNP labels ("P1"/"P2" strings or 1/2 integers) to an int8 array of 1 and 2.
+    """
+    labels = np.asarray(liste_appartenance_SNP)
+    if labels.dtype.kind in "iub":
+        return labels.astype(np.int8)
+    return np.where(labels == "P2", 2, 1).astype(np.int8)
+
+
+def series(codes):
+    """
+    Run-length encoding of a label array.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray,
+        Labels of the SNPs (1 or 2).
+
+    Returns
+    -------
+    debuts_series : numpy.ndarray,
+        Index of the first SNP of each run.
+    labels_series : numpy.ndarray,
+        Label of each run.
+    longueurs_series : numpy.ndarray,
+        Number of SNPs of each run.
+
+    """
+    n = len(codes)
+    if n == 0:
+        vide = np.zeros(0, np.intp)
+        return vide, np.zeros(0, np.int8), vide
+    debuts_series = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1])
+    longueurs_series = np.diff(np.append(debuts_series, n))
+    return debuts_series, codes[debuts_series], longueurs_series
+
+
+def etat_initial(base):
+    """
+    Parent of the chain before the first SNP, as in SNP_chaine() (the parent which is not the base).
+    """
+    return 2 if base == 1 else 1
+
+
+def etats_series(labels_series, longueurs_series, base=1, nombre_suite_P1=2, nombre_suite_P2=2, etat_depart=None):
+    """
+    Parent assigned by the SNP_chaine() hysteresis to each run of labels.
+
+    Parameters
+    ----------
+    labels_series : numpy.ndarray,
+        Label of each run (1 or 2).
+    longueurs_series : numpy.ndarray,
+        Number of SNPs of each run.
+    base : int, optional
+        Receptor genome, as in SNP_chaine(). The default is 1.
+    nombre_suite_P1 : int, optional
+        Minimum number of successive P1 SNPs to switch to P1. The default is 2.
+    nombre_suite_P2 : int, optional
+        Minimum number of successive P2 SNPs to switch to P2. The default is 2.
+    etat_depart : int, optional
+        Parent before the first run, overriding the one deduced from base. The default is None.
+
+    Returns
+    -------
+    etats : numpy.ndarray,
+        Parent (1 or 2) of each run.
+
+    """
+    if nombre_suite_P1 < 1 or nombre_suite_P2 < 1:
+        raise ValueError("nombre_suite_P1 et nombre_suite_P2 doivent etre superieurs ou egaux a 1")
+    if etat_depart is None:
+        etat_depart = etat_initial(base)
+    seuils = np.where(labels_series == 1, nombre_suite_P1, nombre_suite_P2)
+    suffisantes = longueurs_series >= seuils
+    # Indice de la derniere serie assez longue (-1 si aucune)
+    derniere = np.maximum.accumulate(np.where(suffisantes, np.arange(len(labels_series)), -1)) if len(labels_series) else np.zeros(0, np.intp)
+    return np.where(derniere >= 0, labels_series[derniere], etat_depart).astype(np.int8)
+
+
+def changements(debuts_series, etats):
+    """
+    Indices i where the chain changes of parent (chaine_SNP[i] != chaine_SNP[i+1]), from the parent of each run.
+    """
+    return debuts_series[1:][etats[1:] != etats[:-1]] - 1
+
+
+def taille_snp(changements_chaine, n):
+    """
+    Equivalent of compteur_snp() from the parent change indices of a chain of n SNPs.
+    """
+    if n < 2:
+        return np.zeros(0, np.int64)
+    # compteur_snp() ignore le dernier SNP : series de chaine_SNP[:-1]
+    fins = changements_chaine[changements_chaine <= n - 3] + 1
+    return np.diff(np.concatenate([[0], fins, [n - 1]])).astype(np.int64)
+
+
+def segments_series(etats, debuts_series, positions, donneur=2):
+    """
+    Segments of chaine_borne() computed at the run level, in O(number of runs).
+
+    Parameters
+    ----------
+    etats : numpy.ndarray,
+        Parent of each run, as returned by etats_series().
+    debuts_series : numpy.ndarray,
+        Index of the first SNP of each run.
+    positions : numpy.ndarray,
+        Positions of the SNPs, shape (3, n), as returned by SNP_segments.matrice_positions().
+    donneur : int, optional
+        Donor genome (1 or 2). The default is 2.
+
+    Returns
+    -------
+    segments : SNP_segments.Segments,
+        Same segments as chaine_borne().
+
+    """
+    n = positions.shape[1]
+    if n < 2:
+        return Segments.vide()
+    transitions = np.flatnonzero(etats[1:] != etats[:-1]) + 1
+    bornes = debuts_series[transitions] - 1
+    garde = (bornes >= 1) & (bornes <= n - 3)
+    transitions = transitions[garde]
+    return Segments.depuis_transitions(etats[0], bornes[garde], etats[transitions - 1], etats[transitions], positions, donneur)
+
+
+def segmenter(liste_appartenance_SNP, liste_P1, liste_P2, liste_R, base=1, donneur=2, nombre_suite_P1=2, nombre_suite_P2=2, moteur="seuils", parametres_moteur=None):
+    """
+    Fused O(n) equivalent of SNP_chaine(), compteur_snp() and chaine_borne().
+
+    Parameters
+    ----------
+    liste_appartenance_SNP : array-like,
+        Labels of the SNPs ("P1"/"P2" or 1/2), as returned by SNP_parent().
+    liste_P1 : array-like,
+        Position of each SNP related to the P1 genome.
+    liste_P2 : array-like,
+        Position of each SNP related to the P2 genome.
+    liste_R : array-like,
+        Position of each SNP related to the R genome.
+    base : int, optional
+        Receptor genome (1 or 2), as in SNP_chaine(). The default is 1.
+    donneur : int, optional
+        Donor genome (1 or 2), as in chaine_borne(). The default is 2.
+    nombre_suite_P1 : int, optional
+        Minimum number of successive SNP belonging to the same parent P1. The default is 2.
+    nombre_suite_P2 : int, optional
+        Minimum number of successive SNP belonging to the same parent P2. The default is 2.
+    moteur : String, optional
+        "seuils" for the SNP_chaine() rule, or "hmm" for the chain decoded by SNP_hmm.chaine_hmm() (nombre_suite_P1/P2 are then not used). The default is "seuils".
+    parametres_moteur : dict, optional
+        Keyword arguments of SNP_hmm.chaine_hmm() (erreur, penalite_saut, taux_saut). The default is None.
+
+    Returns
+    -------
+    segmentation : Segmentation,
+        Chain, SNP counts, boundary indices and segments.
+
+    """
+    if moteur == "hmm":
+        from SNP_hmm import chaine_hmm
+
+        positions = matrice_positions(liste_P1, liste_P2, liste_R)
+        chaine_SNP = chaine_hmm(liste_appartenance_SNP, positions, base, **(parametres_moteur or {}))
+        return segmenter_chaine(chaine_SNP, liste_P1, liste_P2, liste_R, donneur)
+    if moteur != "seuils":
+        raise ValueError("Moteur de segmentation inconnu : %s (moteurs possibles : seuils, hmm)" % moteur)
+    codes = codes_parents(liste_appartenance_SNP)
+    n = len(codes)
+    debuts_series, labels_series, longueurs_series = series(codes)
+    etats = etats_series(labels_series, longueurs_series, base, nombre_suite_P1, nombre_suite_P2)
+    return _depuis_etats(etats, debuts_series, longueurs_series, n, liste_P1, liste_P2, liste_R, donneur)
+
+
+def segmenter_chaine(chaine_SNP, liste_P1, liste_P2, liste_R, donneur=2):
+    """
+    Same outputs as segmenter() from an already computed parent chain (output of SNP_chaine() or of another engine).
+    """
+    codes = codes_parents(chaine_SNP)
+    debuts_series, labels_series, longueurs_series = series(codes)
+    return _depuis_etats(labels_series, debuts_series, longueurs_series, len(codes), liste_P1, liste_P2, liste_R, donneur)
+
+
+def _depuis_etats(etats, debuts_series, longueurs_series, n, liste_P1, liste_P2, liste_R, donneur):
+    chaine_SNP = np.repeat(etats, longueurs_series)
+    changements_chaine = changements(debuts_series, etats)
+    bornes = changements_chaine[(changements_chaine >= 1) & (changements_chaine <= n - 3)]
+    segments = segments_series(etats, debuts_series, matrice_positions(liste_P1, liste_P2, liste_R), donneur)
+    return Segmentation(chaine_SNP, taille_snp(changements_chaine, n), bornes, segments)
+
@@ -0,0 +1,292 @@
+################################## Main goal ##################################
+# Compact representation of the segments produced by chaine_borne(). Instead of
+# seven parallel Python lists, the labels and the start/end positions in the
+# P1, P2 and R coordinate systems are stored in contiguous numpy arrays, so that
+# the segment statistics (lengths, sums, filters) are array reductions.
+###############################################################################
+
+import numpy as np
+
+
+# Ordre des lignes des matrices de positions
+REPERES = ("P1", "P2", "R")
+
+
+def _type_positions(*tableaux):
+    # int32 suffit pour des genomes de quelques Mb, int64 sinon
+    for positions in tableaux:
+        if positions.size and (positions.min() < np.iinfo(np.int32).min or positions.max() > np.iinfo(np.int32).max):
+            return np.int64
+    return np.int32
+
+
+def matrice_positions(liste_P1, liste_P2, liste_R):
+    """
+    Stack the positions of the SNPs in P1, P2 and R in one (3, n) int64 matrix (rows ordered as REPERES).
+    """
+    return np.vstack([np.asarray(liste_P1), np.asarray(liste_P2), np.asarray(liste_R)]).astype(np.int64, copy=False)
+
+
+class Segments:
+    """
+    Struct-of-arrays of SNP stretches (segments) with their label and their start/end positions in P1, P2 and R.
+
+    Parameters
+    ----------
+    labels : array-like,
+        Label of each segment (1 for P1, 2 for P2), as in chaine_borne_SNP.
+    debuts : array-like,
+        Start positions, shape (3, number of segments), rows ordered as REPERES (P1, P2, R).
+    fins : array-like,
+        End positions, same shape as debuts.
+
+    """
+
+    __slots__ = ("labels", "debuts", "fins")
+
+    def __init__(self, labels, debuts, fins):
+        debuts = np.asarray(debuts).reshape(len(REPERES), -1)
+        fins = np.asarray(fins).reshape(len(REPERES), -1)
+        type_positions = _type_positions(debuts, fins)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int8)
+        self.debuts = np.ascontiguousarray(debuts, dtype=type_positions)
+        self.fins = np.ascontiguousarray(fins, dtype=type_positions)
+        if not (len(self.labels) == self.debuts.shape[1] == self.fins.shape[1]):
+            raise ValueError("labels, debuts et fins doivent avoir le meme nombre de segments")
+
+    @classmethod
+    def vide(cls):
+        """
+        Return an empty set of segments.
+        """
+        return cls(np.zeros(0, np.int8), np.zeros((len(REPERES), 0), np.int32), np.zeros((len(REPERES), 0), np.int32))
+
+    @classmethod
+    def depuis_listes(cls, chaine_borne_SNP, chaine_borne_P1_start, chaine_borne_P2_start, chaine_borne_R_start, chaine_borne_P1_end, chaine_borne_P2_end, chaine_borne_R_end):
+        """
+        Build the segments from the seven lists returned by chaine_borne() (same order).
+        """
+        return cls(chaine_borne_SNP,
+                   [chaine_borne_P1_start, chaine_borne_P2_start, chaine_borne_R_start],
+                   [chaine_borne_P1_end, chaine_borne_P2_end, chaine_borne_R_end])
+
+    @classmethod
+    def depuis_chaine(cls, chaine_SNP, liste_P1, liste_P2, liste_R, donneur=2):
+        """
+        Vectorized equivalent of chaine_borne() returning a Segments object.
+
+        Parameters
+        ----------
+        chaine_SNP : array-like,
+            Output of SNP_chaine() (1 or 2 for each SNP).
+        liste_P1 : array-like,
+            Position of each SNP related to the P1 genome.
+        liste_P2 : array-like,
+            Position of each SNP related to the P2 genome.
+        liste_R : array-like,
+            Position of each SNP related to the R genome.
+        donneur : int, optional
+            Donor genome (1 or 2). The default is 2.
+
+        Returns
+        -------
+        segments : Segments,
+            Same segments as chaine_borne(). Empty if there are less than 2 SNPs.
+
+        """
+        chaine = np.asarray(chaine_SNP)
+        n = len(chaine)
+        # Comme chaine_borne(), un changement entre les deux premiers ou les deux derniers SNP n'est pas une borne
+        bornes = np.flatnonzero(chaine[1:n-2] != chaine[2:n-1]) + 1
+        return cls.depuis_bornes(chaine, bornes, liste_P1, liste_P2, liste_R, donneur)
+
+    @classmethod
+    def depuis_bornes(cls, chaine_SNP, bornes, liste_P1, liste_P2, liste_R, donneur=2):
+        """
+        Build the segments of chaine_borne() from the already known boundary indices.
+
+        Parameters
+        ----------
+        chaine_SNP : array-like,
+            Output of SNP_chaine() (1 or 2 for each SNP).
+        bornes : array-like,
+            Sorted indices i (1 <= i <= n-3) such that chaine_SNP[i] != chaine_SNP[i+1].
+        liste_P1, liste_P2, liste_R : array-like,
+            Position of each SNP related to the P1, P2 and R genomes.
+        donneur : int, optional
+            Donor genome (1 or 2). The default is 2.
+
+        Returns
+        -------
+        segments : Segments,
+            Same segments as chaine_borne(). Empty if there are less than 2 SNPs.
+
+        """
+        chaine = np.asarray(chaine_SNP)
+        n = len(chaine)
+        if n < 2:
+            return cls.vide()
+        bornes = np.asarray(bornes, dtype=np.intp)
+        positions = matrice_positions(liste_P1, liste_P2, liste_R)
+        return cls.depuis_transitions(chaine[0], bornes, chaine[bornes], chaine[bornes + 1], positions, donneur)
+
+    @classmethod
+    def depuis_transitions(cls, premier_label, bornes, labels_bornes, labels_suivants, positions, donneur=2):
+        """
+        Build the segments of chaine_borne() from the parent transitions only, without the whole chain.
+
+        Parameters
+        ----------
+        premier_label : int,
+            Parent of the first SNP.
+        bornes : numpy.ndarray,
+            Sorted indices i (1 <= i <= n-3) of the SNPs ending a segment.
+        labels_bornes : numpy.ndarray,
+            Parent of the SNPs i (chaine_SNP[bornes]).
+        labels_suivants : numpy.ndarray,
+            Parent of the SNPs i+1 (chaine_SNP[bornes + 1]).
+        positions : numpy.ndarray,
+            Positions of the SNPs, shape (3, n), as returned by matrice_positions().
+        donneur : int, optional
+            Donor genome (1 or 2). The default is 2.
+
+        Returns
+        -------
+        segments : Segments,
+            Same segments as chaine_borne().
+
+        """
+        n = positions.shape[1]
+        if n < 2:
+            return cls.vide()
+        cote_donneur = labels_bornes == donneur
+        positions_bornes = positions[:, bornes]
+        positions_suivantes = positions[:, bornes + 1]
+        fins_bornes = np.where(cote_donneur, positions_bornes, positions_suivantes - 1)
+        debuts_bornes = np.where(cote_donneur, positions_bornes + 1, positions_suivantes)
+
+        labels = np.concatenate([[premier_label], labels_suivants])
+        debuts = np.hstack([positions[:, :1], debuts_bornes])
+        fins = np.hstack([fins_bornes, positions[:, n-1:]])
+        return cls(labels, debuts, fins)
+
+    @staticmethod
+    def concatener(liste_segments):
+        """
+        Concatenate several Segments (e.g. of a cohort of recombinants).
+
+        Returns
+        -------
+        segments : Segments,
+            All the segments one after the other.
+        decalages : numpy.ndarray,
+            Index of the first segment of each input in the result (length len(liste_segments) + 1).
+
+        """
+        liste_segments = list(liste_segments)
+        if not liste_segments:
+            return Segments.vide(), np.zeros(1, np.int64)
+        decalages = np.concatenate([[0], np.cumsum([len(segments) for segments in liste_segments])])
+        segments = Segments(np.concatenate([segments.labels for segments in liste_segments]),
+                            np.hstack([segments.debuts for segments in liste_segments]),
+                            np.hstack([segments.fins for segments in liste_segments]))
+        return segments, decalages
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __repr__(self):
+        return "Segments(%d segments, %d octets)" % (len(self), self.nbytes)
+
+    @property
+    def nbytes(self):
+        return self.labels.nbytes + self.debuts.nbytes + self.fins.nbytes
+
+    def projection(self, repere="R"):
+        """
+        Start and end positions of the segments in one coordinate system ("P1", "P2" or "R"), as array views.
+        """
+        i = REPERES.index(repere)
+        return self.debuts[i], self.fins[i]
+
+    def longueurs(self, repere="R"):
+        """
+        Length (end - start) of each segment in one coordinate system, as computed by the calcul_des_sommes_* functions.
+        """
+        debuts, fins = self.projection(repere)
+        return fins.astype(np.int64) - debuts
+
+    def filtrer(self, masque):
+        """
+        Return the segments selected by a boolean mask (or an array of indices).
+        """
+        return Segments(self.labels[masque], self.debuts[:, masque], self.fins[:, masque])
+
+    def parent(self, label):
+        """
+        Return the segments of one parent (1 or 2).
+        """
+        return self.filtrer(self.labels == label)
+
+    def somme(self, label=None, repere="R", longueur_min=None):
+        """
+        Total length of the segments in one coordinate system.
+
+        Parameters
+        ----------
+        label : int, optional
+            Only sum the segments of this parent (1 or 2). The default is None (all segments).
+        repere : String, optional
+            Coordinate system ("P1", "P2" or "R"). The default is "R".
+        longueur_min : int, optional
+            Only sum the segments strictly longer than this length. The default is None.
+
+        Returns
+        -------
+        somme : int,
+            Total length.
+
+        """
+        longueurs = self.longueurs(repere)
+        masque = np.ones(len(self), bool) if label is None else self.labels == label
+        if longueur_min is not None:
+            masque &= longueurs > longueur_min
+        return int(longueurs[masque].sum())
+
+    def points_rupture(self, repere="R"):
+        """
+        Breakpoint positions in one coordinate system : halfway between the end of a segment and the start of the next segment of the other parent.
+        """
+        debuts, fins = self.projection(repere)
+        changement = self.labels[1:] != self.labels[:-1]
+        return (fins[:-1][changement].astype(np.int64) + debuts[1:][changement]) // 2
+
+    def sommes_rapport_recombinant(self, repere, borne_sup=1000):
+        """
+        Array equivalent of calcul_des_sommes_rapport_recombinant() with the receptor coordinate system repere ("P1" or "P2").
+
+        Returns
+        -------
+        Same seven lists as calcul_des_sommes_rapport_recombinant().
+
+        """
+        somme_P1 = self.somme(1, repere)
+        somme_P2 = self.somme(2, repere)
+        # En cas d'egalite, P1 est le minimum comme dans calcul_des_sommes_rapport_recombinant()
+        label_min = 1 if somme_P1 <= somme_P2 else 2
+        longueurs = self.longueurs(repere)
+        longs = (self.labels == label_min) & (longueurs > borne_sup)
+        return ([somme_P1], [somme_P2], ["P" + str(label_min)], [int(longueurs[longs].sum())],
+                [int(longs.sum())], [int((self.labels == 1).sum())], [int((self.labels == 2).sum())])
+
+    def sommes_rapport_donneur(self, repere):
+        """
+        Array equivalent of calcul_des_sommes_rapport_donneur() with the donor coordinate system repere ("P1" or "P2").
+        """
+        return [self.somme(1, repere)], [self.somme(2, repere)]
+
+    def vers_listes(self):
+        """
+        Return the seven lists in the chaine_borne() order (label, P1/P2/R starts, P1/P2/R ends), e.g. for creer_excel().
+        """
+        return (self.labels.tolist(), *self.debuts.tolist(), *self.fins.tolist())
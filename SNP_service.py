@@ -0,0 +1,262 @@
+################################## Main goal ##################################
+# Long-lived analysis service, for many small jobs. A one-shot run of Main.py
+# pays the interpreter startup, the imports (numpy, pandas, xlsxwriter) and the
+# parsing of its input files. The service is started once on a local HTTP port
+# and keeps the libraries, the parsed SNP files (CacheSNP in memory) and the
+# annotation indexes warm between jobs. Jobs are JSON objects with the
+# parameters of utiliser_fonctions() and are run one after the other.
+#
+# Only the standard library is imported at the top of this file, so the client
+# commands start immediately.
+#
+# Usage : python SNP_service.py serveur --port 8765
+#         python SNP_service.py analyse fichier_triéP1.xlsm fichier_triéP2.xlsm
+#         python SNP_service.py etat / arreter
+###############################################################################
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.request import Request, urlopen
+
+
+ADRESSE_DEFAUT = ("127.0.0.1", 8765)
+# Parametres d'utiliser_fonctions() acceptes dans un travail
+PARAMETRES_ANALYSE = ("Nom_fichier_tri_P1", "Nom_fichier_tri_P2", "nb_suite_P1", "nb_suite_P2", "borne_sup",
+                      "formats_sortie", "moteur", "parametres_moteur", "lecture_parallele")
+
+
+class ServiceSNP:
+    """
+    State kept warm between the jobs : imported libraries, cache of the parsed SNP files and annotation indexes.
+
+    Parameters
+    ----------
+    dossier_cache : String, optional
+        Directory of the on-disk cache of the parsed files. The default is None (memory only).
+    taille_max_memoire : int, optional
+        Maximum size (bytes) of the parsed files kept in memory. The default is 2 GB.
+
+    """
+
+    def __init__(self, dossier_cache=None, taille_max_memoire=2 * 2**30):
+        # Imports lourds faits une fois, au demarrage du service
+        for module in ("pandas", "xlsxwriter"):
+            importlib.import_module(module)
+
+        from SNP_cache import CacheSNP
+
+        self.cache = CacheSNP(dossier_cache, taille_max_memoire=taille_max_memoire)
+        self.annotations = {}
+        self.nombre_travaux = 0
+        self.debut = time.time()
+
+    def analyser(self, travail):
+        """
+        Run utiliser_fonctions() on a job (dictionary of its parameters, nb_suite_P1/P2 default to 2) and return its summary.
+        """
+        from Main import utiliser_fonctions
+
+        inconnus = sorted(set(travail) - set(PARAMETRES_ANALYSE))
+        if inconnus:
+            raise ValueError("Parametres inconnus : " + ", ".join(inconnus))
+        parametres = {"Nom_fichier_tri_P2" : None, "nb_suite_P1" : 2, "nb_suite_P2" : 2}
+        parametres.update(travail)
+        return utiliser_fonctions(cache=self.cache, **parametres)
+
+    def index_annotations(self, nom_fichier, types=None, sequence=None):
+        """
+        Annotation index of a file, built once and kept while the file is not modified.
+        """
+        from SNP_annotations import Annotations
+
+        cle = (os.path.abspath(nom_fichier), tuple(types) if types else None, sequence)
+        modification = os.path.getmtime(nom_fichier)
+        if cle not in self.annotations or self.annotations[cle][0] != modification:
+            self.annotations[cle] = (modification, Annotations.lire(nom_fichier, types, sequence))
+        return self.annotations[cle][1]
+
+    def classer(self, travail):
+        """
+        Classify the annotations of the receptor genome for one recombinant (see SNP_annotations.Annotations.classer()).
+
+        The job gives "annotations" (GFF3 or table), "Nom_fichier_tri_P1" and optionally "Nom_fichier_tri_P2", "recepteur" (1),
+        "types", "sequence", "tolerance" (0), "nb_suite_P1" and "nb_suite_P2" (2).
+        Returns the number of annotations of each class and the names of the donor and hybrid annotations.
+        """
+        from SNP_annotations import CLASSES
+        from SNP_couverture import segments_taches
+
+        recepteur = int(travail.get("recepteur", 1))
+        annotations = self.index_annotations(travail["annotations"], travail.get("types"), travail.get("sequence"))
+        tache = {"Nom_fichier_tri_P1" : travail["Nom_fichier_tri_P1"], "Nom_fichier_tri_P2" : travail.get("Nom_fichier_tri_P2"),
+                 "nb_suite_P1" : int(travail.get("nb_suite_P1", 2)), "nb_suite_P2" : int(travail.get("nb_suite_P2", 2))}
+        _, segments = next(segments_taches([tache], recepteur, self.cache))
+        classes, _ = annotations.classer(segments, 3 - recepteur, "P" + str(recepteur), float(travail.get("tolerance", 0.0)))
+        resultat = {"nombre " + classe : int((classes == code).sum()) for code, classe in enumerate(CLASSES)}
+        for code in (2, 3):
+            resultat[CLASSES[code]] = [str(nom) for nom in annotations.noms[classes == code]]
+        return resultat
+
+    def etat(self):
+        """
+        Statistics of the service.
+        """
+        return {"pid" : os.getpid(),
+                "duree_s" : round(time.time() - self.debut, 3),
+                "nombre_travaux" : self.nombre_travaux,
+                "cache_succes" : self.cache.succes,
+                "cache_echecs" : self.cache.echecs,
+                "index_annotations" : len(self.annotations)}
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    # Requetes : GET /etat, POST /analyse, POST /annotations, POST /arreter (corps et reponses JSON)
+
+    def _repondre(self, code, contenu):
+        texte = json.dumps(contenu, default=str).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(texte)))
+        self.end_headers()
+        self.wfile.write(texte)
+
+    def do_GET(self):
+        if self.path == "/etat":
+            self._repondre(200, self.server.service.etat())
+        else:
+            self._repondre(404, {"erreur" : "Chemin inconnu : " + self.path})
+
+    def do_POST(self):
+        service = self.server.service
+        actions = {"/analyse" : service.analyser, "/annotations" : service.classer}
+        longueur = int(self.headers.get("Content-Length", 0))
+        try:
+            travail = json.loads(self.rfile.read(longueur) or b"{}")
+        except ValueError as erreur:
+            self._repondre(400, {"erreur" : "JSON invalide : %s" % erreur})
+            return
+        if self.path == "/arreter":
+            self._repondre(200, service.etat())
+            self.server.arreter = True
+            return
+        if self.path not in actions:
+            self._repondre(404, {"erreur" : "Chemin inconnu : " + self.path})
+            return
+        debut = time.time()
+        try:
+            resultat = actions[self.path](travail)
+        except Exception as erreur:
+            # Un travail en erreur n'arrete pas le service
+            self._repondre(400, {"erreur" : "%s: %s" % (type(erreur).__name__, erreur), "trace" : traceback.format_exc()})
+            return
+        service.nombre_travaux += 1
+        self._repondre(200, {"resultat" : resultat, "temps_s" : round(time.time() - debut, 6)})
+
+    def log_message(self, format, *arguments):
+        sys.stderr.write("[SNP_service] %s\n" % (format % arguments))
+
+
+def servir(hote=ADRESSE_DEFAUT[0], port=ADRESSE_DEFAUT[1], dossier_cache=None):
+    """
+    Start the service and answer the requests until POST /arreter. The jobs are run one after the other in this process.
+
+    Parameters
+    ----------
+    hote : String, optional
+        Listening address. The default is 127.0.0.1 (local jobs only).
+    port : int, optional
+        Listening port. The default is 8765.
+    dossier_cache : String, optional
+        Directory of the on-disk cache of the parsed files. The default is None (memory only).
+
+    """
+    serveur = HTTPServer((hote, port), _Gestionnaire)
+    serveur.service = ServiceSNP(dossier_cache)
+    serveur.arreter = False
+    print("Service SNP en ecoute sur http://%s:%d" % serveur.server_address[:2])
+    with serveur:
+        while not serveur.arreter:
+            serveur.handle_request()
+
+
+def soumettre(chemin, travail=None, hote=ADRESSE_DEFAUT[0], port=ADRESSE_DEFAUT[1], delai=None):
+    """
+    Send a request to the service and return its JSON answer.
+
+    Parameters
+    ----------
+    chemin : String,
+        "/analyse", "/annotations", "/etat" or "/arreter".
+    travail : dict, optional
+        Job sent as the JSON body (POST), None for GET /etat. The default is None.
+    hote, port :
+        Address of the service. The default is 127.0.0.1:8765.
+    delai : float, optional
+        Timeout (s). The default is None.
+
+    Returns
+    -------
+    reponse : dict,
+        Answer of the service. An error of the job is raised as a RuntimeError with its message.
+
+    """
+    url = "http://%s:%d%s" % (hote, port, chemin)
+    requete = Request(url) if travail is None and chemin == "/etat" else \
+        Request(url, data=json.dumps(travail or {}).encode(), headers={"Content-Type" : "application/json"})
+    try:
+        with urlopen(requete, timeout=delai) as reponse:
+            return json.loads(reponse.read())
+    except Exception as erreur:
+        corps = getattr(erreur, "read", None)
+        if corps is None:
+            raise
+        raise RuntimeError(json.loads(corps()).get("erreur", str(erreur))) from None
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Warm analysis service : start it once, then submit jobs to it.")
+    parseur.add_argument("--hote", default=ADRESSE_DEFAUT[0], help="address of the service")
+    parseur.add_argument("--port", type=int, default=ADRESSE_DEFAUT[1], help="port of the service")
+    commandes = parseur.add_subparsers(dest="commande", required=True)
+    serveur = commandes.add_parser("serveur", help="start the service")
+    serveur.add_argument("--cache", default=".cache_SNP", help="directory of the on-disk cache (empty: memory only)")
+    analyse = commandes.add_parser("analyse", help="submit an analysis (parameters of utiliser_fonctions())")
+    analyse.add_argument("Nom_fichier_tri_P1")
+    analyse.add_argument("Nom_fichier_tri_P2", nargs="?", default=None)
+    analyse.add_argument("--nb-suite-P1", type=int, default=2)
+    analyse.add_argument("--nb-suite-P2", type=int, default=2)
+    analyse.add_argument("--borne-sup", type=int, default=1000)
+    analyse.add_argument("--formats", default=None, help="comma-separated output formats (default: creer_excel())")
+    analyse.add_argument("--moteur", default="seuils", help="segmentation engine (seuils or hmm)")
+    commandes.add_parser("etat", help="print the statistics of the service")
+    commandes.add_parser("arreter", help="stop the service")
+    options = parseur.parse_args(arguments)
+
+    if options.commande == "serveur":
+        servir(options.hote, options.port, options.cache or None)
+        return 0
+    if options.commande == "analyse":
+        # Chemins absolus : le service peut tourner dans un autre dossier
+        travail = {"Nom_fichier_tri_P1" : os.path.abspath(options.Nom_fichier_tri_P1),
+                   "Nom_fichier_tri_P2" : os.path.abspath(options.Nom_fichier_tri_P2) if options.Nom_fichier_tri_P2 else None,
+                   "nb_suite_P1" : options.nb_suite_P1, "nb_suite_P2" : options.nb_suite_P2, "borne_sup" : options.borne_sup,
+                   "formats_sortie" : options.formats.split(",") if options.formats else None, "moteur" : options.moteur}
+    else:
+        travail = None if options.commande == "etat" else {}
+    try:
+        reponse = soumettre("/" + options.commande, travail, options.hote, options.port)
+    except (RuntimeError, OSError) as erreur:
+        print("Erreur : %s" % erreur, file=sys.stderr)
+        return 1
+    print(json.dumps(reponse, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
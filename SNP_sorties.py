@@ -0,0 +1,244 @@
+################################## Main goal ##################################
+# Output writers of the analysis. The tables of creer_excel() are written row by
+# row directly from the Segments arrays (no intermediate DataFrame) to one or
+# several targets:
+#   - "excel"   : xlsx workbook written in xlsxwriter constant memory mode,
+#   - "tsv"     : one tab-delimited file per table,
+#   - "parquet" : one Parquet file per table (requires pyarrow),
+#   - "bed"     : donor segments as BED intervals in R, P1 and P2 coordinates.
+###############################################################################
+
+import csv
+from itertools import zip_longest
+
+import numpy as np
+
+
+# Feuilles de creer_excel()
+TABLES = ("donnees R", "Cotes recepteur", "Somme recepteur", "Cotes donneur", "Somme donneur")
+
+
+class Sortie:
+    """
+    Base class of the output writers. A writer receives the tables one after the other with ecrire_table()
+    and the donor segments with ecrire_segments_donneur(); it ignores what its format cannot represent.
+
+    Parameters
+    ----------
+    nom_base : String,
+        Output file name without extension (the writer adds the table name and/or its extension).
+
+    """
+
+    extension = ""
+
+    def __init__(self, nom_base):
+        self.nom_base = nom_base
+        self.fichiers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def ecrire_table(self, nom_table, entetes, colonnes):
+        """
+        Write one table given as columns (arrays or lists, read by slices of rows, see _lignes()).
+        """
+
+    def ecrire_segments_donneur(self, segments, donneur):
+        """
+        Write the donor segments (SNP_segments.Segments) of the analysis.
+        """
+
+    def fermer(self):
+        """
+        Close the output files. Returns the list of the written files.
+        """
+        return self.fichiers
+
+
+# Nombre de lignes converties en types Python a la fois
+TAILLE_TRANCHE = 65536
+
+
+def _lignes(colonnes):
+    # Lignes d'une table sous forme de types Python, converties par tranches de TAILLE_TRANCHE lignes ;
+    # les colonnes plus courtes sont completees par ""
+    taille = max((len(colonne) for colonne in colonnes), default=0)
+    for debut in range(0, taille, TAILLE_TRANCHE):
+        tranches = [np.asarray(colonne[debut:debut + TAILLE_TRANCHE]).tolist() for colonne in colonnes]
+        yield from zip_longest(*tranches, fillvalue="")
+
+
+class SortieExcel(Sortie):
+    """
+    Excel workbook with one sheet per table, written in xlsxwriter constant memory mode (one row of the sheet and one
+    slice of TAILLE_TRANCHE rows of the columns in memory at a time).
+    Same sheets and layout (index column first) as creer_excel().
+    """
+
+    extension = ".xlsx"
+
+    def __init__(self, nom_base):
+        import xlsxwriter
+
+        super().__init__(nom_base)
+        self.fichiers.append(nom_base + self.extension)
+        self.classeur = xlsxwriter.Workbook(self.fichiers[0], {"constant_memory" : True})
+        self.gras = self.classeur.add_format({"bold" : True, "border" : 1, "align" : "center"})
+
+    def ecrire_table(self, nom_table, entetes, colonnes):
+        feuille = self.classeur.add_worksheet(nom_table)
+        for j, entete in enumerate(entetes):
+            feuille.write(0, j + 1, entete, self.gras)
+        for i, ligne in enumerate(_lignes(colonnes)):
+            feuille.write(i + 1, 0, i, self.gras)
+            for j, valeur in enumerate(ligne):
+                feuille.write(i + 1, j + 1, valeur)
+
+    def fermer(self):
+        if self.classeur is not None:
+            self.classeur.close()
+            self.classeur = None
+        return self.fichiers
+
+
+class SortieTSV(Sortie):
+    """
+    One tab-delimited file per table, named <nom_base>_<table>.tsv.
+    """
+
+    extension = ".tsv"
+
+    def ecrire_table(self, nom_table, entetes, colonnes):
+        nom_fichier = "%s_%s%s" % (self.nom_base, nom_table.replace(" ", "_"), self.extension)
+        with open(nom_fichier, "w", newline="", encoding="utf-8") as fichier:
+            ecrivain = csv.writer(fichier, delimiter="\t", lineterminator="\n")
+            ecrivain.writerow(entetes)
+            ecrivain.writerows(_lignes(colonnes))
+        self.fichiers.append(nom_fichier)
+
+
+class SortieParquet(Sortie):
+    """
+    One Parquet file per table, named <nom_base>_<table>.parquet. Requires the optional pyarrow package.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, nom_base):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as erreur:
+            raise ImportError("Le format de sortie 'parquet' necessite le paquet pyarrow (pip install pyarrow)") from erreur
+        super().__init__(nom_base)
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+
+    def ecrire_table(self, nom_table, entetes, colonnes):
+        nom_fichier = "%s_%s%s" % (self.nom_base, nom_table.replace(" ", "_"), self.extension)
+        colonnes = [np.asarray(colonne) for colonne in colonnes]
+        if len({len(colonne) for colonne in colonnes}) > 1:
+            # Colonnes de longueurs differentes : completees par des valeurs nulles (listes converties une seule fois)
+            taille = max(len(colonne) for colonne in colonnes)
+            colonnes = [colonne.tolist() + [None] * (taille - len(colonne)) for colonne in colonnes]
+        table = self._pyarrow.Table.from_arrays([self._pyarrow.array(colonne) for colonne in colonnes], names=list(entetes))
+        self._parquet.write_table(table, nom_fichier)
+        self.fichiers.append(nom_fichier)
+
+
+class SortieBED(Sortie):
+    """
+    Donor segments as BED intervals (0-based, end excluded), one file per coordinate system: <nom_base>_donneur_<R|P1|P2>.bed.
+
+    Parameters
+    ----------
+    nom_base : String,
+        Output file name without extension.
+    noms_sequences : dict, optional
+        Sequence (chromosome) name written in the BED files for each coordinate system. The default is the name of the coordinate system.
+
+    """
+
+    extension = ".bed"
+
+    def __init__(self, nom_base, noms_sequences=None):
+        super().__init__(nom_base)
+        self.noms_sequences = {"R" : "R", "P1" : "P1", "P2" : "P2"}
+        self.noms_sequences.update(noms_sequences or {})
+
+    def ecrire_segments_donneur(self, segments, donneur):
+        segments_donneur = segments.parent(donneur)
+        for repere in ("R", "P1", "P2"):
+            debuts, fins = segments_donneur.projection(repere)
+            # Positions MAUVE a partir de 1, bornes incluses ; les segments inverses (P2) sont remis dans l'ordre
+            debuts_bed = np.minimum(debuts, fins).astype(np.int64) - 1
+            fins_bed = np.maximum(debuts, fins)
+            nom_fichier = "%s_donneur_%s%s" % (self.nom_base, repere, self.extension)
+            with open(nom_fichier, "w", encoding="utf-8") as fichier:
+                for i, (debut, fin) in enumerate(zip(debuts_bed.tolist(), fins_bed.tolist())):
+                    fichier.write("%s\t%d\t%d\tP%d_%d\n" % (self.noms_sequences[repere], debut, fin, donneur, i))
+            self.fichiers.append(nom_fichier)
+
+
+FORMATS = {"excel" : SortieExcel, "tsv" : SortieTSV, "parquet" : SortieParquet, "bed" : SortieBED}
+
+
+def creer_sortie(format_sortie, nom_base):
+    """
+    Create the writer of one output format ("excel", "tsv", "parquet" or "bed").
+    """
+    if format_sortie not in FORMATS:
+        raise ValueError("Format de sortie inconnu : %s (formats possibles : %s)" % (format_sortie, ", ".join(FORMATS)))
+    return FORMATS[format_sortie](nom_base)
+
+
+def ecrire_analyse(formats_sortie, nom_base, segments, segments_donneur, donneur, sommes_recepteur, somme_donneur, liste_taille_snp):
+    """
+    Write the results of one receptor/donor orientation (same tables as creer_excel()) to several formats.
+
+    Parameters
+    ----------
+    formats_sortie : iterable,
+        Output formats, keys of FORMATS.
+    nom_base : String,
+        Output file name without extension.
+    segments : SNP_segments.Segments,
+        Segments of the SNPs sorted on the receptor.
+    segments_donneur : SNP_segments.Segments,
+        Segments of the SNPs sorted on the donor.
+    donneur : int,
+        Donor genome (1 or 2).
+    sommes_recepteur : tuple,
+        Output of calcul_des_sommes_rapport_recombinant() (or Segments.sommes_rapport_recombinant()).
+    somme_donneur : list,
+        Total length of donor fragments relative to the donor.
+    liste_taille_snp : array-like,
+        Number of SNPs of each segment (output of compteur_snp()).
+
+    Returns
+    -------
+    fichiers : list,
+        Names of the written files.
+
+    """
+    somme_P1, somme_P2, min_P1_P2, _, _, compt_P1, compt_P2 = sommes_recepteur
+    repere_donneur = "P" + str(donneur)
+    fichiers = []
+    for format_sortie in formats_sortie:
+        with creer_sortie(format_sortie, nom_base) as sortie:
+            debuts_R, fins_R = segments.projection("R")
+            sortie.ecrire_table(TABLES[0], ["Pattern", "Start", "End"], [segments.labels, debuts_R, fins_R])
+            sortie.ecrire_table(TABLES[1], ["Pattern", "Nombre de SNP", "Start P1", "End P1", "Start P2", "End P2"],
+                                [segments.labels, liste_taille_snp, *segments.projection("P1"), *segments.projection("P2")])
+            sortie.ecrire_table(TABLES[2], ["somme P1", "somme P2", "min P1 P2", "nombre de fragments P1", "nombre de fragments P2"],
+                                [somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2])
+            sortie.ecrire_table(TABLES[3], ["Pattern", "Start " + repere_donneur, "End " + repere_donneur],
+                                [segments_donneur.labels, *segments_donneur.projection(repere_donneur)])
+            sortie.ecrire_table(TABLES[4], ["Somme du donneur"], [somme_donneur])
+            sortie.ecrire_segments_donneur(segments, donneur)
+        fichiers.extend(sortie.fichiers)
+    return fichiers
@@ -0,0 +1,55 @@
+"""
+Shared fixtures of the tests : random generator and random SNP tables.
+
+The random tests draw their tables one after the other from the generator of the default seed.
+Only tests/test_SNP_segmentation.py is parametrized on "graine", so a failing table is reported by its seed.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+
+TableAleatoire = namedtuple("TableAleatoire", ["codes", "positions", "base", "nombre_suite_P1", "nombre_suite_P2"])
+
+
+@pytest.fixture
+def graine():
+    return 0
+
+
+@pytest.fixture
+def generateur(graine):
+    return np.random.default_rng(graine)
+
+
+@pytest.fixture
+def table_aleatoire(generateur):
+    """
+    Factory of random SNP tables : labels (int8, 1 or 2, with a random P1 proportion), strictly increasing
+    (3, n) positions in P1, P2 and R, receptor genome and minimum numbers of successive SNPs.
+    """
+    def generer(taille_max=300, taille_min=0, pas_max=3000, suite_max=5):
+        n = int(generateur.integers(taille_min, taille_max))
+        codes = np.where(generateur.random(n) < generateur.random(), 1, 2).astype(np.int8)
+        positions = np.cumsum(generateur.integers(1, pas_max, (3, n)), axis=1)
+        base = int(generateur.integers(1, 3))
+        nombre_suite_P1, nombre_suite_P2 = (int(x) for x in generateur.integers(1, suite_max, 2))
+        return TableAleatoire(codes, positions, base, nombre_suite_P1, nombre_suite_P2)
+    return generer
+
+
+@pytest.fixture
+def export_mauve(tmp_path):
+    """
+    Factory of small simulated MAUVE SNP exports (tab-delimited, sorted on P1) written in tmp_path.
+    """
+    from SNP_benchmark import generer_snp_mauve, ecrire_export_mauve
+
+    def ecrire(nom="SNP_triP1.snps", nombre_snp=2000, graine=0):
+        mon_fichier = generer_snp_mauve(longueur_genome=200000, nombre_snp=nombre_snp, nombre_fragments=5,
+                                        longueur_fragment=10000, graine=graine)
+        nom_fichier = str(tmp_path / nom)
+        ecrire_export_mauve(mon_fichier, nom_fichier)
+        return nom_fichier
+    return ecrire
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from Batch import COLONNES_MANIFESTE, ecrire_resume, executer_lot, lire_manifeste
+from Main import utiliser_fonctions
+
+
+def test_lire_manifeste(tmp_path):
+    dossier = tmp_path / "lot"
+    dossier.mkdir()
+    absolu = str(tmp_path / "ailleurs_triP1.xlsx")
+    (dossier / "manifeste.tsv").write_text("# commentaire\n"
+                                           "Nom_fichier_tri_P1\tNom_fichier_tri_P2\tnb_suite_P1\n"
+                                           "R1_triP1.xlsx\tR1_triP2.xlsx\t3\n"
+                                           "sous/R2_triP1.snps\t\t\n"
+                                           + absolu + "\t\t4\n")
+    taches = lire_manifeste(str(dossier / "manifeste.tsv"))
+    assert [list(tache) for tache in taches] == [COLONNES_MANIFESTE] * 3
+    # Chemins relatifs au dossier du manifeste, chemins absolus conserves
+    assert [tache['Nom_fichier_tri_P1'] for tache in taches] == [str(dossier / "R1_triP1.xlsx"), str(dossier / "sous" / "R2_triP1.snps"), absolu]
+    assert [tache['Nom_fichier_tri_P2'] for tache in taches] == [str(dossier / "R1_triP2.xlsx"), None, None]
+    # Valeurs par defaut des colonnes absentes ou vides
+    assert [tache['nb_suite_P1'] for tache in taches] == [3, 2, 4]
+    assert all(tache['nb_suite_P2'] == 2 and tache['borne_sup'] == 1000 for tache in taches)
+    assert all(type(tache['nb_suite_P1']) is int for tache in taches)
+
+
+def test_lire_manifeste_colonne_manquante(tmp_path):
+    nom = tmp_path / "manifeste.csv"
+    nom.write_text("fichier,nb_suite_P1\nR1.xlsx,2\n")
+    with pytest.raises(ValueError, match="Nom_fichier_tri_P1"):
+        lire_manifeste(str(nom))
+
+
+def test_executer_lot(tmp_path, export_mauve):
+    nom = export_mauve()
+    taches = [{'Nom_fichier_tri_P1' : nom, 'Nom_fichier_tri_P2' : None, 'nb_suite_P1' : 2, 'nb_suite_P2' : 2, 'borne_sup' : 1000},
+              {'Nom_fichier_tri_P1' : str(tmp_path / "absent_triP1.snps"), 'Nom_fichier_tri_P2' : None,
+               'nb_suite_P1' : 2, 'nb_suite_P2' : 2, 'borne_sup' : 1000}]
+    resume = executer_lot(taches, nombre_processus=2, formats_sortie=["tsv"])
+
+    assert resume['Erreur'].tolist()[0] == ""
+    assert resume['Erreur'].tolist()[1].startswith("FileNotFoundError")
+    attendu = utiliser_fonctions(nom, None, 2, 2, formats_sortie=["tsv"])
+    for colonne, valeur in attendu.items():
+        assert resume.loc[0, colonne] == valeur
+    # Le recombinant en echec ne convertit pas les colonnes entieres en flottants
+    assert resume['somme P1'].dtype == "Int64" and resume['nombre de fragments sup'].dtype == "Int64"
+    assert pd.isna(resume.loc[1, 'somme P1'])
+
+    ecrire_resume(resume, str(tmp_path / "resume.tsv"))
+    lignes = (tmp_path / "resume.tsv").read_text().splitlines()
+    colonnes = lignes[0].split("\t")
+    valeurs = [dict(zip(colonnes, ligne.split("\t"))) for ligne in lignes[1:]]
+    assert valeurs[0]['somme P1'] == str(attendu['somme P1']) and valeurs[1]['somme P1'] == ""
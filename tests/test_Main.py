@@ -0,0 +1,52 @@
+import glob
+import os
+import re
+
+import pandas as pd
+
+import Main
+from SNP_cache import CacheSNP
+
+
+def _analyser(nom_P1, nom_P2, lecture_parallele):
+    # Deux analyses avec le meme cache : resumes, compteurs du cache et tables ecrites
+    cache = CacheSNP()
+    resumes = [Main.utiliser_fonctions(nom_P1, nom_P2, 2, 3, cache, formats_sortie=["tsv"], lecture_parallele=lecture_parallele)
+               for essai in range(2)]
+    # Tables ecrites, sans la date du nom de fichier, puis effacees avant l'analyse suivante
+    sorties = {}
+    for nom in glob.glob(os.path.join(os.path.dirname(nom_P1), "*.tsv")):
+        with open(nom) as fichier:
+            sorties[re.sub(r"_sortie_.* \d\d_\d\d_", "_", os.path.basename(nom))] = fichier.read()
+        os.remove(nom)
+    return resumes, (cache.succes, cache.echecs), sorties
+
+
+def test_lecture_parallele_identique_sequentielle(export_mauve, monkeypatch):
+    nom_P1 = export_mauve("SNP_triP1.snps")
+    nom_P2 = os.path.join(os.path.dirname(nom_P1), "SNP_triP2.snps")
+    # Inversion d'un bloc de SNP sur P2, pour que le fichier trie P2 differe du fichier trie P1
+    tableau = pd.read_csv(nom_P1, sep="\t")
+    tableau.loc[500:999, "sequence_2_PosInContg"] = tableau.loc[500:999, "sequence_2_PosInContg"].values[::-1]
+    tableau.to_csv(nom_P1, sep="\t", index=False)
+    tableau.sort_values("sequence_2_PosInContg", kind="stable").to_csv(nom_P2, sep="\t", index=False)
+
+    # Donnees du donneur passees a l'orientation P1 recepteur : fonction (lecture differee) ou deja lues
+    differees = []
+    analyser_orientation = Main.analyser_orientation
+
+    def espion(donnees_recepteur, donnees_donneur, *arguments, **options):
+        differees.append(callable(donnees_donneur))
+        return analyser_orientation(donnees_recepteur, donnees_donneur, *arguments, **options)
+    monkeypatch.setattr(Main, "analyser_orientation", espion)
+
+    for nom_fichier_P2, echecs in ((None, 1), (nom_P2, 2)):
+        differees.clear()
+        resumes, compteurs, sorties = _analyser(nom_P1, nom_fichier_P2, None)
+        assert compteurs == (echecs, echecs) and not any(differees)
+        assert resumes[0] == resumes[1] and len(sorties) > 0
+        for lecture_parallele in ("threads", "processus"):
+            differees.clear()
+            assert _analyser(nom_P1, nom_fichier_P2, lecture_parallele) == (resumes, compteurs, sorties)
+            # Fichier trie P2 attendu seulement apres la segmentation par rapport a P1
+            assert differees[0] == (nom_fichier_P2 is not None)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from SNP import COLONNES_MAUVE, SNP_parent, attribuer_parents, trier_SNP
+
+
+# Cas particuliers : casse mixte, N (majuscule ou minuscule) a chaque place, motifs vides (NaN),
+# positions nulles en P1, P2 ou R, base du recombinant differente des deux parents
+CAS = [("AcA", 10, 20, 30), ("aCc", 11, 21, 31), ("GGg", 12, 22, 32), ("Nac", 13, 23, 33), ("anA", 14, 24, 34),
+       ("acN", 15, 25, 35), ("ACn", 16, 26, 36), (np.nan, 17, 27, 37), ("aca", 0, 28, 38), ("acc", 19, 0, 39),
+       ("aca", 40, 50, 0), ("acg", 41, 51, 61), ("TgT", 42, 52, 62)]
+
+
+def _tableau_aleatoire(generateur, n=300):
+    motifs = ["".join(bases) for bases in generateur.choice(list("acgtACGTnN"), (n, 3), p=[0.12] * 8 + [0.02, 0.02])]
+    motifs = np.array(motifs, dtype=object)
+    motifs[generateur.random(n) < 0.02] = np.nan
+    positions = np.cumsum(generateur.integers(1, 50, (3, n)), axis=1) * np.where(generateur.random((3, n)) < 0.03, 0, 1)
+    return pd.DataFrame(dict(zip(COLONNES_MAUVE, [motifs, *positions])))
+
+
+@pytest.fixture
+def fichier_excel(tmp_path, generateur):
+    tableau = pd.concat([pd.DataFrame(CAS, columns=COLONNES_MAUVE), _tableau_aleatoire(generateur)], ignore_index=True)
+    # Colonne non utilisee de l'export MAUVE
+    tableau.insert(1, "sequence_1_Contig", "contig_1")
+    nom = tmp_path / "snp_triP1.xlsx"
+    tableau.to_excel(nom, index=False)
+    return str(nom)
+
+
+def test_SNP_parent_vectorise_identique_boucle(fichier_excel):
+    attendu = SNP_parent(fichier_excel)
+    obtenu = SNP_parent(fichier_excel, vectorise=True)
+    assert all(isinstance(colonne, list) for colonne in attendu)
+    assert [colonne.tolist() for colonne in obtenu] == [list(colonne) for colonne in attendu]
+    assert len(attendu[0]) > 0
+
+
+def test_attribuer_parents_cas_particuliers():
+    labels, positions_P1, positions_P2, positions_R = attribuer_parents(*zip(*CAS))
+    assert labels.tolist() == ["P1", "P2", "P1", "P1", "P1"]
+    assert positions_P1.tolist() == [10, 11, 12, 40, 42]
+    assert positions_R.tolist() == [30, 31, 32, 0, 62]
+
+
+def test_trier_SNP_identique_fichier_trie_P2(tmp_path, generateur):
+    tableau = _tableau_aleatoire(generateur)
+    # Positions P2 distinctes et dans un autre ordre que les positions P1 (SNP d'une inversion par exemple)
+    tableau["sequence_2_PosInContg"] = generateur.permutation(len(tableau)) + 1
+    tableau.to_excel(tmp_path / "snp_triP1.xlsx", index=False)
+    tableau.sort_values("sequence_2_PosInContg").to_excel(tmp_path / "snp_triP2.xlsx", index=False)
+
+    obtenu = trier_SNP(*SNP_parent(str(tmp_path / "snp_triP1.xlsx"), vectorise=True), genome=2)
+    attendu = SNP_parent(str(tmp_path / "snp_triP2.xlsx"))
+    assert [colonne.tolist() for colonne in obtenu] == [list(colonne) for colonne in attendu]
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from SNP_annotations import Annotations
+from SNP_segmentation import segmenter
+from SNP_segments import Segments
+
+
+def _annotations_aleatoires(generateur, longueur_genome=20000):
+    # Annotations courtes et quelques tres longues (gardees a part par l'index)
+    nombre = int(generateur.integers(1, 60))
+    debuts = generateur.integers(1, longueur_genome, nombre)
+    fins = debuts + generateur.integers(0, 200, nombre)
+    nombre_longues = int(generateur.integers(0, 3))
+    debuts_longues = generateur.integers(1, longueur_genome // 2, nombre_longues)
+    fins_longues = debuts_longues + generateur.integers(longueur_genome // 3, longueur_genome, nombre_longues)
+    debuts, fins = np.concatenate((debuts, debuts_longues)), np.concatenate((fins, fins_longues))
+    # Certaines annotations sont donnees a l'envers
+    inverses = generateur.random(len(debuts)) < 0.2
+    debuts[inverses], fins[inverses] = fins[inverses], debuts[inverses].copy()
+    return Annotations(["a%d" % i for i in range(len(debuts))], debuts, fins)
+
+
+def _couverture_bases(debuts, fins, longueur):
+    # Nombre d'intervalles couvrant chaque base 1..longueur (indice 0 inutilise)
+    couverture = np.zeros(longueur + 2, dtype=np.int64)
+    for debut, fin in zip(debuts.tolist(), fins.tolist()):
+        couverture[max(debut, 0):max(min(fin, longueur) + 1, 0)] += 1
+    return couverture
+
+
+def test_chevauchements_et_compter_identiques_force_brute(generateur):
+    longues_vues = 0
+    for essai in range(200):
+        annotations = _annotations_aleatoires(generateur)
+        longues_vues += len(annotations._longues) > 0
+        nombre = int(generateur.integers(0, 40))
+        debuts = generateur.integers(-100, 21000, nombre)
+        fins = debuts + generateur.integers(-50, 3000, nombre)
+        chevauche = (np.minimum(debuts, fins)[:, None] <= annotations.fins[None, :]) & (np.maximum(debuts, fins)[:, None] >= annotations.debuts[None, :])
+        requetes, indices = annotations.chevauchements(debuts, fins)
+        attendues_requetes, attendues_indices = np.nonzero(chevauche)
+        assert requetes.tolist() == attendues_requetes.tolist()
+        assert indices.tolist() == attendues_indices.tolist()
+        assert annotations.compter(debuts, fins).tolist() == chevauche.sum(axis=1).tolist()
+    assert longues_vues > 0
+
+
+def test_chevauchements_annotation_longue():
+    # Une annotation longue ne doit pas elargir la recherche des courtes et doit etre trouvee loin de son debut
+    annotations = Annotations(["a", "b", "c", "longue"], [10, 20, 30, 1], [12, 22, 32, 100000], facteur_long=4)
+    assert annotations._longues.tolist() == [0]
+    requetes, indices = annotations.chevauchements([21, 90000], [21, 90001])
+    assert requetes.tolist() == [0, 0, 1]
+    assert annotations.noms[indices].tolist() == ["longue", "b", "longue"]
+
+
+def test_fractions_couvertes_identiques_force_brute(generateur):
+    longueur = 25000
+    for essai in range(200):
+        annotations = _annotations_aleatoires(generateur)
+        # Intervalles disjoints et dans le desordre, plus quelques intervalles vides
+        bornes = np.sort(generateur.choice(np.arange(1, longueur), 2 * int(generateur.integers(0, 30)), replace=False))
+        debuts, fins = bornes[0::2], bornes[1::2]
+        ordre = generateur.permutation(len(debuts))
+        debuts = np.concatenate((debuts[ordre], [500, 9000]))
+        fins = np.concatenate((fins[ordre], [400, 8999]))
+        cumul = np.cumsum(_couverture_bases(debuts, fins, longueur))
+        attendu = cumul[np.minimum(annotations.fins, longueur)] - cumul[annotations.debuts - 1]
+        assert annotations.fractions_couvertes(debuts, fins).tolist() == attendu.tolist()
+
+
+def test_fractions_couvertes_sans_intervalle():
+    annotations = Annotations(["a", "b"], [1, 5], [3, 9])
+    assert annotations.fractions_couvertes([], []).tolist() == [0, 0]
+
+
+def test_classer_identique_force_brute(generateur, table_aleatoire):
+    for essai in range(50):
+        table = table_aleatoire(taille_min=5)
+        segments = segmenter(table.codes, *table.positions, 1, 2, table.nombre_suite_P1, table.nombre_suite_P2).segments
+        longueur = int(table.positions[0][-1]) + 10
+        annotations = _annotations_aleatoires(generateur, longueur)
+        cumul_couvert = np.cumsum(_couverture_bases(*segments.projection("P1"), longueur))
+        cumul_donneur = np.cumsum(_couverture_bases(*segments.parent(2).projection("P1"), longueur))
+        fins = np.minimum(annotations.fins, longueur)
+        couvertes = cumul_couvert[fins] - cumul_couvert[annotations.debuts - 1]
+        donneur = cumul_donneur[fins] - cumul_donneur[annotations.debuts - 1]
+        for tolerance in (0.0, 0.2):
+            classes, fractions = annotations.classer(segments, 2, "P1", tolerance)
+            for i in range(len(annotations)):
+                if couvertes[i] == 0:
+                    assert classes[i] == 0 and np.isnan(fractions[i])
+                    continue
+                fraction = donneur[i] / couvertes[i]
+                assert fractions[i] == pytest.approx(fraction)
+                attendue = 2 if fraction >= 1 - tolerance else 1 if fraction <= tolerance else 3
+                assert classes[i] == attendue
+
+
+def test_classer_tolerance():
+    # Annotation 1-100 : 5 bases du donneur puis 95 du recepteur ; annotation 201-300 non couverte
+    segments = Segments([2, 1], [[1, 6], [1, 6], [1, 6]], [[5, 100], [5, 100], [5, 100]])
+    annotations = Annotations(["hybride", "vide"], [1, 201], [100, 300])
+    classes, fractions = annotations.classer(segments, 2, "P1")
+    assert classes.tolist() == [3, 0]
+    assert fractions[0] == pytest.approx(0.05) and np.isnan(fractions[1])
+    assert annotations.classer(segments, 2, "P1", tolerance=0.1)[0].tolist() == [1, 0]
+    # Meme annotation vue depuis l'autre parent
+    assert annotations.classer(segments, 1, "P1", tolerance=0.1)[0].tolist() == [2, 0]
+
+
+def test_depuis_gff(tmp_path):
+    nom_fichier = tmp_path / "regions.gff3"
+    nom_fichier.write_text("##gff-version 3\n"
+                           "# commentaire\n"
+                           "\n"
+                           "chr1\tantiSMASH\tregion\t500\t900\t.\t+\t.\tID=r1;Name=NRPS%2Cregion%201\n"
+                           "chr1\tprokka\tgene\t100\t50\t.\t-\t.\tID=g1;locus_tag=SCO_0001\n"
+                           "chr1\tprokka\tgene\t1000\t1200\t.\t+\t.\tNote=sans nom\n"
+                           "chr2\tprokka\tgene\t10\t20\t.\t+\t.\tgene=abcD;ID=g3\n"
+                           "chr1\tprokka\tgene\t30\n"
+                           "##FASTA\n"
+                           ">chr1\n"
+                           "ACGT\tA\tB\tC\t1\t2\t.\t.\t.\tName=faux\n")
+
+    annotations = Annotations.depuis_gff(str(nom_fichier))
+    assert annotations.noms.tolist() == ["abcD", "SCO_0001", "NRPS,region 1", "gene_2"]
+    assert annotations.types.tolist() == ["gene", "gene", "region", "gene"]
+    assert annotations.debuts.tolist() == [10, 50, 500, 1000]
+    assert annotations.fins.tolist() == [20, 100, 900, 1200]
+
+    assert Annotations.depuis_gff(str(nom_fichier), types=("region",)).noms.tolist() == ["NRPS,region 1"]
+    assert Annotations.depuis_gff(str(nom_fichier), sequence="chr1").noms.tolist() == ["SCO_0001", "NRPS,region 1", "gene_2"]
+    assert Annotations.lire(str(nom_fichier), types=("gene",), sequence="chr2").noms.tolist() == ["abcD"]
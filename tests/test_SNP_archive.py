@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from SNP_archive import ArchiveSNP, ecrire_archive
+from SNP_segments import REPERES
+
+
+def _fenetre_reference(codes, positions, debut, fin, repere):
+    # Force brute : tri stable sur le repere puis filtre des positions dans [debut, fin]
+    i = REPERES.index(repere)
+    ordre = np.argsort(positions[i], kind="stable")
+    cles = positions[i, ordre]
+    garde = np.ones(len(ordre), bool)
+    if debut is not None:
+        garde &= cles >= debut
+    if fin is not None:
+        garde &= cles <= fin
+    ordre = ordre[garde]
+    return (codes[ordre], *positions[:, ordre])
+
+
+def test_fenetres(tmp_path, generateur, table_aleatoire):
+    for essai in range(100):
+        table = table_aleatoire(taille_max=400)
+        n = len(table.codes)
+        # Positions non triees et repetees dans les trois reperes (inversions, duplications)
+        positions = table.positions.copy()
+        for i in range(3):
+            if generateur.random() < 0.7:
+                positions[i] = generateur.permutation(positions[i]) // int(generateur.integers(1, 20))
+        nom = str(tmp_path / "table.snpa")
+        ecrire_archive(nom, table.codes, *positions, taille_bloc=int(generateur.integers(1, 9)))
+
+        with ArchiveSNP(nom) as archive:
+            assert len(archive) == n
+            maximum = int(positions.max()) if n else 10
+            for _ in range(20):
+                repere = REPERES[int(generateur.integers(0, 3))]
+                debut, fin = sorted(int(x) for x in generateur.integers(-10, maximum + 10, 2))
+                if generateur.random() < 0.1:
+                    debut = None
+                if generateur.random() < 0.1:
+                    fin = None
+                obtenu = archive.fenetre(debut, fin, repere)
+                attendu = _fenetre_reference(table.codes, positions, debut, fin, repere)
+                for colonne_obtenue, colonne_attendue in zip(obtenu, attendu):
+                    assert colonne_obtenue.tolist() == colonne_attendue.tolist()
+                if debut is not None and fin is not None:
+                    i, j = archive.indices(debut, fin, repere)
+                    assert j - i == len(attendu[0])
+            labels = archive.fenetre(repere="R", codes_labels=False)[0]
+            assert labels.tolist() == ["P%d" % code for code in _fenetre_reference(table.codes, positions, None, None, "R")[0]]
+
+
+def test_archive_vide(tmp_path):
+    nom = str(tmp_path / "vide.snpa")
+    ecrire_archive(nom, np.zeros(0, np.int8), [], [], [])
+    with ArchiveSNP(nom) as archive:
+        assert len(archive) == 0
+        assert [len(colonne) for colonne in archive.fenetre(1, 100, "P2")] == [0, 0, 0, 0]
+
+
+def test_magique_invalide(tmp_path):
+    nom = tmp_path / "faux.snpa"
+    ecrire_archive(str(nom), ["P1", "P2"], [1, 2], [3, 4], [5, 6])
+    contenu = nom.read_bytes()
+    nom.write_bytes(b"SNPARCH0" + contenu[8:])
+    with pytest.raises(ValueError, match="n'est pas une archive"):
+        ArchiveSNP(str(nom))
+
+
+def test_version_invalide(tmp_path):
+    nom = tmp_path / "ancienne.snpa"
+    ecrire_archive(str(nom), ["P1", "P2"], [1, 2], [3, 4], [5, 6])
+    contenu = nom.read_bytes()
+    assert contenu.count(b'"version": 1,') == 1
+    nom.write_bytes(contenu.replace(b'"version": 1,', b'"version": 9,'))
+    with pytest.raises(ValueError, match="Version"):
+        ArchiveSNP(str(nom))
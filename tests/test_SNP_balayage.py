@@ -0,0 +1,31 @@
+from SNP_balayage import balayer_seuils
+from SNP_segmentation import segmenter
+
+
+def _identique_segmenter(table, tableau, liste_segments, valeurs):
+    repere = "P" + str(table.base)
+    assert tableau[["nb_suite_P1", "nb_suite_P2"]].values.tolist() == [[a, b] for a in valeurs for b in valeurs]
+    for ligne in tableau.to_dict("records"):
+        paire = (ligne["nb_suite_P1"], ligne["nb_suite_P2"])
+        attendu = segmenter(table.codes, *table.positions, table.base, 3 - table.base, *paire).segments
+        assert liste_segments[paire].vers_listes() == attendu.vers_listes()
+        somme_P1, somme_P2, min_P1_P2, somme_sup, compt, compt_P1, compt_P2 = attendu.sommes_rapport_recombinant(repere, 500)
+        assert [ligne["somme P1"], ligne["somme P2"], ligne["min P1 P2"], ligne["somme sup"], ligne["nombre de fragments sup"],
+                ligne["nombre de fragments P1"], ligne["nombre de fragments P2"]] == \
+               [somme_P1[0], somme_P2[0], min_P1_P2[0], somme_sup[0], compt[0], compt_P1[0], compt_P2[0]]
+
+
+def test_grille_identique_segmenter(table_aleatoire):
+    valeurs = range(1, 6)
+    for essai in range(50):
+        table = table_aleatoire()
+        tableau, liste_segments = balayer_seuils(table.codes, *table.positions, valeurs, valeurs, table.base, 3 - table.base, 500)
+        _identique_segmenter(table, tableau, liste_segments, valeurs)
+
+
+def test_grille_pool_de_processus(table_aleatoire):
+    table = table_aleatoire(taille_min=200, taille_max=400)
+    valeurs = range(1, 5)
+    tableau, liste_segments = balayer_seuils(table.codes, *table.positions, valeurs, valeurs, table.base, 3 - table.base, 500,
+                                             nombre_processus=3)
+    _identique_segmenter(table, tableau, liste_segments, valeurs)
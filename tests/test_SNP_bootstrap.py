@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from SNP_bootstrap import _perturbations, bootstrap, segments_lot
+from SNP_segmentation import segmenter
+
+
+def test_segments_lot_identique_segmenter(table_aleatoire, generateur):
+    for essai in range(300):
+        table = table_aleatoire()
+        nombre = int(generateur.integers(1, 6))
+        reechantillonner = bool(essai % 2)
+        taux_erreur = float(generateur.choice([0.0, 0.05, 0.3]))
+        indices, inverses = _perturbations(generateur, len(table.codes), nombre, reechantillonner, taux_erreur)
+        donneur = 3 - table.base
+        liste_segments = segments_lot(table.codes, table.positions, indices, inverses, table.base, donneur,
+                                      table.nombre_suite_P1, table.nombre_suite_P2)
+        # Repliques reconstruites une par une : SNP tires puis labels inverses
+        labels_lot = table.codes[indices]
+        if inverses is not None:
+            labels_lot.flat[inverses] = 3 - labels_lot.flat[inverses]
+        assert len(liste_segments) == nombre
+        for k in range(nombre):
+            attendu = segmenter(labels_lot[k], *table.positions[:, indices[k]], table.base, donneur,
+                                table.nombre_suite_P1, table.nombre_suite_P2).segments
+            assert liste_segments[k].vers_listes() == attendu.vers_listes()
+
+
+def test_bootstrap_independant_du_nombre_de_processus(table_aleatoire):
+    table = table_aleatoire(taille_min=200, taille_max=400)
+    parametres = dict(base=table.base, donneur=3 - table.base, nombre_suite_P1=table.nombre_suite_P1, nombre_suite_P2=table.nombre_suite_P2,
+                      nombre_repliques=40, taux_erreur=0.02, taille_lot=7, graine=3)
+    seul = bootstrap(table.codes, *table.positions, **parametres)
+    pool = bootstrap(table.codes, *table.positions, nombre_processus=2, **parametres)
+    for attendu, obtenu in zip(seul, pool):
+        pd.testing.assert_frame_equal(obtenu, attendu)
+    assert len(seul.repliques) == 40
+    # Une autre graine donne d'autres repliques
+    autre = bootstrap(table.codes, *table.positions, **dict(parametres, graine=4))
+    assert not np.array_equal(autre.repliques.values, seul.repliques.values)
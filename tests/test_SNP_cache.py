@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pytest
+
+from SNP import COLONNES_MAUVE
+from SNP_cache import CacheSNP
+
+
+class Lecture:
+    # Lecture factice comptant ses appels : colonnes deduites du contenu du fichier
+    def __init__(self):
+        self.appels = 0
+
+    def __call__(self, nom_fichier):
+        self.appels += 1
+        with open(nom_fichier, "rb") as fichier:
+            contenu = np.frombuffer(fichier.read(), dtype=np.uint8)
+        return contenu.astype(np.int8), contenu.astype(np.int64) * 2
+
+
+def _ecrire(chemin, contenu, temps=None):
+    chemin.write_bytes(contenu)
+    if temps is not None:
+        os.utime(chemin, ns=(temps, temps))
+    return str(chemin)
+
+
+@pytest.fixture
+def lecture():
+    return Lecture()
+
+
+def test_succes_et_echec(tmp_path, lecture):
+    nom = _ecrire(tmp_path / "snp.tsv", b"abcdef")
+    cache = CacheSNP()
+    premier = cache.charger(nom, COLONNES_MAUVE, lecture)
+    second = cache.charger(nom, COLONNES_MAUVE, lecture)
+    assert lecture.appels == 1 and (cache.succes, cache.echecs) == (1, 1)
+    assert all(a is b for a, b in zip(premier, second))
+    # Autre schema de colonnes : autre cle
+    cache.charger(nom, COLONNES_MAUVE[:2], lecture)
+    assert lecture.appels == 2
+
+
+def test_chercher(tmp_path, lecture):
+    nom = _ecrire(tmp_path / "snp.tsv", b"abcdef")
+    cache = CacheSNP()
+    cle, colonnes = cache.chercher(nom, COLONNES_MAUVE)
+    assert colonnes is None and cle == cache.cle(nom, COLONNES_MAUVE)
+    cache.stocker(cle, lecture(nom))
+    assert cache.chercher(nom, COLONNES_MAUVE)[1] is not None
+    assert (cache.succes, cache.echecs) == (1, 1)
+
+
+def test_modification_invalide_entree(tmp_path, lecture):
+    chemin = tmp_path / "snp.tsv"
+    nom = _ecrire(chemin, b"abcdef", 10**18)
+    cache = CacheSNP()
+    cache.charger(nom, COLONNES_MAUVE, lecture)
+    # Meme taille, autre contenu et autre date : relu
+    _ecrire(chemin, b"abcdeg", 10**18 + 10**9)
+    colonnes = cache.charger(nom, COLONNES_MAUVE, lecture)
+    assert lecture.appels == 2 and colonnes[0][-1] == ord("g")
+    # Date changee mais contenu identique : meme empreinte, pas relu
+    _ecrire(chemin, b"abcdeg", 10**18 + 2 * 10**9)
+    cache.charger(nom, COLONNES_MAUVE, lecture)
+    assert lecture.appels == 2 and cache.succes == 1
+
+
+def test_eviction_memoire(tmp_path, lecture):
+    noms = [_ecrire(tmp_path / ("snp%d.tsv" % i), bytes(range(i, i + 100))) for i in range(3)]
+    # Une entree = 100 octets int8 + 800 octets int64 : deux entrees tiennent en memoire
+    cache = CacheSNP(taille_max_memoire=2000)
+    cles = [cache.cle(nom, COLONNES_MAUVE) for nom in noms]
+    cache.charger(noms[0], COLONNES_MAUVE, lecture)
+    cache.charger(noms[1], COLONNES_MAUVE, lecture)
+    cache.obtenir(cles[0])
+    cache.charger(noms[2], COLONNES_MAUVE, lecture)
+    # La moins recemment utilisee (1) est evincee
+    assert cache.obtenir(cles[1]) is None
+    assert cache.obtenir(cles[0]) is not None and cache.obtenir(cles[2]) is not None
+    # Une entree plus grande que la memoire n'est pas gardee
+    petit = CacheSNP(taille_max_memoire=500)
+    petit.charger(noms[0], COLONNES_MAUVE, lecture)
+    assert petit.obtenir(cles[0]) is None
+
+
+def test_eviction_disque(tmp_path, lecture):
+    dossier = str(tmp_path / "cache")
+    noms = [_ecrire(tmp_path / ("snp%d.tsv" % i), bytes(range(i, i + 100))) for i in range(3)]
+    cache = CacheSNP(dossier, taille_max_memoire=0)
+    cache.charger(noms[0], COLONNES_MAUVE, lecture)
+    taille_fichier = os.path.getsize(os.path.join(dossier, os.listdir(dossier)[0]))
+    cache.taille_max_disque = 2 * taille_fichier
+    cles = [cache.cle(nom, COLONNES_MAUVE) for nom in noms]
+    chemins = [os.path.join(dossier, cle + ".npz") for cle in cles]
+    cache.charger(noms[1], COLONNES_MAUVE, lecture)
+    # Dates d'utilisation distinctes : 0 plus ancienne que 1, puis 0 relue depuis le disque (date mise a jour)
+    os.utime(chemins[0], ns=(10**18, 10**18))
+    os.utime(chemins[1], ns=(10**18 + 10**9, 10**18 + 10**9))
+    assert cache.obtenir(cles[0]) is not None
+    cache.charger(noms[2], COLONNES_MAUVE, lecture)
+    assert [os.path.exists(chemin) for chemin in chemins] == [True, False, True]
+    # Ecriture par fichier temporaire puis remplacement : aucun fichier temporaire restant
+    assert not [nom for nom in os.listdir(dossier) if nom.endswith(".tmp.npz")]
+
+
+def test_rechargement_depuis_disque(tmp_path, lecture):
+    dossier = str(tmp_path / "cache")
+    nom = _ecrire(tmp_path / "snp.tsv", b"abcdef")
+    attendu = CacheSNP(dossier).charger(nom, COLONNES_MAUVE, lecture)
+
+    nouveau = CacheSNP(dossier)
+    colonnes = nouveau.charger(nom, COLONNES_MAUVE, lecture)
+    assert lecture.appels == 1 and (nouveau.succes, nouveau.echecs) == (1, 0)
+    assert all(np.array_equal(a, b) and a.dtype == b.dtype for a, b in zip(colonnes, attendu))
+
+
+def test_fichier_cache_corrompu(tmp_path, lecture):
+    dossier = str(tmp_path / "cache")
+    nom = _ecrire(tmp_path / "snp.tsv", b"abcdef")
+    cache = CacheSNP(dossier)
+    (tmp_path / "cache" / (cache.cle(nom, COLONNES_MAUVE) + ".npz")).write_bytes(b"pas un fichier npz")
+    colonnes = cache.charger(nom, COLONNES_MAUVE, lecture)
+    assert lecture.appels == 1 and colonnes[0].tolist() == list(b"abcdef")
+    assert CacheSNP(dossier).charger(nom, COLONNES_MAUVE, lecture)[0].tolist() == list(b"abcdef")
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from SNP import COLONNES_MAUVE, attribuer_parents
+from SNP_codage import TableSNP, coder_motifs, decoder_motifs
+
+
+def _colonnes_aleatoires(generateur, n):
+    # Casse mixte, N, gaps et codes IUPAC, motifs vides (NaN) et positions nulles en P1, P2 ou R
+    motifs = ["".join(bases) for bases in generateur.choice(list("acgtACGTnN-r"), (n, 3), p=[0.115] * 8 + [0.02] * 4)]
+    motifs = np.array(motifs, dtype=object)
+    motifs[generateur.random(n) < 0.02] = np.nan
+    positions = np.cumsum(generateur.integers(1, 50, (3, n)), axis=1) * np.where(generateur.random((3, n)) < 0.03, 0, 1)
+    return motifs, positions
+
+
+def test_table_identique_attribuer_parents(generateur):
+    for essai in range(300):
+        motifs, positions = _colonnes_aleatoires(generateur, int(generateur.integers(0, 300)))
+        attendu = attribuer_parents(motifs, *positions)
+        table = TableSNP.depuis_colonnes(motifs, *positions)
+        obtenu = table.attribuer_parents()
+        assert [colonne.tolist() for colonne in obtenu] == [colonne.tolist() for colonne in attendu]
+        labels = table.attribuer_parents(codes_labels=True)[0]
+        assert labels.dtype == np.int8 and labels.tolist() == [int(label[1]) for label in attendu[0]]
+
+
+def test_lire_par_blocs_identique_attribuer_parents(tmp_path, generateur):
+    motifs, positions = _colonnes_aleatoires(generateur, 1000)
+    tableau = pd.DataFrame(dict(zip(COLONNES_MAUVE, [motifs, *positions])))
+    tableau.to_csv(tmp_path / "snp.tsv", sep="\t", index=False)
+    table = TableSNP.lire(str(tmp_path / "snp.tsv"), taille_bloc=64)
+    attendu = attribuer_parents(motifs, *positions)
+    assert [colonne.tolist() for colonne in table.attribuer_parents()] == [colonne.tolist() for colonne in attendu]
+    assert table.positions.dtype == np.uint32 and table.nbytes == 13 * len(tableau)
+
+
+def test_coder_decoder_motifs():
+    motifs = ["acg", "TTA", "gNc", "a-c", "RaA"]
+    assert decoder_motifs(coder_motifs(motifs)).tolist() == ["acg", "tta", "nnn", "???", "???"]
+
+
+def test_grandes_positions_en_int64():
+    table = TableSNP(coder_motifs(["aca"]), [[2 ** 33], [1], [1]])
+    assert table.positions.dtype == np.int64
+    assert table.attribuer_parents()[1].tolist() == [2 ** 33]
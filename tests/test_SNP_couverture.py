@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from SNP_couverture import CarteCouverture
+
+
+def _recombinant(generateur, longueur):
+    # Segments donneurs sans chevauchement (bornes parfois inversees ou hors du genome) et points de rupture
+    bornes = np.sort(generateur.choice(np.arange(-5, longueur + 6), 2 * int(generateur.integers(0, 6)), replace=False))
+    debuts, fins = bornes[0::2], bornes[1::2]
+    inverses = generateur.random(len(debuts)) < 0.3
+    debuts, fins = np.where(inverses, fins, debuts), np.where(inverses, debuts, fins)
+    return debuts, fins, generateur.integers(1, longueur + 1, int(generateur.integers(0, 8)))
+
+
+def _reference(longueur, taille_fenetre, recombinants):
+    # Comptage base par base
+    couverture = np.zeros(longueur, np.int64)
+    points_rupture = np.zeros(-(-longueur // taille_fenetre), np.int64)
+    for debuts, fins, points in recombinants:
+        for debut, fin in zip(debuts, fins):
+            debut, fin = sorted((int(debut), int(fin)))
+            couverture[max(debut, 1) - 1:max(min(fin, longueur), 0)] += 1
+        for point in points:
+            points_rupture[(point - 1) // taille_fenetre] += 1
+    moyennes = np.array([couverture[debut:debut + taille_fenetre].mean() for debut in range(0, longueur, taille_fenetre)])
+    return couverture, moyennes, points_rupture
+
+
+def test_couverture_identique_comptage(generateur):
+    for essai in range(50):
+        longueur = int(generateur.integers(1, 3000))
+        taille_fenetre = int(generateur.integers(1, 500))
+        recombinants = [_recombinant(generateur, longueur) for _ in range(int(generateur.integers(0, 10)))]
+        carte = CarteCouverture(longueur, taille_fenetre)
+        for recombinant in recombinants:
+            carte.ajouter(*recombinant)
+        couverture, moyennes, points_rupture = _reference(longueur, taille_fenetre, recombinants)
+        assert carte.couverture().tolist() == couverture.tolist()
+        assert np.allclose(carte.couverture_fenetres(), moyennes)
+        assert np.allclose(carte.frequence_fenetres(), moyennes / max(len(recombinants), 1))
+        assert carte.densite_points_rupture().tolist() == points_rupture.tolist()
+        assert carte.nombre_echantillons == len(recombinants)
+
+
+def test_fusionner(generateur):
+    recombinants = [_recombinant(generateur, 2000) for _ in range(12)]
+    cartes = [CarteCouverture(2000, 100) for _ in range(3)]
+    for i, recombinant in enumerate(recombinants):
+        cartes[i % 3].ajouter(*recombinant)
+    totale = CarteCouverture(2000, 100)
+    for recombinant in recombinants:
+        totale.ajouter(*recombinant)
+    fusion = cartes[0].fusionner(cartes[1]).fusionner(cartes[2])
+    assert fusion is cartes[0] and fusion.nombre_echantillons == 12
+    assert fusion.couverture().tolist() == totale.couverture().tolist()
+    assert fusion.densite_points_rupture().tolist() == totale.densite_points_rupture().tolist()
+    with pytest.raises(ValueError):
+        fusion.fusionner(CarteCouverture(2000, 50))
+
+
+def test_point_chaud(generateur):
+    carte = CarteCouverture(100000, 1000)
+    # Bruit de fond uniforme et 40 points de rupture plantes dans la fenetre 42001-43000
+    for _ in range(100):
+        carte.ajouter([], [], generateur.integers(1, 100001, 2))
+    for _ in range(40):
+        carte.ajouter([], [], generateur.integers(42001, 43001, 1))
+    points_chauds = carte.points_chauds(3.0)
+    assert points_chauds[["Start", "End"]].values.tolist() == [[42001, 43000]]
+    assert points_chauds["Points de rupture"].iloc[0] == carte.densite_points_rupture()[42]
+    assert points_chauds["z max"].iloc[0] == carte.scores_points_rupture().max()
+    assert carte.points_chauds(1e9).empty
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from SNP_distribution import DistributionLongueurs, distributions_segments, seuils_defaut
+from SNP_segmentation import segmenter
+from SNP_segments import REPERES
+
+
+def test_sommes_sup_identiques_segments(table_aleatoire, generateur):
+    for essai in range(200):
+        table = table_aleatoire(suite_max=4)
+        segments = segmenter(table.codes, *table.positions, 1, 2, table.nombre_suite_P1, table.nombre_suite_P2).segments
+        seuils = np.concatenate(([0, -1], generateur.integers(0, 20000, 20)))
+        distributions = distributions_segments(segments, REPERES)
+        for (parent, repere), distribution in distributions.items():
+            label = int(parent[1])
+            longueurs = segments.longueurs(repere)[segments.labels == label]
+            for seuil, nombre, somme in zip(seuils, distribution.nombre_sup(seuils), distribution.somme_sup(seuils)):
+                assert somme == segments.somme(label, repere, longueur_min=seuil)
+                assert nombre == (longueurs > seuil).sum()
+        for repere in REPERES:
+            _, _, label_min, somme_sup, compt, _, _ = segments.sommes_rapport_recombinant(repere, 1000)
+            distribution = distributions[label_min[0], repere]
+            assert [int(distribution.somme_sup([1000])[0])] == somme_sup
+            assert [int(distribution.nombre_sup([1000])[0])] == compt
+
+
+def test_histogramme_et_cohorte():
+    distribution = DistributionLongueurs([50, 150, 150, 2000, -30])
+    histogramme = distribution.histogramme([0, 100, 1000, 10000])
+    assert histogramme["Nombre de fragments"].tolist() == [1, 2, 1]
+    assert histogramme["Somme"].tolist() == [50, 300, 2000]
+    ccdf = distribution.ccdf([100])
+    assert ccdf["Fraction de la longueur"].tolist() == [2300 / 2350]
+
+    cohorte = DistributionLongueurs.concatener([distribution, DistributionLongueurs([5000]), DistributionLongueurs([])])
+    assert cohorte.nombre_sup([1000]).tolist() == [2] and cohorte.somme == 7320
+
+
+def test_seuils_defaut():
+    seuils = seuils_defaut()
+    assert seuils[0] == 100 and seuils[-1] == 1000000 and 1000 in seuils and len(seuils) == 41
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from SNP_fasta import IndexFasta, affiner_points_rupture, indexer_fasta
+from SNP_segmentation import segmenter
+from SNP_segments import REPERES
+
+
+ALPHABET = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+def _ecrire_fasta(nom, nom_sequence, genome, largeur, fin_ligne=b"\n"):
+    with open(nom, "wb") as fichier:
+        fichier.write(b">" + nom_sequence.encode() + b" essai" + fin_ligne)
+        for debut in range(0, len(genome), largeur):
+            fichier.write(genome[debut:debut + largeur].tobytes() + fin_ligne)
+
+
+@pytest.mark.parametrize("fin_ligne", [b"\n", b"\r\n"])
+def test_index_et_tranches(tmp_path, generateur, fin_ligne):
+    for essai in range(10):
+        longueur = int(generateur.integers(100, 5000))
+        genome = ALPHABET[generateur.integers(0, 4, longueur)]
+        largeur = int(generateur.integers(10, 80))
+        nom = str(tmp_path / "genome.fasta")
+        _ecrire_fasta(nom, "chr", genome, largeur, fin_ligne)
+
+        assert indexer_fasta(nom) == [("chr", longueur, len(">chr essai") + len(fin_ligne), largeur, largeur + len(fin_ligne))]
+        with IndexFasta(nom) as fasta:
+            for _ in range(50):
+                debut, fin = (int(x) for x in np.sort(generateur.integers(-5, longueur + 5, 2)))
+                assert bytes(fasta.tranche(debut, fin)) == genome[max(debut, 1) - 1:fin].tobytes()
+        # Index relu depuis le fichier .fai ecrit a la premiere ouverture
+        assert IndexFasta(nom).sequences == {"chr" : [longueur, len(">chr essai") + len(fin_ligne), largeur, largeur + len(fin_ligne)]}
+
+
+def test_lignes_irregulieres(tmp_path):
+    nom = tmp_path / "irregulier.fasta"
+    nom.write_bytes(b">chr\nACGT\nAC\nACGT\n")
+    with pytest.raises(ValueError):
+        indexer_fasta(str(nom))
+
+
+def test_intervalles_affines_contiennent_croisement(tmp_path, generateur):
+    for essai in range(30):
+        longueur = int(generateur.integers(2000, 20000))
+        P1 = ALPHABET[generateur.integers(0, 4, longueur)]
+        P2 = P1.copy()
+        variants = np.flatnonzero(generateur.random(longueur) < 0.02)
+        P2[variants] = ALPHABET[(np.searchsorted(ALPHABET, P1[variants]) + generateur.integers(1, 4, len(variants))) % 4]
+        # Recombinant : P1 puis alternance de fragments P2 / P1 aux points de croisement
+        croisements = np.sort(generateur.choice(np.arange(1, longueur), int(generateur.integers(1, 6)), replace=False))
+        parent = np.searchsorted(croisements, np.arange(longueur), side="right") % 2
+        R = np.where(parent == 0, P1, P2)
+        fastas = {}
+        for repere, genome in zip(REPERES, (P1, P2, R)):
+            _ecrire_fasta(tmp_path / (repere + ".fasta"), repere, genome, int(generateur.integers(10, 80)))
+            fastas[repere] = IndexFasta(str(tmp_path / (repere + ".fasta")))
+
+        # Le fichier SNP ne garde qu'une partie des variants, les autres servent a l'affinage
+        gardes = np.sort(generateur.choice(variants, max(len(variants) // 3, 2), replace=False))
+        codes = np.where(parent[gardes] == 0, 1, 2).astype(np.int8)
+        positions = np.vstack([gardes + 1] * 3)
+        segmentation = segmenter(codes, *positions, 1, 2, 1, 1)
+        tableau = affiner_points_rupture(segmentation.chaine_SNP, segmentation.bornes, positions, fastas)
+        premieres_bases = croisements + 1
+        for _, ligne in tableau.iterrows():
+            # Premiere base du nouveau parent entre les deux SNP de la borne
+            dans = premieres_bases[(premieres_bases >= ligne["Debut R"]) & (premieres_bases <= ligne["Fin R"] + 1)]
+            assert len(dans)
+            assert ligne["Debut R"] <= ligne["Debut affine R"] and ligne["Fin affine R"] <= ligne["Fin R"]
+            assert ligne["Sites discordants"] > 0 or ((dans >= ligne["Debut affine R"]) & (dans <= ligne["Fin affine R"] + 1)).any()
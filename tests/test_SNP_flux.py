@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from SNP import SNP_parent
+from SNP_flux import lire_flux, segments_flux, sommes_flux
+from SNP_segmentation import segmenter
+from SNP_segments import REPERES, Segments
+
+
+def _blocs(table, generateur):
+    # Decoupage de la table en blocs de tailles aleatoires (blocs vides compris)
+    n = len(table.codes)
+    coupures = np.sort(generateur.integers(0, n + 1, int(generateur.integers(0, 8))))
+    return [tuple(colonne[debut:fin] for colonne in (table.codes, *table.positions))
+            for debut, fin in zip(np.concatenate([[0], coupures]), np.concatenate([coupures, [n]]))]
+
+
+def test_segments_et_sommes_flux_identiques_segmenter(table_aleatoire, generateur):
+    for essai in range(300):
+        table = table_aleatoire(suite_max=6)
+        parametres = (table.base, 3 - table.base, table.nombre_suite_P1, table.nombre_suite_P2)
+        blocs = _blocs(table, generateur)
+
+        attendu = segmenter(table.codes, *table.positions, *parametres).segments
+        obtenu = Segments.concatener([segments for _, segments in segments_flux(blocs, *parametres)])[0]
+        assert obtenu.vers_listes() == attendu.vers_listes()
+
+        total, _ = sommes_flux(blocs, *parametres, borne_sup=2000)
+        for repere in REPERES:
+            assert total.sommes_rapport_recombinant(repere) == attendu.sommes_rapport_recombinant(repere, 2000)
+            assert total.sommes_rapport_donneur(repere) == attendu.sommes_rapport_donneur(repere)
+
+
+def test_segmentation_par_contig(table_aleatoire, generateur):
+    for essai in range(20):
+        table = table_aleatoire(taille_min=1)
+        parametres = (table.base, 3 - table.base, table.nombre_suite_P1, table.nombre_suite_P2)
+        contigs = np.sort(generateur.integers(0, 3, len(table.codes)))
+        _, par_contig = sommes_flux([(table.codes, *table.positions, contigs)], *parametres)
+        for contig in np.unique(contigs):
+            garde = contigs == contig
+            attendu = segmenter(table.codes[garde], *table.positions[:, garde], *parametres).segments
+            if contig not in par_contig:
+                assert len(attendu) == 0
+                continue
+            for repere in REPERES:
+                assert par_contig[contig].sommes_rapport_recombinant(repere) == attendu.sommes_rapport_recombinant(repere)
+
+
+def test_lire_flux_identique_SNP_parent(tmp_path, generateur):
+    n = 500
+    motifs = ["".join(bases) for bases in generateur.choice(list("acgtN"), (n, 3), p=[0.24, 0.24, 0.24, 0.24, 0.04])]
+    positions = np.cumsum(generateur.integers(1, 50, (3, n)), axis=1) * np.where(generateur.random((3, n)) < 0.02, 0, 1)
+    nom = tmp_path / "export.tsv"
+    pd.DataFrame({"SNP pattern" : motifs, "sequence_1_PosInContg" : positions[0], "sequence_2_PosInContg" : positions[1],
+                  "sequence_3_PosInContg" : positions[2]}).to_csv(nom, sep="\t", index=False)
+
+    blocs = list(lire_flux(str(nom), taille_bloc=37))
+    lus = [np.concatenate(colonne) for colonne in zip(*blocs)]
+    attendus = SNP_parent(str(nom), vectorise=True)
+    for lu, attendu in zip(lus, attendus):
+        assert np.asarray(lu).tolist() == np.asarray(attendu).tolist()
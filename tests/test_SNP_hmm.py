@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from SNP_hmm import chaine_hmm, penalites_saut, viterbi_deux_etats
+
+
+def viterbi_reference(codes, penalites, erreur=0.01):
+    # Viterbi sequentiel avec pointeurs arriere
+    codes = np.asarray(codes)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, np.int8)
+    log_bon, log_erreur = np.log(1 - erreur), np.log(erreur)
+    scores = np.array([log_bon if codes[0] == 1 else log_erreur, log_bon if codes[0] == 2 else log_erreur])
+    pointeurs = np.zeros((n, 2), np.int8)
+    for t in range(1, n):
+        emission = np.array([log_bon if codes[t] == 1 else log_erreur, log_bon if codes[t] == 2 else log_erreur])
+        nouveaux = np.empty(2)
+        for k in range(2):
+            candidats = (scores[k], scores[1 - k] - penalites[t - 1])
+            pointeurs[t, k] = k if candidats[0] >= candidats[1] else 1 - k
+            nouveaux[k] = max(candidats) + emission[k]
+        scores = nouveaux
+    etats = np.empty(n, np.int8)
+    etats[-1] = int(np.argmax(scores))
+    for t in range(n - 1, 0, -1):
+        etats[t - 1] = pointeurs[t, etats[t]]
+    return etats + 1
+
+
+def test_viterbi_deux_etats_identique_viterbi_sequentiel(table_aleatoire, generateur):
+    for essai in range(300):
+        codes = table_aleatoire(taille_min=1).codes
+        n = len(codes)
+        if essai % 2:
+            penalites = penalites_saut(generateur.integers(0, 5000, n - 1), taux_saut=float(generateur.choice([1e-5, 1e-3])))
+        else:
+            penalites = penalites_saut(n=n, penalite_saut=float(generateur.uniform(1, 15)))
+        etats, marges = viterbi_deux_etats(codes, penalites)
+        # Un SNP de marge non nulle a le meme etat sur tous les chemins optimaux (les ex aequo ne sont pas compares)
+        decides = marges > 1e-9
+        assert (etats == viterbi_reference(codes, penalites))[decides].all()
+
+
+def test_chaine_hmm_absorbe_SNP_isole():
+    codes = np.array([1] * 20 + [2] + [1] * 20 + [2] * 20, np.int8)
+    chaine = chaine_hmm(codes)
+    assert chaine.tolist() == [1] * 41 + [2] * 20
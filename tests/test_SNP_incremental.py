@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from SNP_incremental import SegmentationIncrementale
+from SNP_segmentation import segmenter
+
+
+def _editer(codes, positions, generateur):
+    # Version editee de la table : labels inverses, SNP supprimes, decalage des positions R et insertions
+    codes, positions = codes.copy(), positions.copy()
+    changes = generateur.random(len(codes)) < generateur.choice([0.0, 0.01, 0.1])
+    codes[changes] = 3 - codes[changes]
+    positions[2] += np.cumsum(generateur.random(len(codes)) < 0.01)
+    garde = generateur.random(len(codes)) > generateur.choice([0.0, 0.02])
+    codes, positions = codes[garde], positions[:, garde]
+    if len(codes) and generateur.random() < 0.5:
+        i = int(generateur.integers(0, len(codes)))
+        insertion = positions[:, i:i + 1] + 1 + np.arange(int(generateur.integers(1, 4)))
+        codes = np.insert(codes, i + 1, generateur.integers(1, 3, insertion.shape[1]).astype(np.int8))
+        positions = np.insert(positions, [i + 1], insertion, axis=1)
+    return codes, positions
+
+
+def _identiques(obtenu, attendu):
+    assert obtenu.chaine_SNP.tolist() == attendu.chaine_SNP.tolist()
+    assert obtenu.liste_taille_snp.tolist() == attendu.liste_taille_snp.tolist()
+    assert obtenu.bornes.tolist() == attendu.bornes.tolist()
+    assert obtenu.segments.vers_listes() == attendu.segments.vers_listes()
+
+
+def test_mises_a_jour_identiques_segmenter(table_aleatoire, generateur):
+    for essai in range(300):
+        table = table_aleatoire(pas_max=100)
+        # Positions espacees pour pouvoir inserer des SNP entre deux SNP
+        codes, positions = table.codes, table.positions * 4
+        parametres = (table.base, 3 - table.base, table.nombre_suite_P1, table.nombre_suite_P2)
+        segmentation = SegmentationIncrementale(codes, *positions, *parametres)
+        for _ in range(3):
+            codes, positions = _editer(codes, positions, generateur)
+            segmentation.mettre_a_jour(codes, *positions)
+            _identiques(segmentation.segmentation(), segmenter(codes, *positions, *parametres))
+
+
+def test_enregistrer_charger(tmp_path, table_aleatoire, generateur):
+    for essai in range(20):
+        table = table_aleatoire(pas_max=100)
+        parametres = (table.base, 3 - table.base, table.nombre_suite_P1, table.nombre_suite_P2)
+        SegmentationIncrementale(table.codes, *table.positions * 4, *parametres).enregistrer(tmp_path / "etat.npz")
+
+        segmentation = SegmentationIncrementale.charger(tmp_path / "etat.npz")
+        codes, positions = _editer(table.codes, table.positions * 4, generateur)
+        segmentation.mettre_a_jour(codes, *positions)
+        _identiques(segmentation.segmentation(), segmenter(codes, *positions, *parametres))
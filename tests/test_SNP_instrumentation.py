@@ -0,0 +1,107 @@
+import csv
+import json
+import sys
+
+import numpy as np
+import pytest
+
+import SNP_instrumentation
+from SNP_cache import CacheSNP
+from SNP_instrumentation import Instrumentation, etape, instrumenter
+
+
+def test_etape_nulle_sans_instrumentation():
+    assert SNP_instrumentation._instrumentation_active is None
+    premiere = etape("a", nombre_snp=3)
+    assert premiere is etape("b") is SNP_instrumentation._ETAPE_NULLE
+    with premiere as mesure:
+        mesure.compter(nombre_segments=1)
+
+
+def test_etapes_imbriquees():
+    with instrumenter(recombinant="R1") as mesures:
+        with etape("exterieure", nombre_snp=10) as exterieure:
+            with etape("interieure"):
+                sum(range(1000))
+            exterieure.compter(nombre_segments=2)
+        with pytest.raises(ZeroDivisionError):
+            with etape("erreur"):
+                1 / 0
+        # Une instrumentation imbriquee a ses propres mesures et rend ensuite la main
+        with instrumenter() as autres:
+            with etape("autre"):
+                pass
+        with etape("apres"):
+            pass
+    assert etape("hors") is SNP_instrumentation._ETAPE_NULLE
+
+    assert [mesure["etape"] for mesure in autres.mesures] == ["autre"]
+    assert [mesure["etape"] for mesure in mesures.mesures] == ["interieure", "exterieure", "erreur", "apres"]
+    interieure, exterieure, erreur, _ = mesures.mesures
+    assert all(mesure["recombinant"] == "R1" for mesure in mesures.mesures)
+    assert exterieure["nombre_snp"] == 10 and exterieure["nombre_segments"] == 2
+    assert exterieure["temps_s"] >= interieure["temps_s"] >= 0
+    assert erreur["erreur"] == "ZeroDivisionError" and "erreur" not in exterieure
+    if sys.platform.startswith("linux"):
+        assert all(mesure["rss_debut_octets"] > 0 and mesure["rss_fin_octets"] > 0 for mesure in mesures.mesures)
+        assert exterieure["pic_rss_processus_octets"] > 0
+
+
+def test_rss_par_etape():
+    if not sys.platform.startswith("linux"):
+        pytest.skip("RSS courant lu dans /proc")
+    with instrumenter() as mesures:
+        with etape("allocation"):
+            tableau = np.ones(64 * 2**20, np.uint8)
+        del tableau
+    mesure = mesures.mesures[0]
+    assert mesure["rss_fin_octets"] - mesure["rss_debut_octets"] >= 60 * 2**20
+
+
+def test_cache_succes_echecs(tmp_path):
+    nom = tmp_path / "snp.tsv"
+    nom.write_bytes(b"abc")
+    cache = CacheSNP()
+    lecture = lambda nom_fichier: (np.zeros(3, np.int8),)
+    with instrumenter() as mesures:
+        for _ in range(2):
+            with etape("SNP_parent", cache):
+                cache.charger(str(nom), ["a"], lecture)
+        with etape("sans cache"):
+            pass
+    premiere, seconde, sans_cache = mesures.mesures
+    assert (premiere["cache_succes"], premiere["cache_echecs"]) == (0, 1)
+    assert (seconde["cache_succes"], seconde["cache_echecs"]) == (1, 0)
+    assert "cache_succes" not in sans_cache
+
+
+def _mesures():
+    mesures = Instrumentation(recombinant="R1")
+    with mesures.etape("SNP_parent", nombre_snp=5):
+        pass
+    with mesures.etape("segmenter") as mesure:
+        mesure.compter(nombre_segments=2)
+    return mesures
+
+
+def test_rapport_json(tmp_path):
+    mesures = _mesures()
+    nom = str(tmp_path / "rapport.json")
+    mesures.ecrire(nom)
+    with open(nom, encoding="utf-8") as fichier:
+        assert json.load(fichier) == mesures.mesures
+
+
+def test_rapport_csv(tmp_path):
+    mesures = _mesures()
+    nom = str(tmp_path / "rapport.csv")
+    mesures.ecrire(nom)
+    with open(nom, newline="", encoding="utf-8") as fichier:
+        lecteur = csv.DictReader(fichier)
+        lignes = list(lecteur)
+    # Colonnes de toutes les etapes, vides quand une etape ne les a pas
+    assert {"nombre_snp", "nombre_segments", "temps_s"} <= set(lecteur.fieldnames)
+    assert len(lignes) == 2
+    for ligne, mesure in zip(lignes, mesures.mesures):
+        assert ligne == {colonne : "" if mesure.get(colonne) is None else str(mesure[colonne]) for colonne in lecteur.fieldnames}
+    assert [ligne["nombre_segments"] for ligne in lignes] == ["", "2"]
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from SNP import attribuer_parents
+from SNP_multi import attribuer_parents_multiple, donnees_recombinant, lire_alignement
+
+
+def _alignement_aleatoire(generateur, nombre_genomes, n):
+    # Casse mixte, N, parents identiques sur une partie des colonnes et positions nulles
+    bases = generateur.choice(list("acgtACGTnN"), (n, nombre_genomes), p=[0.12] * 8 + [0.02, 0.02])
+    identiques = generateur.random(n) < 0.2
+    bases[identiques, 1] = bases[identiques, 0]
+    SNP_pattern = np.array(["".join(ligne) for ligne in bases])
+    positions = np.cumsum(generateur.integers(1, 50, (nombre_genomes, n)), axis=1) * np.where(generateur.random((nombre_genomes, n)) < 0.03, 0, 1)
+    return SNP_pattern, positions
+
+
+def test_identique_alignement_trois_genomes(generateur):
+    for essai in range(100):
+        nombre_genomes = int(generateur.integers(3, 7))
+        SNP_pattern, positions = _alignement_aleatoire(generateur, nombre_genomes, int(generateur.integers(0, 300)))
+        codes = attribuer_parents_multiple(SNP_pattern, positions)
+        assert codes.shape == (nombre_genomes - 2, len(SNP_pattern))
+        # Colonnes ou P1 et P2 different : les seules informatives pour les recombinants
+        differents = np.array([motif[0].lower() != motif[1].lower() for motif in SNP_pattern], dtype=bool)
+        for k in range(nombre_genomes - 2):
+            motifs = np.array([motif[0] + motif[1] + motif[2 + k] for motif in SNP_pattern])[differents]
+            attendu = attribuer_parents(motifs, *positions[[0, 1, 2 + k]][:, differents])
+            obtenu = donnees_recombinant(codes, positions, k)
+            assert [colonne.tolist() for colonne in obtenu] == [colonne.tolist() for colonne in attendu]
+            assert np.count_nonzero(codes[k]) == len(attendu[0])
+
+
+def _ecrire_alignement(chemin, genomes):
+    colonnes = {"SNP pattern" : ["acaa", "gggt", "tctc"]}
+    for genome in genomes:
+        colonnes["sequence_%d_Contig" % genome] = "contig_1"
+        colonnes["sequence_%d_PosInContg" % genome] = [10 * genome, 10 * genome + 1, 10 * genome + 2]
+    pd.DataFrame(colonnes).to_csv(chemin, sep="\t", index=False)
+    return str(chemin)
+
+
+def test_lire_alignement(tmp_path):
+    # Colonnes dans le desordre et colonnes inutiles ignorees
+    SNP_pattern, positions = lire_alignement(_ecrire_alignement(tmp_path / "alignement.tsv", [3, 1, 4, 2]))
+    assert SNP_pattern.tolist() == ["acaa", "gggt", "tctc"]
+    assert positions[:, 0].tolist() == [10, 20, 30, 40]
+
+
+@pytest.mark.parametrize("genomes", [[1, 2], [1, 2, 4], [1, 3, 4], [1, 2, 3, 5], [2, 3, 4]])
+def test_lire_alignement_colonnes_manquantes(tmp_path, genomes):
+    with pytest.raises(ValueError, match="sequence_1_PosInContg"):
+        lire_alignement(_ecrire_alignement(tmp_path / "alignement.tsv", genomes))
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from SNP import LABELS_PARENTS, SNP_chaine, chaine_borne, compteur_snp
+from SNP_segmentation import segmenter
+
+
+@pytest.mark.parametrize("graine", range(300))
+def test_segmenter_identique_fonctions_SNP(table_aleatoire):
+    table = table_aleatoire(taille_max=200, pas_max=100)
+    labels = LABELS_PARENTS[table.codes].tolist()
+    positions = table.positions.tolist()
+    donneur = 3 - table.base
+
+    resultat = segmenter(labels, *positions, table.base, donneur, table.nombre_suite_P1, table.nombre_suite_P2)
+    chaine_SNP = SNP_chaine(labels, table.base, table.nombre_suite_P1, table.nombre_suite_P2)
+    assert resultat.chaine_SNP.tolist() == chaine_SNP
+    assert resultat.liste_taille_snp.tolist() == compteur_snp(chaine_SNP)
+    if len(labels) >= 2:
+        attendu = [list(liste) for liste in chaine_borne(chaine_SNP, *positions, donneur)]
+        assert list(resultat.segments.vers_listes()) == attendu
+
+
+@pytest.mark.parametrize("codes", [[], [1], [2, 1], [1, 1, 2, 2, 1]])
+def test_segmenter_entrees_courtes(codes):
+    positions = [np.arange(1, len(codes) + 1)] * 3
+    resultat = segmenter(np.array(codes, np.int8), *positions)
+    assert resultat.chaine_SNP.tolist() == SNP_chaine(LABELS_PARENTS[np.array(codes, int)].tolist())
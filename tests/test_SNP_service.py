@@ -0,0 +1,59 @@
+import json
+import socket
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from SNP_service import servir, soumettre
+
+
+def _port_libre():
+    with socket.socket() as prise:
+        prise.bind(("127.0.0.1", 0))
+        return prise.getsockname()[1]
+
+
+@pytest.fixture
+def service(tmp_path):
+    port = _port_libre()
+    fil = threading.Thread(target=servir, args=("127.0.0.1", port, str(tmp_path / "cache")), daemon=True)
+    fil.start()
+    # Attente de l'ouverture du port
+    for essai in range(200):
+        try:
+            soumettre("/etat", port=port, delai=5)
+            break
+        except OSError:
+            time.sleep(0.05)
+    yield port, fil
+    if fil.is_alive():
+        soumettre("/arreter", {}, port=port, delai=5)
+        fil.join(10)
+
+
+def test_service(service, export_mauve):
+    port, fil = service
+    travail = {"Nom_fichier_tri_P1" : export_mauve(), "formats_sortie" : ["tsv"]}
+    premier = soumettre("/analyse", travail, port=port, delai=60)
+    second = soumettre("/analyse", travail, port=port, delai=60)
+    assert premier["resultat"] == second["resultat"]
+    etat = soumettre("/etat", port=port)
+    # Fichier lu au premier travail, repris du cache au second
+    assert (etat["cache_echecs"], etat["cache_succes"], etat["nombre_travaux"]) == (1, 1, 2)
+
+    # Parametre inconnu : erreur 400, le service continue
+    requete = Request("http://127.0.0.1:%d/analyse" % port, data=json.dumps(dict(travail, inconnu=1)).encode(),
+                      headers={"Content-Type" : "application/json"})
+    with pytest.raises(HTTPError) as erreur:
+        urlopen(requete, timeout=60)
+    assert erreur.value.code == 400 and "inconnu" in json.loads(erreur.value.read())["erreur"]
+    with pytest.raises(RuntimeError, match="Parametres inconnus"):
+        soumettre("/analyse", dict(travail, inconnu=1), port=port, delai=60)
+    assert soumettre("/analyse", travail, port=port, delai=60)["resultat"] == premier["resultat"]
+
+    assert soumettre("/arreter", {}, port=port, delai=5)["nombre_travaux"] == 3
+    fil.join(10)
+    assert not fil.is_alive()
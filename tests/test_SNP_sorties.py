@@ -0,0 +1,72 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import SNP_sorties
+from SNP import creer_excel
+from SNP_segmentation import segmenter
+from SNP_sorties import TABLES, SortieTSV, ecrire_analyse
+
+
+def _analyse(table):
+    # Resultats d'une orientation (recepteur P1, donneur P2), comme dans Main.utiliser_fonctions()
+    segmentation = segmenter(table.codes, *table.positions, 1, 2, table.nombre_suite_P1, table.nombre_suite_P2)
+    ordre = np.argsort(table.positions[1], kind="stable")
+    segments_donneur = segmenter(table.codes[ordre], *table.positions[:, ordre], 2, 1, table.nombre_suite_P1, table.nombre_suite_P2).segments
+    segments = segmentation.segments
+    return (segments, segments_donneur, 2, segments.sommes_rapport_recombinant("P1"),
+            segments_donneur.sommes_rapport_donneur("P2")[1], segmentation.liste_taille_snp)
+
+
+def test_tsv_colonnes_inegales(tmp_path, monkeypatch):
+    # Tranches plus courtes que les colonnes
+    monkeypatch.setattr(SNP_sorties, "TAILLE_TRANCHE", 2)
+    with SortieTSV(str(tmp_path / "sortie")) as sortie:
+        sortie.ecrire_table("table", ["a", "b"], [np.array([1, 2, 3]), ["P1"]])
+    assert (tmp_path / "sortie_table.tsv").read_text() == "a\tb\n1\tP1\n2\t\n3\t\n"
+
+
+def test_parquet_identique_tsv(tmp_path, table_aleatoire):
+    pytest.importorskip("pyarrow")
+    for essai in range(5):
+        table = table_aleatoire(taille_min=20)
+        nom_base = str(tmp_path / "sortie")
+        fichiers = ecrire_analyse(["tsv", "parquet"], nom_base, *_analyse(table))
+        for nom_table in TABLES:
+            nom = "%s_%s" % (nom_base, nom_table.replace(" ", "_"))
+            assert nom + ".tsv" in fichiers and nom + ".parquet" in fichiers
+            pd.testing.assert_frame_equal(pd.read_parquet(nom + ".parquet"), pd.read_csv(nom + ".tsv", sep="\t"), check_dtype=False)
+
+
+def test_parquet_colonnes_inegales(tmp_path):
+    pytest.importorskip("pyarrow")
+    from SNP_sorties import SortieParquet
+
+    with SortieParquet(str(tmp_path / "sortie")) as sortie:
+        sortie.ecrire_table("table", ["a", "b"], [np.array([1, 2, 3]), np.array(["P1"])])
+    lu = pd.read_parquet(tmp_path / "sortie_table.parquet")
+    assert lu["a"].tolist() == [1, 2, 3]
+    assert lu["b"].tolist()[0] == "P1" and lu["b"].isna().tolist() == [False, True, True]
+    assert os.path.exists(tmp_path / "sortie_table.parquet")
+
+
+def test_excel_identique_creer_excel(tmp_path, table_aleatoire, monkeypatch):
+    monkeypatch.setattr(SNP_sorties, "TAILLE_TRANCHE", 7)
+    for essai in range(3):
+        table = table_aleatoire(taille_min=20)
+        segments, segments_donneur, donneur, sommes, somme_donneur, liste_taille_snp = _analyse(table)
+        somme_P1, somme_P2, min_P1_P2, _, _, compt_P1, compt_P2 = sommes
+        dossier = tmp_path / str(essai)
+        dossier.mkdir()
+        creer_excel(str(dossier / "snp_triP1.xlsx"), segments.labels, *segments.projection("R"), *segments.projection("P1"),
+                    *segments.projection("P2"), segments_donneur.labels, *segments_donneur.projection("P2"),
+                    somme_P1, somme_P2, min_P1_P2, compt_P1, compt_P2, somme_donneur, liste_taille_snp)
+        attendu = pd.read_excel(glob.glob(str(dossier / "snp_triP1_sortie*.xlsx"))[0], sheet_name=None, index_col=0)
+        fichiers = ecrire_analyse(["excel"], str(dossier / "sortie"), segments, segments_donneur, donneur, sommes, somme_donneur, liste_taille_snp)
+        obtenu = pd.read_excel(fichiers[0], sheet_name=None, index_col=0)
+        assert list(obtenu) == list(attendu) == list(TABLES)
+        for nom_table in TABLES:
+            pd.testing.assert_frame_equal(obtenu[nom_table], attendu[nom_table])